@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Adaptive Concurrency Benchmark
+Drives the AIMD limiter (src/concurrency.py) through simulated latency regimes on a virtual clock, and checks that it backs off on timeouts and recovers after a lasting latency shift
+
+Usage:
+    python benchmarks/bench_concurrency.py --rounds 200
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import concurrency
+from src.concurrency import AdaptiveConcurrencyLimiter
+
+class VirtualClock:
+    """Stands in for the time module inside src.concurrency so rounds take no wall time."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+def run_phase(limiter: AdaptiveConcurrencyLimiter, clock: VirtualClock, rounds: int, latency: float,
+              timed_out: bool = False) -> None:
+    """Each round fills every free slot, waits one latency and releases them all."""
+    for _ in range(rounds):
+        taken = 0
+        while limiter.try_acquire():
+            taken += 1
+        clock.now += latency
+        for _ in range(taken):
+            limiter.release(latency, success=not timed_out, timed_out=timed_out)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check the adaptive concurrency limiter on simulated latency regimes.")
+    parser.add_argument("--rounds", type=int, default=200, help="rounds per phase (default: 200)")
+    args = parser.parse_args()
+
+    clock = VirtualClock()
+    concurrency.time = clock
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=32)
+
+    # (name, latency, timed out, check on the metrics after the phase)
+    failures = []
+    phases = [
+        ("10 ms", 0.010, False, lambda m: m["limit"] > 4),
+        ("lasting shift to 50 ms", 0.050, False, lambda m: m["limit"] > 4 and m["baseline_latency"] > 0.025),
+        ("timeouts", 0.050, True, lambda m: m["limit"] == 1),
+        ("recovered at 50 ms", 0.050, False, lambda m: m["limit"] > 4),
+    ]
+    print(f"{'phase':<24} {'limit':>6} {'baseline':>10} {'decreases':>10}")
+    for name, latency, timed_out, healthy in phases:
+        run_phase(limiter, clock, args.rounds, latency, timed_out)
+        metrics = limiter.get_metrics()
+        print(f"{name:<24} {metrics['limit']:>6} {metrics['baseline_latency'] * 1000:>8.1f}ms {metrics['limit_decreases']:>10}")
+        if not healthy(metrics):
+            failures.append(name)
+
+    if failures:
+        print(f"FAIL: limit did not settle as expected after: {', '.join(failures)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
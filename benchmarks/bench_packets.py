@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Packet Split Benchmark
+Boundary and type accuracy and speed of the packet splitter (src/packet_splitter.py) on synthetic broker packets, from their page text so no OCR is needed
+
+Usage:
+    python benchmarks/bench_packets.py --packets 200 --noise 0.03
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.packet_splitter import PAGE_BREAK, PacketSplitter
+from synthetic_corpus import build_packet
+
+def ocr_noise(text: str, rate: float, rng: random.Random) -> str:
+    """Drop or garble characters at roughly `rate`, like a poor scan."""
+    if not rate:
+        return text
+    out = []
+    for char in text:
+        roll = rng.random()
+        if roll < rate / 2:
+            continue
+        out.append(rng.choice("il1|.,ceos") if roll < rate and char != "\n" else char)
+    return "".join(out)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure packet splitting accuracy on synthetic packets.")
+    parser.add_argument("--packets", type=int, default=200)
+    parser.add_argument("--statement-months", type=int, default=3)
+    parser.add_argument("--statement-pages", type=int, default=2)
+    parser.add_argument("--noise", type=float, default=0.0, help="character error rate to simulate OCR (default: 0)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-accuracy", type=float, default=0.95,
+                        help="exit non-zero when fewer packets than this are split exactly right")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    splitter = PacketSplitter()
+    exact = typed = 0
+    pages_total = 0
+    elapsed = 0.0
+    for _ in range(args.packets):
+        pages, truth = build_packet(rng, args.statement_months, args.statement_pages)
+        text = "".join(ocr_noise("\n".join(lines), args.noise, rng) + f"{PAGE_BREAK}\n\n" for lines in pages)
+        pages_total += len(pages)
+
+        start = time.perf_counter()
+        parts = splitter.split(text)
+        elapsed += time.perf_counter() - start
+
+        found = [(p["document_type"], p["first_page"], p["last_page"]) for p in parts]
+        expected = [(p["document_type"], p["first_page"], p["last_page"]) for p in truth["parts"]]
+        exact += found == expected
+        typed += [f[0] for f in found] == [e[0] for e in expected]
+
+    accuracy = exact / args.packets
+    print(f"{args.packets} packets, {pages_total} pages, noise {args.noise:.0%}")
+    print(f"  exact splits   {accuracy:7.1%}")
+    print(f"  type sequence  {typed / args.packets:7.1%}")
+    print(f"  split time     {elapsed * 1000 / pages_total:7.3f} ms/page")
+    return 0 if accuracy >= args.min_accuracy else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
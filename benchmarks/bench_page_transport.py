@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Page Transport Microbenchmark
+Time to hand page rasters to worker processes by pickling versus shared-memory handles (src/shared_pages.py)
+
+Usage:
+    python benchmarks/bench_page_transport.py --pages 200 --workers 4 --dpi 200
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.shared_pages import SharedPagePool, attached_page
+
+def _touch(page) -> int:
+    # Read a sparse sample so the worker really maps the pixels, without OCR-sized work.
+    return int(page[::64, ::64].sum())
+
+def consume_pickled(page) -> int:
+    return _touch(page)
+
+def consume_shared(handle) -> int:
+    with attached_page(handle) as page:
+        return _touch(page)
+
+def run_pickled(executor, page, count: int, window: int) -> float:
+    start = time.perf_counter()
+    futures = []
+    for _ in range(count):
+        if len(futures) >= window:
+            futures[len(futures) - window].result()
+        futures.append(executor.submit(consume_pickled, page))
+    for future in futures:
+        future.result()
+    return time.perf_counter() - start
+
+def run_shared(executor, pool, page, count: int, window: int) -> float:
+    start = time.perf_counter()
+    futures = []
+    for _ in range(count):
+        if len(futures) >= window:
+            futures[len(futures) - window].result()
+        handle = pool.put(page)  # the one copy a rasteriser makes either way
+        future = executor.submit(consume_shared, handle)
+        future.add_done_callback(lambda f, h=handle: pool.release(h))
+        futures.append(future)
+    for future in futures:
+        future.result()
+    return time.perf_counter() - start
+
+def main() -> int:
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Compare pickling page rasters to passing shared-memory handles.")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--dpi", type=int, default=200, help="letter-size page resolution (default: 200)")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs per transport")
+    args = parser.parse_args()
+
+    page = np.random.default_rng(0).integers(0, 256, (int(11 * args.dpi), int(8.5 * args.dpi), 3), dtype=np.uint8)
+    window = args.workers * 2
+    print(f"{args.pages} pages of {page.shape[1]}x{page.shape[0]} RGB ({page.nbytes / 1e6:.1f} MB) "
+          f"to {args.workers} workers")
+
+    pool = SharedPagePool(max_free=window)  # before the workers start, so they share its resource tracker
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        list(executor.map(consume_pickled, [page[:1]] * args.workers))  # start the workers
+        runs = {
+            "pickle": lambda: run_pickled(executor, page, args.pages, window),
+            "shared_memory": lambda: run_shared(executor, pool, page, args.pages, window)
+        }
+        results = {}
+        for name, run in runs.items():
+            best = min(run() for _ in range(args.repeat))
+            results[name] = best
+            print(f"  {name:<14} {best * 1000 / args.pages:7.2f} ms/page  {args.pages * page.nbytes / best / 1e9:6.2f} GB/s")
+    pool.close()
+
+    print(f"shared memory is {results['pickle'] / results['shared_memory']:.1f}x faster per page")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+End-to-End Pipeline Benchmark
+Runs process_directory over a synthetic corpus and reports docs/sec, per-stage latency, peak RSS and accuracy against a baseline
+
+Usage:
+    python benchmarks/bench_pipeline.py --count 40 --modes sequential,staged,process
+    python benchmarks/bench_pipeline.py --save-baseline        # after an intentional change
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baselines" / "pipeline.json"
+MODES = ("sequential", "staged", "process")
+
+# (path into the result, normaliser) for every field the ground truth can carry.
+SCORED_FIELDS = {
+    "merchant_name": "text",
+    "ein_or_ssn": "digits",
+    "address.street": "text",
+    "address.city": "text",
+    "address.state": "text",
+    "address.zip": "digits",
+    "contact_info.phone": "digits",
+    "contact_info.email": "text",
+    "business_info.annual_revenue": "digits",
+    "business_info.years_in_business": "digits",
+    "requested_amount": "digits",
+}
+
+def _lookup(record: Dict, path: str):
+    for part in path.split("."):
+        if not isinstance(record, dict):
+            return None
+        record = record.get(part)
+    return record
+
+def _normalise(value, kind: str) -> str:
+    value = str(value or "")
+    if kind == "digits":
+        return re.sub(r"\D", "", value.split(".")[0])
+    return re.sub(r"[^a-z0-9@.]", "", value.lower())
+
+def score_accuracy(results: List[Dict], ground_truth: Dict[str, Dict]) -> Dict:
+    """Exact-match field accuracy over every ground-truth field; failed documents score zero."""
+    by_file = {r.get("source_file"): r for r in results}
+    per_field: Dict[str, List[int]] = {}
+    for filename, truth in ground_truth.items():
+        result = by_file.get(filename) or {}
+        for path, kind in SCORED_FIELDS.items():
+            expected = _lookup(truth, path)
+            if expected is None:
+                continue
+            hit = int(_normalise(_lookup(result, path), kind) == _normalise(expected, kind))
+            per_field.setdefault(path, [0, 0])
+            per_field[path][0] += hit
+            per_field[path][1] += 1
+
+    correct = sum(c for c, _ in per_field.values())
+    total = sum(t for _, t in per_field.values())
+    return {
+        "field_accuracy": correct / total if total else 0.0,
+        "per_field": {path: c / t for path, (c, t) in sorted(per_field.items())}
+    }
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process and its (waited-for) children."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1e6  # Windows only
+        except (ImportError, AttributeError):
+            return None
+
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * scale / 1e6
+
+def _slowest_series(series: Dict[str, Dict]) -> Optional[Dict]:
+    """The summary of the label set (e.g. LLM field) with the highest p95."""
+    if not series:
+        return None
+    labels = max(series, key=lambda label: series[label]["p95_seconds"])
+    return {"labels": labels, **series[labels]}
+
+def run_mode(mode: str, corpus: str, workers: int, config: Dict) -> Dict:
+    """Process the corpus once in one execution mode and collect the measurements."""
+    from src.metrics import REGISTRY
+    from src.pipeline import DocumentPipeline
+
+    with open(os.path.join(corpus, "ground_truth.json"), "r", encoding="utf-8") as f:
+        ground_truth = json.load(f)
+
+    output_dir = tempfile.mkdtemp(prefix=f"moneypulse-bench-{mode}-")
+    pipeline = DocumentPipeline(output_dir=output_dir, config={**config, "manifest": None, "stage_cache": None})
+    pipeline.warm_up()
+    REGISTRY.reset()
+
+    files = pipeline.list_documents(corpus)
+    start = time.perf_counter()
+    results = pipeline.process_files(files, staged=mode == "staged", processes=workers if mode == "process" else 0)
+    elapsed = time.perf_counter() - start
+
+    latency = REGISTRY.snapshot()
+    stages = {
+        labels.split("stage=")[1]: summary
+        for labels, summary in latency.get("stage_seconds", {}).items() if "outcome=ok" in labels
+    }
+    return {
+        "mode": mode,
+        "workers": workers if mode == "process" else None,
+        "documents": len(results),
+        "failed": sum(1 for r in results if r.get("processing_status") != "completed"),
+        "wall_seconds": elapsed,
+        "docs_per_second": len(results) / elapsed if elapsed else 0.0,
+        "stages": stages,
+        "ocr_page": latency.get("ocr_page_seconds", {}),
+        "llm_call": _slowest_series(latency.get("llm_call_seconds", {})),
+        "peak_rss_mb": peak_rss_mb(),
+        "accuracy": score_accuracy(results, ground_truth),
+        "errors": sorted({r.get("error") for r in results if r.get("error")})[:5]
+    }
+
+def run_mode_isolated(mode: str, args) -> Dict:
+    """Run one mode in a fresh interpreter so peak RSS and warm caches are not shared between modes."""
+    command = [sys.executable, __file__, "--single-mode", mode, "--corpus", args.corpus, "--workers", str(args.workers)]
+    if args.config:
+        command += ["--config", args.config]
+    for host in args.llm_hosts:
+        command += ["--llm-host", host]
+    completed = subprocess.run(command, cwd=str(ROOT), stdout=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{mode} benchmark exited with status {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def compare(report: Dict, baseline: Dict, thresholds: Dict) -> List[str]:
+    """Regressions of the report against the baseline, as human-readable lines."""
+    regressions = []
+    for mode, current in report["modes"].items():
+        previous = baseline.get("modes", {}).get(mode)
+        if not previous:
+            continue
+
+        if previous["docs_per_second"] and \
+                current["docs_per_second"] < previous["docs_per_second"] * (1 - thresholds["throughput"]):
+            regressions.append(f"{mode}: throughput {current['docs_per_second']:.2f} docs/s "
+                               f"< baseline {previous['docs_per_second']:.2f}")
+
+        for stage, summary in current["stages"].items():
+            before = previous["stages"].get(stage)
+            if before and before["p95_seconds"] and \
+                    summary["p95_seconds"] > before["p95_seconds"] * (1 + thresholds["latency"]):
+                regressions.append(f"{mode}: {stage} p95 {summary['p95_seconds']:.3f}s "
+                                   f"> baseline {before['p95_seconds']:.3f}s")
+
+        if previous.get("peak_rss_mb") and current.get("peak_rss_mb") and \
+                current["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + thresholds["rss"]):
+            regressions.append(f"{mode}: peak RSS {current['peak_rss_mb']:.0f} MB > baseline {previous['peak_rss_mb']:.0f} MB")
+
+        accuracy, accuracy_before = current["accuracy"]["field_accuracy"], previous["accuracy"]["field_accuracy"]
+        if accuracy < accuracy_before - thresholds["accuracy"]:
+            regressions.append(f"{mode}: field accuracy {accuracy:.1%} < baseline {accuracy_before:.1%}")
+    return regressions
+
+def print_report(report: Dict):
+    for mode, result in report["modes"].items():
+        rss = f"{result['peak_rss_mb']:.0f} MB" if result.get("peak_rss_mb") else "n/a"
+        print(f"{mode:<11} {result['docs_per_second']:7.2f} docs/s  failed {result['failed']}/{result['documents']}"
+              f"  accuracy {result['accuracy']['field_accuracy']:.1%}  peak RSS {rss}")
+        for stage, summary in result["stages"].items():
+            print(f"    {stage:<11} p50 {summary['p50_seconds']:.3f}s  p95 {summary['p95_seconds']:.3f}s"
+                  f"  p99 {summary['p99_seconds']:.3f}s")
+        for error in result["errors"]:
+            print(f"    error: {error}")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the document pipeline end to end on a synthetic corpus.")
+    parser.add_argument("--corpus", help="corpus directory (default: a fresh temporary corpus)")
+    parser.add_argument("--count", type=int, default=20, help="documents to generate when no corpus is given")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--modes", default="sequential,staged", help=f"comma-separated subset of {','.join(MODES)}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes for the process mode")
+    parser.add_argument("--config", help="pipeline configuration JSON (LLM hosts, CRM mock latency, ...)")
+    parser.add_argument("--llm-host", action="append", default=[], dest="llm_hosts")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="baseline report to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run's report as the new baseline")
+    parser.add_argument("--report", help="also write the full report JSON here")
+    parser.add_argument("--max-throughput-drop", type=float, default=0.10)
+    parser.add_argument("--max-latency-increase", type=float, default=0.20)
+    parser.add_argument("--max-rss-increase", type=float, default=0.15)
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.02)
+    parser.add_argument("--single-mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    if args.llm_hosts:
+        config["llm_hosts"] = args.llm_hosts
+
+    if args.single_mode:
+        import logging
+        logging.disable(logging.INFO)
+        print(json.dumps(run_mode(args.single_mode, args.corpus, args.workers, config), default=str))
+        return 0
+
+    if not args.corpus:
+        from synthetic_corpus import generate_corpus
+
+        args.corpus = tempfile.mkdtemp(prefix="moneypulse-corpus-")
+        generate_corpus(args.corpus, count=args.count, seed=args.seed)
+        print(f"Generated {args.count} synthetic documents in {args.corpus}", file=sys.stderr)
+
+    report = {"corpus": args.corpus, "python": sys.version.split()[0], "modes": {}}
+    for mode in filter(None, args.modes.split(",")):
+        report["modes"][mode] = run_mode_isolated(mode, args)
+    print_report(report)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, {
+        "throughput": args.max_throughput_drop,
+        "latency": args.max_latency_increase,
+        "rss": args.max_rss_increase,
+        "accuracy": args.max_accuracy_drop
+    })
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
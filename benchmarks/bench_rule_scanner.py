@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Rule Scanner Throughput Benchmark
+Compares the compiled, keyword-prefiltered RuleSet against one re.findall per field on large synthetic statements, and checks that both extract the same fields
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.rule_scanner import DEFAULT_RULES, RuleSet
+
+def synthetic_statement(pages: int, seed: int = 7) -> str:
+    """Build OCR-like text for a multi-page bank statement with a few fields per page."""
+    rng = random.Random(seed)
+    words = ("deposit withdrawal transfer card purchase balance fee payroll ach "
+             "merchant pos refund interest check memo pending posted").split()
+
+    out = []
+    for page in range(pages):
+        out.append(f"Business Name: Example Trading Co {page}")
+        out.append(f"EIN: {rng.randint(10, 99)}-{rng.randint(1000000, 9999999)}")
+        out.append(f"Routing: {rng.randint(100000000, 999999999)}  Account: {rng.randint(10**9, 10**10 - 1)}")
+        out.append(f"Contact ops{page}@example.com or ({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}")
+        for _ in range(60):
+            line = " ".join(rng.choice(words) for _ in range(8))
+            out.append(f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d} {line} {rng.randint(1, 99999)}.{rng.randint(0, 99):02d}")
+        out.append("")
+    return "\n".join(out)
+
+def legacy_extract(text: str) -> dict:
+    """The previous _parse_basic approach: one findall per pattern."""
+    fields = {}
+    for rule in DEFAULT_RULES:
+        matches = re.findall(rule["pattern"], text, re.IGNORECASE)
+        if matches:
+            fields[rule["name"]] = matches[0] if len(matches) == 1 else matches
+    return fields
+
+# Several fields on one line: each rule must still see the text another rule matched.
+SAMPLES = [
+    "Business Name: Acme LLC   Phone: (555) 123-4567   Email: ops@acme.com\nEIN: 12-3456789",
+    "Routing: 123456789  Account: 5551234567",
+]
+
+def bench(label: str, func, text: str, repeat: int) -> float:
+    func(text)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    elapsed = (time.perf_counter() - start) / repeat
+    mb = len(text.encode("utf-8")) / 1e6
+    print(f"{label:28} {elapsed * 1000:8.1f} ms/doc  {mb / elapsed:7.1f} MB/s")
+    return elapsed
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = synthetic_statement(args.pages)
+    print(f"Synthetic statement: {args.pages} pages, {len(text) / 1e6:.2f} MB")
+
+    rule_set = RuleSet.default()
+    mismatched = [sample for sample in [text, *SAMPLES] if rule_set.extract(sample) != legacy_extract(sample)]
+    for sample in mismatched:
+        print(f"MISMATCH on {sample[:60]!r}: {rule_set.extract(sample)} != {legacy_extract(sample)}")
+
+    legacy = bench("re.findall per field", legacy_extract, text, args.repeat)
+    compiled = bench("RuleSet.scan (compiled)", rule_set.extract, text, args.repeat)
+    print(f"Speedup: {legacy / compiled:.2f}x")
+    return 1 if mismatched else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
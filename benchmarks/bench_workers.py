@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Worker Scaling Benchmark
+Throughput of --mode process against worker count, with and without the CPU thread budget, to show where oversubscription sets in
+
+Usage:
+    python benchmarks/bench_workers.py --count 40 --workers 1,2,4,8,16
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from argparse import Namespace
+from typing import Dict, List
+
+from bench_pipeline import run_mode_isolated
+from synthetic_corpus import generate_corpus
+
+def default_worker_counts() -> List[int]:
+    cores = os.cpu_count() or 1
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores, cores * 2]
+
+def run_curve(corpus: str, worker_counts: List[int], config: Dict, llm_hosts: List[str]) -> List[Dict]:
+    """One isolated process-mode run per worker count; returns docs/sec and p95 OCR latency for each."""
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(config, f)
+        config_path = f.name
+    try:
+        points = []
+        for workers in worker_counts:
+            args = Namespace(corpus=corpus, workers=workers, config=config_path, llm_hosts=llm_hosts)
+            result = run_mode_isolated("process", args)
+            ocr = result["stages"].get("ocr") or {}
+            points.append({
+                "workers": workers,
+                "docs_per_second": result["docs_per_second"],
+                "ocr_p95_seconds": ocr.get("p95_seconds"),
+                "failed": result["failed"],
+                "peak_rss_mb": result["peak_rss_mb"]
+            })
+            print(f"  {workers:>3} workers  {result['docs_per_second']:7.2f} docs/s  "
+                  f"OCR p95 {ocr.get('p95_seconds') or 0:.3f}s  failed {result['failed']}/{result['documents']}",
+                  file=sys.stderr)
+        return points
+    finally:
+        os.remove(config_path)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure throughput against worker count with and without the CPU budget.")
+    parser.add_argument("--corpus", help="corpus directory (default: a fresh temporary corpus)")
+    parser.add_argument("--count", type=int, default=40, help="documents to generate when no corpus is given")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", help="comma-separated worker counts (default: powers of two up to 2x the cores)")
+    parser.add_argument("--cpu-budget", default="auto", help="cores for the budgeted curve (default: auto)")
+    parser.add_argument("--config", help="base pipeline configuration JSON")
+    parser.add_argument("--llm-host", action="append", default=[], dest="llm_hosts")
+    parser.add_argument("--report", help="write both curves as JSON here")
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+    if not args.corpus:
+        args.corpus = tempfile.mkdtemp(prefix="moneypulse-corpus-")
+        generate_corpus(args.corpus, count=args.count, seed=args.seed)
+        print(f"Generated {args.count} synthetic documents in {args.corpus}", file=sys.stderr)
+
+    worker_counts = [int(n) for n in args.workers.split(",")] if args.workers else default_worker_counts()
+    report = {"corpus": args.corpus, "cores": os.cpu_count(), "curves": {}}
+    for name, budget in (("unbudgeted", None), ("budgeted", args.cpu_budget)):
+        print(f"{name} (cpu_budget={budget}):", file=sys.stderr)
+        report["curves"][name] = run_curve(args.corpus, worker_counts, {**config, "cpu_budget": budget}, args.llm_hosts)
+
+    print(f"{'workers':>7}  {'unbudgeted':>12}  {'budgeted':>12}")
+    for plain, budgeted in zip(report["curves"]["unbudgeted"], report["curves"]["budgeted"]):
+        print(f"{plain['workers']:>7}  {plain['docs_per_second']:>8.2f} d/s  {budgeted['docs_per_second']:>8.2f} d/s")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
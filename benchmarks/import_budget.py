@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Import-Time Budget Check
+Fails when cold-importing the pipeline regresses past its budget or pulls in heavy libraries
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that must never be imported just to open the window or build a pipeline.
+HEAVY_MODULES = ("torch", "transformers", "cv2", "zeep", "numpy", "pytesseract", "pdf2image")
+
+# Extra modules a specific entry point must not pull in (the headless CLI runs without Qt).
+FORBIDDEN_MODULES = {
+    "src.cli": ("PySide6", "qtawesome", "qdarkstyle", "pyqtgraph"),
+}
+
+DEFAULT_BUDGETS_MS = {
+    "src.pipeline": 250,
+    "src.cli": 250,
+}
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """Import a module in a fresh interpreter and return (cumulative ms, imported module names)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(BASE_DIR),
+        capture_output=True,
+        text=True
+    )
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+
+    total_us = 0
+    imported = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported.append(name.strip())
+
+        # Only top-level entries (no indentation) count towards the total,
+        # nested ones are already part of their parent's cumulative time.
+        if not name.startswith("  ", 1):
+            total_us += int(cumulative.strip())
+
+    return total_us / 1000.0, imported
+
+def check_budgets(budgets: Dict[str, float]) -> bool:
+    """Measure every module against its budget and print a report."""
+    ok = True
+
+    for module, budget_ms in budgets.items():
+        elapsed_ms, imported = measure_import(module)
+        banned = HEAVY_MODULES + FORBIDDEN_MODULES.get(module, ())
+        heavy = sorted({
+            name.split(".")[0] for name in imported
+            if name.split(".")[0] in banned
+        })
+
+        status = "OK"
+        if elapsed_ms > budget_ms or heavy:
+            status = "FAIL"
+            ok = False
+
+        print(f"{status:4}  {module}: {elapsed_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+        if heavy:
+            print(f"      heavy modules imported eagerly: {', '.join(heavy)}")
+
+    return ok
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", help="modules to check (default: src.pipeline)")
+    parser.add_argument("--budget-ms", type=float, help="budget applied to every module given")
+    args = parser.parse_args()
+
+    if args.modules:
+        budgets = {m: args.budget_ms or DEFAULT_BUDGETS_MS.get(m, 250) for m in args.modules}
+    else:
+        budgets = {m: args.budget_ms or b for m, b in DEFAULT_BUDGETS_MS.items()}
+
+    return 0 if check_budgets(budgets) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Synthetic Document Corpus
+Renders merchant applications, W-9s, voided checks, multi-page bank statements and broker packets to PDF/PNG with ground truth
+
+Usage:
+    python benchmarks/synthetic_corpus.py benchmarks/corpus --count 40 --packets 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Dict, List, Optional, Tuple
+
+DOCUMENT_TYPES = ("application", "w9", "voided_check", "bank_statement")
+
+# Letter size at 200 DPI, the resolution pdf2image rasterises to by default.
+PAGE_SIZE = (1700, 2200)
+DPI = 200
+
+STATES = ("CA", "NY", "TX", "FL", "IL", "WA", "GA", "NJ", "OH", "AZ")
+CITIES = ("Springfield", "Riverside", "Fairview", "Georgetown", "Madison", "Clinton", "Franklin", "Salem")
+STREETS = ("Main St", "Oak Ave", "Market St", "Cedar Rd", "Elm St", "Harbor Blvd", "Pine St", "Lake Dr")
+NAME_PARTS = (("Blue", "Summit", "Golden", "Evergreen", "Prime", "Metro", "Coastal", "Liberty"),
+              ("Bakery", "Auto Repair", "Dental", "Logistics", "Cafe", "Fitness", "Supply", "Salon"),
+              ("LLC", "Inc", "Co", "Group"))
+BUSINESS_TYPES = ("Restaurant", "Retail", "Auto Services", "Healthcare", "Transportation", "Personal Services")
+
+FONT_CANDIDATES = (
+    "DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+)
+
+def _merchant(rng: random.Random) -> Dict:
+    name = " ".join(rng.choice(part) for part in NAME_PARTS)
+    domain = name.split()[0].lower() + name.split()[1].lower().replace(" ", "")
+    return {
+        "merchant_name": name,
+        "ein_or_ssn": f"{rng.randint(10, 99)}{rng.randint(1000000, 9999999)}",
+        "address": {
+            "street": f"{rng.randint(100, 9999)} {rng.choice(STREETS)}",
+            "city": rng.choice(CITIES),
+            "state": rng.choice(STATES),
+            "zip": f"{rng.randint(10000, 99999)}"
+        },
+        "contact_info": {
+            "phone": f"{rng.randint(200, 989)}{rng.randint(200, 999)}{rng.randint(1000, 9999)}",
+            "email": f"owner@{domain}.com"
+        },
+        "business_info": {
+            "business_type": rng.choice(BUSINESS_TYPES),
+            "annual_revenue": str(rng.randrange(150_000, 5_000_000, 1000)),
+            "years_in_business": str(rng.randint(1, 30))
+        },
+        "requested_amount": str(rng.randrange(10_000, 250_000, 500))
+    }
+
+def _phone(digits: str) -> str:
+    return f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+
+def _ein(digits: str) -> str:
+    return f"{digits[:2]}-{digits[2:]}"
+
+def _address_lines(m: Dict) -> List[str]:
+    a = m["address"]
+    return [f"Address: {a['street']}", f"{a['city']}, {a['state']} {a['zip']}"]
+
+def _application(m: Dict, rng: random.Random) -> Tuple[List[List[str]], Dict]:
+    page = [
+        "MERCHANT CASH ADVANCE APPLICATION", "",
+        f"Business Name: {m['merchant_name']}",
+        f"Federal Tax ID (EIN): {_ein(m['ein_or_ssn'])}",
+        *_address_lines(m),
+        f"Phone: {_phone(m['contact_info']['phone'])}",
+        f"Email: {m['contact_info']['email']}", "",
+        f"Type of Business: {m['business_info']['business_type']}",
+        f"Annual Revenue: ${int(m['business_info']['annual_revenue']):,}",
+        f"Years in Business: {m['business_info']['years_in_business']}",
+        f"Requested Amount: ${int(m['requested_amount']):,}", "",
+        "Owner Signature: ______________________   Date: ____________",
+    ]
+    truth = {k: m[k] for k in ("merchant_name", "ein_or_ssn", "address", "contact_info", "requested_amount")}
+    truth["business_info"] = {k: m["business_info"][k] for k in ("business_type", "annual_revenue", "years_in_business")}
+    return [page], truth
+
+def _w9(m: Dict, rng: random.Random) -> Tuple[List[List[str]], Dict]:
+    page = [
+        "Form W-9  Request for Taxpayer Identification Number and Certification", "",
+        f"1 Name (as shown on your income tax return): {m['merchant_name']}",
+        "3 Federal tax classification: Limited liability company",
+        f"5 Address: {m['address']['street']}",
+        f"6 City, state, and ZIP code: {m['address']['city']}, {m['address']['state']} {m['address']['zip']}", "",
+        "Part I  Taxpayer Identification Number (TIN)",
+        f"Employer identification number: {_ein(m['ein_or_ssn'])}", "",
+        "Part II  Certification",
+        "Signature of U.S. person: ______________________",
+    ]
+    return [page], {k: m[k] for k in ("merchant_name", "ein_or_ssn", "address")}
+
+def _voided_check(m: Dict, rng: random.Random) -> Tuple[List[List[str]], Dict]:
+    routing = f"{rng.randint(10000000, 99999999)}{rng.randint(0, 9)}"
+    account = str(rng.randint(10**9, 10**11))
+    page = [
+        m["merchant_name"].upper(),
+        *_address_lines(m), "",
+        "PAY TO THE ORDER OF ________________________   $ ________",
+        "",
+        "                    V O I D",
+        "",
+        f"Routing Number: {routing}    Account Number: {account}",
+    ]
+    return [page], {"merchant_name": m["merchant_name"], "address": m["address"]}
+
+def _bank_statement(m: Dict, rng: random.Random, pages: int, period: Optional[str] = None) -> Tuple[List[List[str]], Dict]:
+    balance = rng.randint(5_000, 80_000)
+    rendered = []
+    for number in range(1, pages + 1):
+        page = [f"BUSINESS CHECKING STATEMENT   Page {number} of {pages}"]
+        if number == 1:
+            page += [f"Account Holder: {m['merchant_name']}", *_address_lines(m)]
+            page += [f"Statement Period: {period}", ""] if period else [""]
+        page += ["Date    Description                       Amount      Balance"]
+        for _ in range(24):
+            amount = rng.randint(-4000, 6000)
+            balance += amount
+            description = rng.choice(("CARD SETTLEMENT", "ACH PAYROLL", "POS DEPOSIT", "WIRE TRANSFER", "SUPPLIER PMT"))
+            page.append(f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}   {description:<32} {amount:>9,}   {balance:>10,}")
+        rendered.append(page)
+    return rendered, {"merchant_name": m["merchant_name"], "address": m["address"]}
+
+def build_document(doc_type: str, rng: random.Random, statement_pages: int = 3) -> Tuple[List[List[str]], Dict]:
+    """Page text lines and ground-truth fields for one synthetic document."""
+    merchant = _merchant(rng)
+    if doc_type == "application":
+        pages, truth = _application(merchant, rng)
+    elif doc_type == "w9":
+        pages, truth = _w9(merchant, rng)
+    elif doc_type == "voided_check":
+        pages, truth = _voided_check(merchant, rng)
+    else:
+        pages, truth = _bank_statement(merchant, rng, statement_pages)
+    truth["document_type"] = doc_type
+    return pages, truth
+
+def build_packet(rng: random.Random, statement_months: int = 3, statement_pages: int = 2) -> Tuple[List[List[str]], Dict]:
+    """
+    A broker packet for one merchant: application, W-9, voided check and
+    monthly statements in one PDF. Ground truth is the merchant record plus
+    each part's type and page range.
+    """
+    merchant = _merchant(rng)
+    documents = [("application", _application(merchant, rng)), ("w9", _w9(merchant, rng)),
+                 ("voided_check", _voided_check(merchant, rng))]
+    documents += [("bank_statement", _bank_statement(merchant, rng, statement_pages,
+                                                     period=f"{month:02d}/01/2024 - {month:02d}/28/2024"))
+                  for month in range(1, statement_months + 1)]
+
+    pages, parts = [], []
+    for doc_type, (doc_pages, _) in documents:
+        parts.append({"document_type": doc_type, "first_page": len(pages) + 1, "last_page": len(pages) + len(doc_pages)})
+        pages += doc_pages
+
+    truth = dict(documents[0][1][1], document_type="packet", parts=parts)
+    return pages, truth
+
+def _load_font(size: int):
+    from PIL import ImageFont
+
+    for candidate in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+def render_pages(pages: List[List[str]], rng: random.Random, noise: bool = True):
+    """Draw text lines onto white letter-size pages, with slight skew and speckle like a scan."""
+    from PIL import Image, ImageDraw
+
+    font = _load_font(32)
+    images = []
+    for lines in pages:
+        image = Image.new("L", PAGE_SIZE, 255)
+        draw = ImageDraw.Draw(image)
+        y = 150
+        for line in lines:
+            draw.text((140, y), line, fill=0, font=font)
+            y += 52
+        if noise:
+            for _ in range(1500):
+                draw.point((rng.randrange(PAGE_SIZE[0]), rng.randrange(PAGE_SIZE[1])), fill=rng.randint(120, 200))
+            image = image.rotate(rng.uniform(-0.8, 0.8), fillcolor=255)
+        images.append(image.convert("RGB"))
+    return images
+
+def generate_corpus(directory: str, count: int = 20, seed: int = 42, formats: Tuple[str, ...] = ("pdf", "png"),
+                    statement_pages: int = 3, packets: int = 0) -> Dict[str, Dict]:
+    """
+    Write `count` documents (cycling through the document types), `packets`
+    multi-document PDFs and ground_truth.json to `directory`; returns the
+    ground truth by filename. Bank statements are always multi-page PDFs;
+    the other types alternate between the requested formats.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    ground_truth = {}
+
+    for index in range(count):
+        doc_type = DOCUMENT_TYPES[index % len(DOCUMENT_TYPES)]
+        pages, truth = build_document(doc_type, rng, statement_pages)
+        images = render_pages(pages, rng)
+
+        extension = "pdf" if doc_type == "bank_statement" else formats[(index // len(DOCUMENT_TYPES)) % len(formats)]
+        filename = f"{index:04d}_{doc_type}.{extension}"
+        path = os.path.join(directory, filename)
+        if extension == "pdf":
+            images[0].save(path, "PDF", resolution=DPI, save_all=True, append_images=images[1:])
+        else:
+            images[0].save(path)
+
+        truth["pages"] = len(images)
+        ground_truth[filename] = truth
+
+    for index in range(packets):
+        pages, truth = build_packet(rng)
+        images = render_pages(pages, rng)
+        filename = f"packet_{index:04d}.pdf"
+        images[0].save(os.path.join(directory, filename), "PDF", resolution=DPI, save_all=True, append_images=images[1:])
+        truth["pages"] = len(images)
+        ground_truth[filename] = truth
+
+    with open(os.path.join(directory, "ground_truth.json"), "w", encoding="utf-8") as f:
+        json.dump(ground_truth, f, indent=2)
+    return ground_truth
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Render a synthetic merchant document corpus with ground truth.")
+    parser.add_argument("directory")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--formats", default="pdf,png", help="formats for single-page documents (default: pdf,png)")
+    parser.add_argument("--statement-pages", type=int, default=3)
+    parser.add_argument("--packets", type=int, default=0, help="multi-document packet PDFs to add (default: 0)")
+    args = parser.parse_args()
+
+    truth = generate_corpus(args.directory, args.count, args.seed, tuple(args.formats.split(",")), args.statement_pages,
+                            args.packets)
+    pages = sum(t["pages"] for t in truth.values())
+    print(f"Wrote {len(truth)} documents ({pages} pages) and ground_truth.json to {args.directory}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,7 @@ AI-Powered Document Processing Pipeline - Main Entry Point
 
 import sys
 import logging
+import multiprocessing
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -47,4 +48,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # Needed for process-pool batch mode in the frozen Windows executable.
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Async Document Pipeline
+asyncio front end to DocumentPipeline for embedding MoneyPulse in async services
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Optional
+
+from .pipeline import DocumentPipeline
+from .packet_splitter import part_plan_kwargs
+
+logger = logging.getLogger(__name__)
+
+class AsyncDocumentPipeline:
+    """
+    Non-blocking document processing on top of a DocumentPipeline.
+
+    OCR, local model inference and validation run in a thread pool; with LLM
+    servers configured (``llm_hosts``) the field prompts go out concurrently
+    over aiohttp, and with a ``crm_connector`` config the CRM submission
+    does too. A semaphore caps how many documents are in flight at once.
+
+    Usage::
+
+        async with AsyncDocumentPipeline(config=config) as pipeline:
+            async for result in pipeline.process_directory("input"):
+                ...
+    """
+
+    def __init__(self, output_dir: str = "output", config: Dict = None, max_concurrent_documents: int = 4,
+                 executor_workers: Optional[int] = None, pipeline: Optional[DocumentPipeline] = None):
+        self.pipeline = pipeline or DocumentPipeline(output_dir=output_dir, config=config)
+        self.config = self.pipeline.config
+        self.max_concurrent_documents = max_concurrent_documents
+
+        workers = executor_workers or self.config.get('async_executor_workers') or min(8, (os.cpu_count() or 1) + 2)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="async-pipeline")
+
+        self.crm_connector = None
+        if self.config.get('crm_connector'):
+            from .crm_submit import EnterpriseCRMConnector
+            self.crm_connector = EnterpriseCRMConnector(self.config['crm_connector'])
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncDocumentPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_documents)
+        return self._semaphore
+
+    async def warm_up(self) -> Dict:
+        """Load OCR libraries and the LLM without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.pipeline.warm_up)
+
+    async def process_single_document(self, file_path: str) -> Dict:
+        """Process one document; waits for a slot when max_concurrent_documents are in flight."""
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            # Hashing the file and manifest writes are blocking I/O.
+            context = await loop.run_in_executor(self.executor, self.pipeline._start_document, file_path)
+
+            try:
+                for stage in self.pipeline.PIPELINE_STAGES:
+                    context = await self._run_stage(stage, context)
+                return await loop.run_in_executor(self.executor, self.pipeline._finish_document, context)
+
+            except Exception as e:
+                return await loop.run_in_executor(self.executor, self.pipeline._failed_result, context, e)
+
+    async def process_directory(self, input_dir: str, write_summary: bool = True) -> AsyncIterator[Dict]:
+        """
+        Yield results as documents finish, each tagged with its ``input_index``.
+
+        Only a bounded window of documents is scheduled at a time, so large
+        directories do not create a task per file up front. The CSV summary
+        is written, in input order, after the last result.
+        """
+        files = self.pipeline.list_documents(input_dir)
+        if not files:
+            logger.warning(f"No supported documents found in {input_dir}")
+            return
+
+        logger.info(f"Found {len(files)} documents to process")
+
+        async def run(index: int, file_path: str) -> Dict:
+            result = await self.process_single_document(file_path)
+            result["input_index"] = index
+            return result
+
+        window = self.max_concurrent_documents * 2
+        pending = set()
+        collected = {}
+        next_index = 0
+
+        while next_index < len(files) or pending:
+            while next_index < len(files) and len(pending) < window:
+                pending.add(asyncio.ensure_future(run(next_index, files[next_index])))
+                next_index += 1
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                collected[result["input_index"]] = result
+                yield result
+
+        if write_summary:
+            documents = [collected[index] for index in sorted(collected)]
+            loop = asyncio.get_running_loop()
+            try:
+                csv_file = await loop.run_in_executor(self.executor, self.pipeline.crm.generate_csv_summary, documents)
+                logger.info(f"Generated CSV summary: {csv_file}")
+            except Exception as e:
+                logger.error(f"Failed to generate CSV summary: {str(e)}")
+            await loop.run_in_executor(self.executor, self.pipeline.write_metrics_file)
+            await loop.run_in_executor(self.executor, self.pipeline.write_trace_file)
+            await loop.run_in_executor(self.executor, self.pipeline.close_replay_recorder)
+
+    async def _run_stage(self, stage: str, context: Dict) -> Dict:
+        """Run a stage natively async when it has an async form, otherwise in the executor."""
+        handler = getattr(self, f"_astage_{stage}", None)
+        if handler is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.pipeline._run_stage, stage, context)
+        if stage in context["resumed_stages"]:
+            return context
+
+        # Documents interleave on the event loop thread, so their stage spans go on async tracks.
+        with self.pipeline.tracer.span(stage, cat="stage", parent=context.get("trace_span"), async_track=True,
+                                       file=context["filename"]) as span:
+            stage_start = time.perf_counter()
+            cache_key = self.pipeline._stage_cache_key(stage, context, crm_connector=self.crm_connector)
+            if cache_key and self.pipeline._load_cached_stage(stage, cache_key, context):
+                span.set(cache_hit=True)
+                self.pipeline._observe_stage(stage, context, stage_start, "cached")
+                self.pipeline._record_stage(stage, context)
+                return context
+            if cache_key:
+                span.set(cache_hit=False)
+
+            try:
+                context = await handler(context)
+            except Exception:
+                context["failed_stage"] = stage
+                self.pipeline._observe_stage(stage, context, stage_start, "error")
+                raise
+            self.pipeline._observe_stage(stage, context, stage_start, "ok")
+
+            if cache_key:
+                self.pipeline._store_cached_stage(stage, cache_key, context)
+            self.pipeline._record_stage(stage, context)
+            return context
+
+    async def _astage_llm(self, context: Dict) -> Dict:
+        llm = self.pipeline.llm
+        if not hasattr(llm, 'aparse_document'):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.pipeline._stage_llm, context)
+
+        parts = self.pipeline._packet_parts(context)
+        if parts:
+            parsed = await asyncio.gather(*(
+                llm.aparse_document(part["text"], self.pipeline._part_filename(context, part), executor=self.executor,
+                                    **part_plan_kwargs(part))
+                for part in parts
+            ))
+            context["parsed_data"] = self.pipeline._merge_packet(context, parts, list(parsed))
+            return context
+
+        context["parsed_data"] = await llm.aparse_document(context["extracted_text"], context["filename"],
+                                                           executor=self.executor,
+                                                           **self.pipeline._llm_plan_kwargs(context))
+        return context
+
+    async def _astage_crm(self, context: Dict) -> Dict:
+        context["submission_result"] = await self.pipeline.crm.asubmit_document(
+            context["validated_data"], connector=self.crm_connector, executor=self.executor
+        )
+        return context
+
+    async def aclose(self):
+        """Close async HTTP sessions and shut the executor down."""
+        client = getattr(self.pipeline.llm, 'client', None)
+        if client is not None and hasattr(client, 'aclose'):
+            await client.aclose()
+        if self.crm_connector is not None:
+            await self.crm_connector.aclose()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Headless Batch Runner
+Command-line entry point over DocumentPipeline for unattended batch jobs (never imports Qt)
+
+Usage:
+    python -m src.cli input/ --mode process --workers 4 --format jsonl --resume
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Union
+
+from .pipeline import DocumentPipeline
+
+logger = logging.getLogger(__name__)
+
+RESULT_FORMATS = ("jsonl", "json", "none")
+
+def parse_stage_workers(value: str) -> Dict[str, int]:
+    """Parse 'ocr=2,llm=1,crm=4' into a stage -> workers mapping."""
+    workers = {}
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        name, _, count = part.partition("=")
+        if name not in DocumentPipeline.PIPELINE_STAGES or not count.isdigit():
+            raise argparse.ArgumentTypeError(f"invalid stage worker setting: {part!r}")
+        workers[name] = int(count)
+    return workers
+
+def parse_cpu_budget(value: str) -> Union[str, int, None]:
+    """'auto', or a core count where 0 means leave threading alone (None)."""
+    if value == "auto":
+        return value
+    if not value.isdigit():
+        raise argparse.ArgumentTypeError(f"invalid CPU budget: {value!r} (use 'auto' or a number of cores)")
+    return int(value) or None
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="Process a directory of merchant documents without the GUI."
+    )
+    parser.add_argument("input_dir", nargs="?", default="input", help="directory of PDF/PNG/JPG documents (default: input)")
+    parser.add_argument("--output-dir", default="output", help="where JSON files, CSV summary and logs go (default: output)")
+
+    execution = parser.add_argument_group("execution")
+    execution.add_argument("--mode", choices=("sequential", "staged", "process"), default="sequential",
+                           help="sequential, overlapping stages in threads, or worker processes")
+    execution.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                           help="worker processes for --mode process (default: CPU count)")
+    execution.add_argument("--stage-workers", type=parse_stage_workers, default={},
+                           help="threads per stage for --mode staged, e.g. ocr=2,llm=1,crm=4")
+    execution.add_argument("--chunk-size", type=int, help="documents per work unit in --mode process")
+    execution.add_argument("--ocr-page-workers", type=int, metavar="N",
+                           help="OCR the pages of multi-page PDFs in N worker processes, passing rasters through "
+                                "shared memory (sequential and staged modes)")
+    execution.add_argument("--cpu-budget", type=parse_cpu_budget, default="auto", metavar="CORES",
+                           help="cores to spread over concurrent workers; torch, OpenCV and Tesseract get "
+                                "CORES / workers threads each ('auto' = all available, 0 = leave unlimited)")
+    execution.add_argument("--memory-budget", type=float, metavar="MB",
+                           help="keep projected memory under MB: documents wait, PDFs are rasterised at lower DPI "
+                                "and --mode process starts fewer workers rather than running out of memory")
+    execution.add_argument("--model-memory", type=float, metavar="MB",
+                           help="memory a local LLM takes once loaded, counted against --memory-budget")
+
+    engines = parser.add_argument_group("engines")
+    engines.add_argument("--tesseract-path", help="path to the tesseract executable")
+    engines.add_argument("--model", help="LLM model name (transformers model, or server-side model with --llm-host)")
+    engines.add_argument("--llm-provider", default="ollama", help="LLM server type for --llm-host (default: ollama)")
+    engines.add_argument("--llm-host", action="append", default=[], dest="llm_hosts",
+                         help="LLM server URL; repeat to load-balance across several servers")
+    engines.add_argument("--classify", action="store_true",
+                         help="classify each document from its first page and extract only the fields its type "
+                              "needs; W-9s, voided checks and bank statements are OCR'd on page 1 only")
+    engines.add_argument("--classifier-embedding-model", metavar="MODEL",
+                         help="sentence-transformers model that types documents the keywords cannot (implies --classify)")
+    engines.add_argument("--split-packets", action="store_true",
+                         help="split PDFs that bundle several documents (application, W-9, check, statements) into "
+                              "parts, parse them concurrently and merge them into one merchant record")
+    engines.add_argument("--config", help="JSON file with pipeline configuration; flags override it")
+
+    watch = parser.add_argument_group("watch mode")
+    watch.add_argument("--watch", action="store_true",
+                       help="keep running and process documents as they arrive in input_dir (and subfolders)")
+    watch.add_argument("--watch-workers", type=int, default=1, help="documents processed at once in --watch mode")
+    watch.add_argument("--done-dir", help="where processed documents are moved (default: processed/done next to input_dir)")
+    watch.add_argument("--failed-dir", help="where failed documents are moved (default: processed/failed next to input_dir)")
+    watch.add_argument("--settle-seconds", type=float, default=2.0,
+                       help="how long a file must stop changing before it is picked up (default: 2)")
+    watch.add_argument("--poll", action="store_true", help="scan the folder instead of using filesystem events")
+
+    replay = parser.add_argument_group("record / replay")
+    replay.add_argument("--record-replay", metavar="FILE",
+                        help="record each document's OCR text and parser output to FILE (gzip JSON lines)")
+    replay.add_argument("--replay", metavar="FILE",
+                        help="skip OCR and the LLM: run validation, CRM submission and export on a recording")
+    replay.add_argument("--replay-repeat", type=int, default=1, metavar="N",
+                        help="cycle through the recording N times for a larger load (default: 1)")
+    replay.add_argument("--crm-mock-latency", type=float, metavar="SECONDS",
+                        help="simulated CRM round trip (default: random 0.5-1.5s; use 0 for load tests)")
+    replay.add_argument("--crm-mock-seed", type=int,
+                        help="seed the mock CRM's latency and IDs so runs are reproducible")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--format", choices=RESULT_FORMATS, default="jsonl",
+                        help="per-document results file format (default: jsonl, appended as documents finish)")
+    output.add_argument("--results-file", help="results file path (default: <output-dir>/batch_results.<format>)")
+    output.add_argument("--summary-file", help="also write the run summary JSON here")
+    output.add_argument("--resume", action="store_true",
+                        help="reuse stage results recorded by earlier runs: finished documents are not reprocessed "
+                             "or resubmitted, interrupted ones continue from their last completed stage")
+    output.add_argument("--no-manifest", action="store_true",
+                        help="do not record per-stage progress in the processing manifest")
+    output.add_argument("--stage-cache", action="store_true",
+                        help="reuse cached stage outputs whose stage version, config and inputs are unchanged")
+    output.add_argument("--manifest-path", help="manifest database (default: <output-dir>/cache/manifest.sqlite3)")
+    output.add_argument("--metrics-file",
+                        help="write per-stage/page/LLM-call latency histograms here in Prometheus text format")
+    output.add_argument("--metrics-port", type=int,
+                        help="serve the same metrics on http://127.0.0.1:PORT/metrics while running")
+    output.add_argument("--trace-file",
+                        help="write per-document spans (document > stage > page/field) as Chrome trace-event JSON; "
+                             "open it at ui.perfetto.dev")
+    output.add_argument("--profile-every", type=int, metavar="N",
+                        help="profile every Nth document with cProfile and tracemalloc (reports in <output-dir>/profiles)")
+    output.add_argument("--profile-slower-than", type=float, metavar="SECONDS",
+                        help="keep profiles of documents that take longer than this")
+    output.add_argument("--profile-dir", help="where profile reports go (default: <output-dir>/profiles)")
+    output.add_argument("--log-level", default="WARNING", help="console log level (default: WARNING)")
+    output.add_argument("--no-progress", action="store_true", help="do not print the live progress line")
+    return parser
+
+def build_config(args) -> Dict:
+    config = {}
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+
+    if args.tesseract_path:
+        config["tesseract_path"] = args.tesseract_path
+    if args.model:
+        config["model"] = args.model
+    if args.llm_hosts:
+        config["llm_hosts"] = args.llm_hosts
+        config["llm_provider"] = args.llm_provider
+    if args.stage_workers:
+        config["stage_workers"] = {**config.get("stage_workers", {}), **args.stage_workers}
+    if args.chunk_size:
+        config["process_chunk_size"] = args.chunk_size
+    if args.cpu_budget != "auto" or "cpu_budget" not in config:
+        config["cpu_budget"] = args.cpu_budget
+    if args.ocr_page_workers:
+        config["ocr_page_workers"] = args.ocr_page_workers
+    if args.classify or args.classifier_embedding_model:
+        config["classify_documents"] = True
+    if args.classifier_embedding_model:
+        config["classifier_embedding_model"] = args.classifier_embedding_model
+    if args.split_packets:
+        config["split_packets"] = True
+    if args.memory_budget:
+        config["memory_budget_mb"] = args.memory_budget
+    if args.model_memory:
+        config["memory_model_mb"] = args.model_memory
+    if args.no_manifest:
+        config["manifest"] = None
+    else:
+        config["manifest"] = "resume" if args.resume else config.get("manifest") or "record"
+    if args.manifest_path:
+        config["manifest_path"] = args.manifest_path
+    if args.stage_cache:
+        config["stage_cache"] = True
+    if args.metrics_file:
+        config["metrics_file"] = args.metrics_file
+    if args.metrics_port:
+        config["metrics_port"] = args.metrics_port
+    if args.trace_file:
+        config["trace_file"] = args.trace_file
+    if args.profile_every:
+        config["profile_every"] = args.profile_every
+    if args.profile_slower_than:
+        config["profile_slower_than"] = args.profile_slower_than
+    if args.profile_dir:
+        config["profile_dir"] = args.profile_dir
+    if args.record_replay:
+        config["replay_record"] = args.record_replay
+    if args.crm_mock_latency is not None:
+        config["crm_mock_latency"] = args.crm_mock_latency
+    if args.crm_mock_seed is not None:
+        config["crm_mock_seed"] = args.crm_mock_seed
+    return config
+
+class ProgressReporter:
+    """Live docs/sec and mean per-stage timings on stderr."""
+
+    def __init__(self, total: int, enabled: bool = True, stream=None):
+        self.total = total
+        self.enabled = enabled
+        self.stream = stream or sys.stderr
+        self.start_time = time.perf_counter()
+        self.completed = 0
+        self.failed = 0
+        self.stage_timings: Dict[str, List[float]] = {}
+
+    def record(self, result: Dict):
+        self.completed += 1
+        if result.get("processing_status") != "completed":
+            self.failed += 1
+        for stage, seconds in (result.get("stage_timings") or {}).items():
+            self.stage_timings.setdefault(stage, []).append(seconds)
+        self.render()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.completed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def render(self):
+        if not self.enabled:
+            return
+        stages = "  ".join(
+            f"{stage} {sum(values) / len(values):.2f}s" for stage, values in self.stage_timings.items()
+        )
+        line = (f"[{self.completed}/{self.total}] {self.docs_per_second:.2f} docs/s"
+                f"  failed {self.failed}  {stages}")
+        if self.stream.isatty():
+            self.stream.write(f"\r\033[K{line}")
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        if self.enabled and self.stream.isatty():
+            self.stream.write("\n")
+            self.stream.flush()
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        summary = {}
+        for stage, values in self.stage_timings.items():
+            ordered = sorted(values)
+            summary[stage] = {
+                "mean_seconds": sum(ordered) / len(ordered),
+                "p95_seconds": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+                "total_seconds": sum(ordered)
+            }
+        return summary
+
+def _configure_logging(level: str):
+    level = getattr(logging, level.upper(), logging.WARNING)
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)-8s %(name)s: %(message)s", stream=sys.stderr)
+
+    # The pipeline logger is set to DEBUG and installs its own console handler
+    # at INFO; filter at the console handlers so the progress line stays readable.
+    pipeline_logger = logging.getLogger("src.pipeline")
+    for handler in logging.getLogger().handlers + pipeline_logger.handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(level)
+    if pipeline_logger.handlers:
+        pipeline_logger.propagate = False
+
+def run_watch(args) -> int:
+    """Run as a daemon: watch input_dir and process documents as they arrive."""
+    from .watcher import FolderWatcher
+
+    pipeline = DocumentPipeline(output_dir=args.output_dir, config=build_config(args))
+    _configure_logging(args.log_level)
+    reporter = ProgressReporter(0, enabled=not args.no_progress)
+
+    def on_result(result: Dict):
+        reporter.total = reporter.completed + 1
+        reporter.record(result)
+
+    watcher = FolderWatcher(
+        pipeline,
+        input_dir=args.input_dir,
+        done_dir=args.done_dir,
+        failed_dir=args.failed_dir,
+        settle_seconds=args.settle_seconds,
+        workers=args.watch_workers,
+        use_watchdog=False if args.poll else None,
+        results_file=args.results_file,
+        on_result=on_result
+    )
+    print(f"Watching {watcher.input_dir} (Ctrl+C to stop)", file=sys.stderr)
+    watcher.run_forever()
+    reporter.finish()
+    print(json.dumps({"watch": watcher.stats, "backend": watcher.backend}, indent=2))
+    return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.watch:
+        return run_watch(args)
+
+    try:
+        config = build_config(args)
+        pipeline = DocumentPipeline(output_dir=args.output_dir, config=config)
+        _configure_logging(args.log_level)
+        files = [] if args.replay else pipeline.list_documents(args.input_dir)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    results_file = None
+    if args.format != "none":
+        results_file = args.results_file or os.path.join(args.output_dir, f"batch_results.{args.format}")
+
+    reporter = ProgressReporter(len(files), enabled=not args.no_progress)
+    results_handle = None
+    if results_file and args.format == "jsonl":
+        # Resumed documents are reported again from the manifest, so the file is always rewritten whole.
+        results_handle = open(results_file, "w", encoding="utf-8")
+
+    def on_result(result: Dict):
+        reporter.record(result)
+        if results_handle:
+            results_handle.write(json.dumps(result, default=str) + "\n")
+            results_handle.flush()
+
+    results: List[Dict] = []
+    def on_progress(done: int, total: int, message: str):
+        reporter.total = total
+
+    try:
+        if args.replay:
+            results = pipeline.replay(args.replay, repeat=args.replay_repeat, staged=args.mode == "staged",
+                                      progress_callback=on_progress, result_callback=on_result)
+        elif files:
+            results = pipeline.process_files(
+                files,
+                staged=args.mode == "staged",
+                processes=args.workers if args.mode == "process" else 0,
+                result_callback=on_result
+            )
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun with --resume to continue", file=sys.stderr)
+        return 130
+    finally:
+        reporter.finish()
+        if results_handle:
+            results_handle.close()
+
+    if results_file and args.format == "json":
+        with open(results_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, default=str)
+
+    summary = {
+        "run": {
+            "input_dir": args.input_dir,
+            "replay_file": args.replay,
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "process" else None,
+            "documents": len(results),
+            "resumed": sum(1 for r in results if set(r.get("resumed_stages", ())) == set(DocumentPipeline.PIPELINE_STAGES)),
+            "partially_resumed": sum(1 for r in results if r.get("resumed_stages") and not r.get("replayed")
+                                     and set(r["resumed_stages"]) != set(DocumentPipeline.PIPELINE_STAGES)),
+            "replayed": sum(1 for r in results if r.get("replayed")),
+            "failed": reporter.failed,
+            "wall_seconds": reporter.elapsed,
+            "docs_per_second": reporter.docs_per_second,
+            "stage_timings": reporter.stage_summary(),
+            "profiles_written": sum(1 for r in results if r.get("profile_report")),
+            "results_file": results_file
+        },
+        **pipeline.get_processing_statistics(results)
+    }
+
+    summary_json = json.dumps(summary, indent=2, default=str)
+    print(summary_json)
+    if args.summary_file:
+        with open(args.summary_file, "w", encoding="utf-8") as f:
+            f.write(summary_json + "\n")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Adaptive Concurrency Control
+AIMD limit on in-flight requests to an LLM server, driven by observed latency and timeouts
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+def percentile(sorted_values, fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Additive-increase / multiplicative-decrease limit on concurrent requests.
+
+    While latency stays within latency_tolerance x the baseline, the limit
+    grows by about `increase` per round trip (every `limit` completions).
+    A timeout, error or latency spike multiplies it by decrease_factor, at
+    most once per baseline round trip so one burst is not punished twice.
+    The baseline is a slow EWMA of every successful request's latency,
+    spikes included, so a lasting shift (longer documents, a slower model)
+    becomes the new normal after a few dozen requests rather than reading
+    as a spike forever.
+    """
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 64,
+                 increase: float = 1.0, decrease_factor: float = 0.7, latency_tolerance: float = 2.0,
+                 baseline_alpha: float = 0.05, sample_size: int = 1000, name: str = "llm"):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.baseline_alpha = baseline_alpha
+
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self.completed = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.decreases = 0
+
+        self._latencies = deque(maxlen=sample_size)
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free."""
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until a slot is free (or timeout expires)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: float, success: bool = True, timed_out: bool = False):
+        """Return a slot and adjust the limit from the request's outcome."""
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.completed += 1
+            self._latencies.append(latency)
+
+            spike = (
+                success and self.baseline_latency is not None
+                and latency > self.baseline_latency * self.latency_tolerance
+            )
+            if success:
+                if self.baseline_latency is None:
+                    self.baseline_latency = latency
+                else:
+                    self.baseline_latency += self.baseline_alpha * (latency - self.baseline_latency)
+
+            if timed_out or not success or spike:
+                if timed_out:
+                    self.timeouts += 1
+                elif not success:
+                    self.errors += 1
+                self._decrease(latency, "timeout" if timed_out else "error" if not success else "latency spike")
+            else:
+                self.limit = min(self.max_limit, self.limit + self.increase / max(self.limit, 1.0))
+
+            self._condition.notify_all()
+
+    def _decrease(self, latency: float, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < (self.baseline_latency or latency):
+            return
+
+        previous = self.limit
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+        self._last_decrease = now
+        self.decreases += 1
+        logger.info(f"{self.name}: concurrency limit {previous:.1f} -> {self.limit:.1f} ({reason}, {latency:.2f}s)")
+
+    def get_metrics(self) -> Dict:
+        """Current limit, load and latency percentiles."""
+        with self._condition:
+            latencies = sorted(self._latencies)
+            return {
+                "limit": self.current_limit,
+                "in_flight": self.in_flight,
+                "baseline_latency": self.baseline_latency,
+                "latency_p50": percentile(latencies, 0.50),
+                "latency_p95": percentile(latencies, 0.95),
+                "latency_p99": percentile(latencies, 0.99),
+                "completed": self.completed,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "limit_decreases": self.decreases
+            }
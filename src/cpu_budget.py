@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+CPU Thread Budget
+Splits a core budget between pipeline workers and caps the thread pools of torch, OpenCV and Tesseract/OpenMP accordingly
+"""
+
+import logging
+import os
+import sys
+from typing import Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Read by OpenMP/BLAS runtimes when they start: Tesseract (a fresh process per
+# page, so this applies immediately), and torch/numpy if imported afterwards.
+THREAD_ENV_VARS = ("OMP_THREAD_LIMIT", "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# Threads per worker set by apply_thread_budget in this process, if any.
+_threads: Optional[int] = None
+
+def available_cores() -> int:
+    """Cores this process may run on (respects taskset/cgroup affinity where the OS reports it)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def resolve_budget(budget: Union[int, str, None]) -> Optional[int]:
+    """The 'cpu_budget' setting as a core count: 'auto' means every available core, None/0 leaves threading alone."""
+    if not budget:
+        return None
+    if budget == "auto":
+        return available_cores()
+    try:
+        return max(1, int(budget))
+    except (TypeError, ValueError):
+        raise ValueError(f"cpu_budget must be 'auto' or a number of cores, not {budget!r}") from None
+
+def threads_per_worker(workers: int, cores: Optional[int] = None) -> int:
+    """Library threads each concurrently busy worker gets, so workers x threads stays within the cores."""
+    return max(1, (cores or available_cores()) // max(1, workers))
+
+def apply_thread_budget(threads: int) -> Dict:
+    """Cap this process's native thread pools; libraries imported later pick the limit up too."""
+    global _threads
+    _threads = max(1, int(threads))
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(_threads)
+    applied = {"threads": _threads, **limit_loaded_libraries()}
+    logger.info(f"CPU budget: {_threads} library thread(s) per worker")
+    return applied
+
+def limit_loaded_libraries() -> Dict:
+    """
+    Apply the current budget to torch and OpenCV if they are loaded. Call
+    right after importing them lazily; it does nothing without a budget.
+    """
+    if _threads is None:
+        return {}
+
+    applied = {}
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.get_num_threads() != _threads:
+        torch.set_num_threads(_threads)
+        applied["torch"] = _threads
+    cv2 = sys.modules.get("cv2")
+    if cv2 is not None and cv2.getNumThreads() != _threads:
+        cv2.setNumThreads(_threads)
+        applied["cv2"] = _threads
+    return applied
+
+def current_threads() -> Optional[int]:
+    return _threads
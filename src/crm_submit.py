@@ -1,30 +1,54 @@
 import json
 import csv
 import logging
+import random
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
 import os
-import requests
-from requests.auth import HTTPBasicAuth
-import zeep
 from urllib.parse import urljoin
 
+from .tracing import TRACER
+
+# requests and zeep are only needed by EnterpriseCRMConnector and are imported
+# when a connector client is initialised.
+
 class CRMSubmitter:
     """Handles CRM submission and logging."""
     
-    def __init__(self, output_dir: str = "output"):
+    # Bump when the CRM record mapping or submission behaviour changes.
+    STAGE_VERSION = "1"
+    
+    def __init__(self, output_dir: str = "output", mock_latency=(0.5, 1.5), seed: Optional[int] = None):
+        """
+        Args:
+            output_dir: Where JSON files and crm.log are written
+            mock_latency: Simulated CRM round trip in seconds, a (min, max) range or a fixed value; 0 disables it
+            seed: Seed for the mock CRM's outcomes and ids, for reproducible runs
+        """
         self.output_dir = output_dir
         self.log_file = os.path.join(output_dir, "crm.log")
         self.logger = logging.getLogger(__name__)
+        if isinstance(mock_latency, (int, float)):
+            mock_latency = (mock_latency, mock_latency)
+        self.mock_latency = tuple(mock_latency)
+        self._rng = random.Random(seed)
         
         os.makedirs(output_dir, exist_ok=True)
     
+    def cache_fingerprint(self) -> Dict:
+        """Settings that affect submissions, for the stage cache."""
+        return {"target": "mock", "output_dir": os.path.abspath(self.output_dir)}
+    
     def submit_document(self, parsed_data: Dict) -> Dict:
         """Submit document to CRM (mock implementation)."""
         try:
-            json_filename = self._generate_json_file(parsed_data)
+            with TRACER.span("write_json", cat="crm"):
+                json_filename = self._generate_json_file(parsed_data)
             
-            submission_result = self._mock_crm_submit(parsed_data)
+            with TRACER.span("crm_submit", cat="crm", target="mock") as span:
+                submission_result = self._mock_crm_submit(parsed_data)
+                span.set(status=submission_result.get("status"))
             
             self._log_submission(parsed_data, submission_result)
             
@@ -97,7 +121,16 @@ class CRMSubmitter:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         json_filename = os.path.join(self.output_dir, f"{base_name}_processed_{timestamp}.json")
         
-        crm_data = {
+        crm_data = self._build_crm_record(parsed_data)
+        
+        with open(json_filename, 'w', encoding='utf-8') as f:
+            json.dump(crm_data, f, indent=2, ensure_ascii=False)
+        
+        return json_filename
+    
+    def _build_crm_record(self, parsed_data: Dict) -> Dict:
+        """Map parsed document data to the CRM upload record."""
+        return {
             "merchant_information": {
                 "name": parsed_data.get('merchant_name', ''),
                 "ein_or_ssn": parsed_data.get('ein_or_ssn', ''),
@@ -130,18 +163,50 @@ class CRMSubmitter:
                 "validation_timestamp": parsed_data.get('validation_timestamp', '')
             }
         }
+    
+    async def asubmit_document(self, parsed_data: Dict, connector: Optional["EnterpriseCRMConnector"] = None,
+                               executor=None) -> Dict:
+        """
+        Async submit_document.
         
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(crm_data, f, indent=2, ensure_ascii=False)
+        Without a connector the mock submission runs in the executor; with an
+        EnterpriseCRMConnector the record is sent over its async client.
+        """
+        import asyncio
         
-        return json_filename
+        loop = asyncio.get_running_loop()
+        if connector is None:
+            return await loop.run_in_executor(executor, self.submit_document, parsed_data)
+        
+        try:
+            json_filename = await loop.run_in_executor(executor, self._generate_json_file, parsed_data)
+            
+            submission_result = await connector.asubmit_financial_document(self._build_crm_record(parsed_data), executor)
+            accepted = submission_result.get("status") == "success"
+            
+            # get_submission_stats counts the mock CRM's "accepted" status.
+            self._log_submission(parsed_data, {**submission_result, "status": "accepted" if accepted else "failed"})
+            
+            return {
+                "status": "success" if accepted else "failed",
+                "json_file": json_filename,
+                "crm_response": submission_result
+            }
+            
+        except Exception as e:
+            error_msg = str(e)
+            self.logger.error(f"CRM submission failed: {error_msg}")
+            self._log_submission(parsed_data, {"status": "failed", "error": error_msg})
+            return {
+                "status": "failed",
+                "error": error_msg
+            }
     
     def _mock_crm_submit(self, parsed_data: Dict) -> Dict:
         """Mock CRM API submission."""
-        import random
-        import time
-        
-        time.sleep(random.uniform(0.5, 1.5))
+        low, high = self.mock_latency
+        if high > 0:
+            time.sleep(self._rng.uniform(low, high))
         
         if parsed_data.get('validation_status') == 'failed':
             return {
@@ -156,14 +221,14 @@ class CRMSubmitter:
             return {
                 "status": "pending_review",
                 "reason": "Low confidence score requires manual review",
-                "crm_id": f"PENDING-{random.randint(10000, 99999)}",
+                "crm_id": f"PENDING-{self._rng.randint(10000, 99999)}",
                 "timestamp": datetime.now().isoformat()
             }
         
-        if random.random() < 0.9:
+        if self._rng.random() < 0.9:
             return {
                 "status": "accepted",
-                "crm_id": f"CRM-{random.randint(100000, 999999)}",
+                "crm_id": f"CRM-{self._rng.randint(100000, 999999)}",
                 "submission_time": datetime.now().isoformat(),
                 "processing_notes": "Document successfully processed and entered into CRM"
             }
@@ -252,12 +317,17 @@ class EnterpriseCRMConnector:
         elif self.crm_type == 'database':
             self._init_database_client()
 
+    def cache_fingerprint(self) -> Dict:
+        """Which CRM submissions go to, for the stage cache (credentials left out)."""
+        return {"target": self.crm_type, "base_url": self.base_url, "auth_type": self.auth_type}
+
     def _init_soap_client(self):
         """Initialize SOAP client."""
         try:
             from zeep import Client
             from zeep.transports import Transport
             from requests import Session
+            from requests.auth import HTTPBasicAuth
 
             session = Session()
             session.auth = HTTPBasicAuth(self.config['email'], self.config['password'])
@@ -282,6 +352,9 @@ class EnterpriseCRMConnector:
 
     def _init_rest_client(self):
         """Initialize REST client with flexible authentication."""
+        import requests
+        from requests.auth import HTTPBasicAuth
+        
         self.session = requests.Session()
 
         if self.auth_type == 'oauth':
@@ -368,28 +441,10 @@ class EnterpriseCRMConnector:
     def _submit_via_rest(self, document_data: Dict) -> Dict:
         """Submit document via enterprise CRM REST API."""
         try:
-            customer_data = self._map_to_customer_record(document_data)
-
-            endpoint = self.config.get('customer_endpoint', '/customers')
-            url = urljoin(self.base_url + '/', endpoint.lstrip('/'))
-            response = self.session.post(url, json=customer_data)
-
-            if response.status_code in [200, 201]:
-                result = response.json()
-                return {
-                    "status": "success",
-                    "crm_type": "rest",
-                    "record_id": result.get('id', result.get('customer_id', result.get('internal_id'))),
-                    "record_type": "customer",
-                    "timestamp": datetime.now().isoformat()
-                }
-            else:
-                return {
-                    "status": "failed",
-                    "crm_type": "rest",
-                    "error": f"HTTP {response.status_code}: {response.text}",
-                    "timestamp": datetime.now().isoformat()
-                }
+            url, payload = self._rest_request(document_data)
+            response = self.session.post(url, json=payload)
+            body = response.json() if response.status_code in [200, 201] else None
+            return self._http_submit_result("rest", response.status_code, body, response.text)
 
         except Exception as e:
             return {
@@ -402,60 +457,147 @@ class EnterpriseCRMConnector:
     def _submit_via_database(self, document_data: Dict) -> Dict:
         """Submit document via direct database access."""
         try:
-            query = """
-            INSERT INTO customers (
-                company_name, email, phone, address_line1, city, state, zip_code,
-                created_at, source_system
-            ) VALUES (
-                ?, ?, ?, ?, ?, ?, ?, ?, ?
-            )
-            """
-
-            params = [
-                document_data.get('merchant_information', {}).get('name', ''),
-                document_data.get('contact_information', {}).get('email', ''),
-                document_data.get('contact_information', {}).get('phone', ''),
-                document_data.get('address', {}).get('street', ''),
-                document_data.get('address', {}).get('city', ''),
-                document_data.get('address', {}).get('state', ''),
-                document_data.get('address', {}).get('zip', ''),
-                datetime.now().isoformat(),
-                'MoneyPulse'
-            ]
-
-            endpoint = self.config.get('database_endpoint', '/api/database/execute')
-            url = urljoin(self.base_url + '/', endpoint.lstrip('/'))
-            payload = {
-                "query": query,
-                "parameters": params
+            url, payload = self._database_request(document_data)
+            response = self.session.post(url, json=payload)
+            body = response.json() if response.status_code in [200, 201] else None
+            return self._http_submit_result("database", response.status_code, body, response.text)
+
+        except Exception as e:
+            return {
+                "status": "failed",
+                "crm_type": "database",
+                "error": str(e),
+                "timestamp": datetime.now().isoformat()
             }
 
-            response = self.session.post(url, json=payload)
+    def _rest_request(self, document_data: Dict):
+        """URL and JSON payload for a REST customer submission."""
+        customer_data = self._map_to_customer_record(document_data)
+        endpoint = self.config.get('customer_endpoint', '/customers')
+        return urljoin(self.base_url + '/', endpoint.lstrip('/')), customer_data
+
+    def _database_request(self, document_data: Dict):
+        """URL and JSON payload for a direct database insert."""
+        query = """
+        INSERT INTO customers (
+            company_name, email, phone, address_line1, city, state, zip_code,
+            created_at, source_system
+        ) VALUES (
+            ?, ?, ?, ?, ?, ?, ?, ?, ?
+        )
+        """
 
-            if response.status_code in [200, 201]:
-                result = response.json()
-                return {
-                    "status": "success",
-                    "crm_type": "database",
-                    "affected_rows": result.get('rows_affected', 1),
-                    "timestamp": datetime.now().isoformat()
-                }
+        params = [
+            document_data.get('merchant_information', {}).get('name', ''),
+            document_data.get('contact_information', {}).get('email', ''),
+            document_data.get('contact_information', {}).get('phone', ''),
+            document_data.get('address', {}).get('street', ''),
+            document_data.get('address', {}).get('city', ''),
+            document_data.get('address', {}).get('state', ''),
+            document_data.get('address', {}).get('zip', ''),
+            datetime.now().isoformat(),
+            'MoneyPulse'
+        ]
+
+        endpoint = self.config.get('database_endpoint', '/api/database/execute')
+        url = urljoin(self.base_url + '/', endpoint.lstrip('/'))
+        return url, {"query": query, "parameters": params}
+
+    def _http_submit_result(self, crm_type: str, status_code: int, result: Optional[Dict], text: str) -> Dict:
+        """Turn a REST or database HTTP response into a submission result."""
+        if status_code not in [200, 201]:
+            return {
+                "status": "failed",
+                "crm_type": crm_type,
+                "error": f"HTTP {status_code}: {text}",
+                "timestamp": datetime.now().isoformat()
+            }
+
+        result = result or {}
+        if crm_type == "database":
+            return {
+                "status": "success",
+                "crm_type": "database",
+                "affected_rows": result.get('rows_affected', 1),
+                "timestamp": datetime.now().isoformat()
+            }
+
+        return {
+            "status": "success",
+            "crm_type": "rest",
+            "record_id": result.get('id', result.get('customer_id', result.get('internal_id'))),
+            "record_type": "customer",
+            "timestamp": datetime.now().isoformat()
+        }
+
+    async def asubmit_financial_document(self, document_data: Dict, executor=None) -> Dict:
+        """
+        Async submit_financial_document.
+
+        REST and database submissions use aiohttp. SOAP, OAuth 1 signing and
+        installs without aiohttp fall back to the blocking client in the executor.
+        """
+        import asyncio
+
+        try:
+            import aiohttp
+        except ImportError:
+            aiohttp = None
+
+        if aiohttp is None or self.crm_type not in ('rest', 'database') or self.auth_type == 'oauth':
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, self.submit_financial_document, document_data)
+
+        try:
+            if self.crm_type == 'rest':
+                url, payload = self._rest_request(document_data)
             else:
-                return {
-                    "status": "failed",
-                    "crm_type": "database",
-                    "error": f"HTTP {response.status_code}: {response.text}",
-                    "timestamp": datetime.now().isoformat()
-                }
+                url, payload = self._database_request(document_data)
+
+            session = self._get_async_session(aiohttp)
+            async with session.post(url, json=payload) as response:
+                text = await response.text()
+                body = None
+                if response.status in [200, 201]:
+                    body = json.loads(text) if text else {}
+                return self._http_submit_result(self.crm_type, response.status, body, text)
 
         except Exception as e:
+            self.logger.error(f"CRM submission failed: {str(e)}")
             return {
                 "status": "failed",
-                "crm_type": "database",
                 "error": str(e),
+                "crm_type": self.crm_type,
                 "timestamp": datetime.now().isoformat()
             }
 
+    def _get_async_session(self, aiohttp):
+        """aiohttp session with the same authentication headers as the blocking client."""
+        session = getattr(self, '_async_session', None)
+        if session is not None and not session.closed:
+            return session
+
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+        auth = None
+        if self.auth_type == 'basic':
+            # aiohttp rejects a None login or password, which the sync HTTPBasicAuth path accepts.
+            auth = aiohttp.BasicAuth(self.config.get('username') or "", self.config.get('password') or "")
+        elif self.auth_type == 'api_key':
+            headers['Authorization'] = f"Bearer {self.config.get('api_key')}"
+
+        self._async_session = aiohttp.ClientSession(headers=headers, auth=auth)
+        return self._async_session
+
+    async def aclose(self):
+        """Close the aiohttp session, if one was opened."""
+        session = getattr(self, '_async_session', None)
+        if session is not None:
+            await session.close()
+            self._async_session = None
+
     def _map_to_customer_record(self, document_data: Dict) -> Dict:
         """Map MoneyPulse document data to enterprise CRM customer record."""
         merchant_info = document_data.get('merchant_information', {})
@@ -563,6 +705,12 @@ class EnterpriseCRMSubmitter(CRMSubmitter):
             except Exception as e:
                 self.logger.error(f"Failed to initialize CRM connector: {str(e)}")
 
+    def cache_fingerprint(self) -> Dict:
+        fingerprint = super().cache_fingerprint()
+        if self.crm_connector is not None:
+            fingerprint["connector"] = self.crm_connector.cache_fingerprint()
+        return fingerprint
+
     def submit_document(self, parsed_data: Dict) -> Dict:
         """Submit document to both local CRM and enterprise CRM if configured."""
         crm_result = super().submit_document(parsed_data)
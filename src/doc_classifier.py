@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Document Classifier
+Fast first-page keyword/layout classification, with an optional cached embedding nearest-centroid fallback, that routes each document to a type-specific extraction plan
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Only the start of the text is classified, so a cached full-document OCR text
+# classifies the same way as the first page it starts with.
+FIRST_PAGE_CHARS = 4000
+
+ADDRESS_FIELDS = ["address_street", "address_city", "address_state", "address_zip"]
+
+# Which OCR pages and which LLM prompt keys (see LLMParser.FIELD_PLAN) each
+# document type needs. "unknown" keeps the full treatment, including asking
+# the LLM for the document type.
+EXTRACTION_PLANS = {
+    "application": {
+        "pages": "all",
+        "fields": ["merchant_name", "ein_or_ssn", "requested_amount", *ADDRESS_FIELDS, "contact_phone",
+                   "contact_email", "business_type", "annual_revenue", "years_in_business", "processing_volume"]
+    },
+    "w9": {"pages": "first", "fields": ["merchant_name", "ein_or_ssn", *ADDRESS_FIELDS]},
+    "voided_check": {"pages": "first", "fields": ["merchant_name", *ADDRESS_FIELDS]},
+    "bank_statement": {"pages": "first", "fields": ["merchant_name", *ADDRESS_FIELDS]},
+    "unknown": {"pages": "all", "fields": None},
+}
+
+# (pattern, weight) per type, matched against the lower-cased first page.
+KEYWORDS = {
+    "application": [
+        (r"application", 2), (r"merchant cash advance", 3), (r"requested (?:funding )?amount", 3),
+        (r"annual (?:revenue|sales)", 2), (r"years in business", 2), (r"type of business", 1),
+        (r"owner signature", 1), (r"funding", 1),
+    ],
+    "w9": [
+        (r"\bw-?9\b", 4), (r"request for taxpayer", 3), (r"taxpayer identification number", 3),
+        (r"federal tax classification", 2), (r"employer identification number", 1), (r"certification", 1),
+    ],
+    "voided_check": [
+        (r"\bv\s?o\s?i\s?d\b", 4), (r"pay to the\s+order of", 3), (r"routing (?:number|no)", 1),
+        (r"account (?:number|no)", 1), (r"\bdollars\b", 1), (r"\bmemo\b", 1),
+    ],
+    "bank_statement": [
+        (r"statement", 2), (r"statement period", 2), (r"(?:beginning|ending|opening|closing) balance", 2),
+        (r"account holder", 1), (r"\bdeposits\b", 1), (r"\bwithdrawals\b", 1), (r"checking", 1),
+    ],
+}
+_COMPILED = {doc_type: [(re.compile(p), w) for p, w in patterns] for doc_type, patterns in KEYWORDS.items()}
+
+_TABLE_ROW = re.compile(r"\d{1,2}/\d{1,2}.*\d[\d,]*\.?\d*\s+-?[\d,]+\.?\d*\s*$")
+
+# Short typical first pages, used to build embedding centroids when no
+# examples file is configured.
+SEED_EXAMPLES = {
+    "application": [
+        "Merchant cash advance application. Business name, federal tax ID, address, phone, email, type of "
+        "business, annual revenue, years in business, requested amount, owner signature and date.",
+        "Funding application for small business. Legal name, DBA, EIN, monthly credit card sales, amount requested.",
+    ],
+    "w9": [
+        "Form W-9 Request for Taxpayer Identification Number and Certification. Name as shown on your income tax "
+        "return, federal tax classification, address, employer identification number, signature of U.S. person.",
+    ],
+    "voided_check": [
+        "Business name and address. Pay to the order of, dollars, memo, VOID, routing number and account number.",
+    ],
+    "bank_statement": [
+        "Business checking statement, statement period, account holder, beginning balance, deposits, withdrawals, "
+        "card settlement, ACH payroll, ending balance, daily transactions with dates and amounts.",
+    ],
+}
+
+class EmbeddingCentroids:
+    """
+    Nearest-centroid classifier over sentence-transformers embeddings.
+
+    Centroids are the normalised means of the example embeddings per type,
+    cached as JSON keyed by model and examples so they are computed once.
+    Text embeddings are kept in a small LRU so a document that is
+    classified twice (OCR, then a cached LLM stage) is embedded once.
+    """
+
+    def __init__(self, model_name: str, cache_path: Optional[str] = None, examples: Optional[Dict[str, List[str]]] = None,
+                 lru_size: int = 1024):
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.examples = examples or SEED_EXAMPLES
+        self.lru_size = lru_size
+        self._model = None
+        self._centroids: Optional[Dict[str, List[float]]] = None
+        self._embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+            logger.info(f"Loaded embedding model {self.model_name} for document classification")
+        return [list(map(float, v)) for v in self._model.encode(texts, normalize_embeddings=True)]
+
+    def _examples_key(self) -> str:
+        payload = json.dumps({"model": self.model_name, "examples": self.examples}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def centroids(self) -> Dict[str, List[float]]:
+        with self._lock:
+            if self._centroids is not None:
+                return self._centroids
+
+            key = self._examples_key()
+            if self.cache_path and os.path.exists(self.cache_path):
+                try:
+                    with open(self.cache_path, "r", encoding="utf-8") as f:
+                        cached = json.load(f)
+                    if cached.get("key") == key:
+                        self._centroids = cached["centroids"]
+                        return self._centroids
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable centroid cache {self.cache_path}: {e}")
+
+            centroids = {}
+            for doc_type, texts in self.examples.items():
+                vectors = self._encode(texts)
+                mean = [sum(column) / len(vectors) for column in zip(*vectors)]
+                norm = sum(x * x for x in mean) ** 0.5 or 1.0
+                centroids[doc_type] = [x / norm for x in mean]
+            self._centroids = centroids
+
+            if self.cache_path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+                with open(self.cache_path, "w", encoding="utf-8") as f:
+                    json.dump({"key": key, "model": self.model_name, "centroids": centroids}, f)
+            return centroids
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Nearest centroid and its cosine similarity."""
+        centroids = self.centroids()
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            vector = self._embeddings.get(digest)
+            if vector is not None:
+                self._embeddings.move_to_end(digest)
+        if vector is None:
+            vector = self._encode([text])[0]
+            with self._lock:
+                self._embeddings[digest] = vector
+                while len(self._embeddings) > self.lru_size:
+                    self._embeddings.popitem(last=False)
+
+        similarities = {t: sum(a * b for a, b in zip(vector, c)) for t, c in centroids.items()}
+        best = max(similarities, key=similarities.get)
+        return best, similarities[best]
+
+class DocumentClassifier:
+    """
+    Classifies a document from its first page: weighted keyword matches,
+    plus a layout cue (the share of lines that look like dated transaction
+    rows). When the keywords are inconclusive and an embedding model is
+    configured, the nearest example centroid decides; otherwise the
+    document is "unknown" and gets the full extraction plan.
+    """
+
+    # Bump when the rules change; the LLM stage cache key includes the result.
+    VERSION = "1"
+
+    def __init__(self, min_score: float = 3.0, min_margin: float = 0.6, embeddings: Optional[EmbeddingCentroids] = None,
+                 min_similarity: float = 0.35):
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.embeddings = embeddings
+        self.min_similarity = min_similarity
+
+    def keyword_scores(self, text: str) -> Dict[str, float]:
+        page = text[:FIRST_PAGE_CHARS].lower()
+        scores = {doc_type: float(sum(w for pattern, w in patterns if pattern.search(page)))
+                  for doc_type, patterns in _COMPILED.items()}
+
+        lines = [line for line in page.splitlines() if line.strip()]
+        if lines:
+            table_rows = sum(1 for line in lines if _TABLE_ROW.search(line))
+            if table_rows / len(lines) > 0.3:
+                scores["bank_statement"] += 3
+        return scores
+
+    def classify(self, text: str) -> Dict:
+        """The document type, how it was decided, and the extraction plan to use."""
+        scores = self.keyword_scores(text)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best, runner_up = scores[ranked[0]], scores[ranked[1]]
+        margin = best / (best + runner_up) if best else 0.0
+
+        result = {"document_type": ranked[0], "method": "keywords", "confidence": round(margin, 3),
+                  "scores": scores}
+        if best < self.min_score or margin < self.min_margin:
+            result.update(document_type="unknown", method="fallback")
+            if self.embeddings is not None and text.strip():
+                try:
+                    doc_type, similarity = self.embeddings.predict(text[:FIRST_PAGE_CHARS])
+                    if similarity >= self.min_similarity:
+                        result.update(document_type=doc_type, method="embedding", confidence=round(similarity, 3))
+                except Exception as e:
+                    logger.warning(f"Embedding classification failed, using the full plan: {e}")
+
+        result["plan"] = EXTRACTION_PLANS.get(result["document_type"], EXTRACTION_PLANS["unknown"])
+        return result
+
+    def cache_fingerprint(self) -> Dict:
+        return {
+            "version": self.VERSION,
+            "embedding_model": self.embeddings.model_name if self.embeddings else None
+        }
@@ -21,18 +21,60 @@ try:
 except ImportError:
     from ..llm_detector import LLMProviderDetector
 
+class ProviderDetectionWorker(QThread):
+    """Worker thread that probes the LLM providers, so a first launch without a cache does not block the window."""
+    
+    detection_completed = Signal(dict)
+    detection_failed = Signal(str)
+    
+    def __init__(self, detector: LLMProviderDetector, use_cache: bool, on_refresh: Callable[[Dict], None]):
+        super().__init__()
+        self.detector = detector
+        self.use_cache = use_cache
+        self.on_refresh = on_refresh
+    
+    def run(self):
+        """Detect providers (from the cache when allowed) and list their models."""
+        try:
+            detected = self.detector.detect_all_providers(use_cache=self.use_cache, on_refresh=self.on_refresh)
+            for provider_id in detected:
+                self.detector.get_available_models(provider_id)
+        except Exception as e:
+            self.detection_failed.emit(str(e))
+            return
+        self.detection_completed.emit(detected)
+
+class ModelBenchmarkWorker(QThread):
+    """Worker thread that benchmarks the detected models without blocking the window."""
+    
+    benchmark_completed = Signal(dict)
+    
+    def __init__(self, detector: LLMProviderDetector):
+        super().__init__()
+        self.detector = detector
+    
+    def run(self):
+        """Benchmark every detected provider/model pair."""
+        try:
+            results = self.detector.benchmark_models()
+        except Exception as e:
+            results = {"error": str(e)}
+        self.benchmark_completed.emit(results)
+
 class LLMProviderWidget(QWidget):
     """Widget for selecting and configuring LLM providers."""
     
     provider_changed = Signal(str, str)
+    detection_refreshed = Signal(dict)
     
     def __init__(self, parent=None):
         super().__init__(parent)
         self.detector = LLMProviderDetector()
         self.current_provider = None
         self.current_model = None
+        self.detection_refreshed.connect(self._update_ui_after_detection)
         self.setup_ui()
-        self.detect_providers()
+        self.detect_providers(use_cache=True)
     
     def setup_ui(self):
         """Setup the user interface."""
@@ -74,7 +116,7 @@ class LLMProviderWidget(QWidget):
         
         self.refresh_btn = QPushButton("🔄 Refresh Detection")
         self.refresh_btn.setIcon(qta.icon('fa5s.sync', color='white'))
-        self.refresh_btn.clicked.connect(self.detect_providers)
+        self.refresh_btn.clicked.connect(lambda: self.detect_providers(use_cache=False))
         button_layout.addWidget(self.refresh_btn)
         
         self.test_btn = QPushButton("🧪 Test Connection")
@@ -83,6 +125,13 @@ class LLMProviderWidget(QWidget):
         self.test_btn.setEnabled(False)
         button_layout.addWidget(self.test_btn)
         
+        self.benchmark_btn = QPushButton("⏱️ Benchmark Models")
+        self.benchmark_btn.setIcon(qta.icon('fa5s.tachometer-alt', color='white'))
+        self.benchmark_btn.setToolTip("Time each detected model on a sample extraction and recommend the fastest accurate one")
+        self.benchmark_btn.clicked.connect(self.benchmark_models)
+        self.benchmark_btn.setEnabled(False)
+        button_layout.addWidget(self.benchmark_btn)
+        
         self.help_btn = QPushButton("❓ Help")
         self.help_btn.setIcon(qta.icon('fa5s.question-circle', color='white'))
         self.help_btn.clicked.connect(self.show_help)
@@ -96,28 +145,18 @@ class LLMProviderWidget(QWidget):
         
         layout.addStretch()
     
-    def detect_providers(self):
-        """Detect available LLM providers."""
+    def detect_providers(self, use_cache: bool = False):
+        """Detect available LLM providers, optionally starting from the cached result."""
         self.status_label.setText("🔍 Detecting available providers...")
         self.progress_bar.setVisible(True)
         self.progress_bar.setRange(0, 0)
         self.refresh_btn.setEnabled(False)
         
-        QTimer.singleShot(100, self._run_detection)
-    
-    def _run_detection(self):
-        """Run provider detection in background."""
-        try:
-            detected = self.detector.detect_all_providers()
-            
-            for provider_id in detected:
-                models = self.detector.get_available_models(provider_id)
-                self.detector.available_models[provider_id] = models
-            
-            QTimer.singleShot(0, lambda: self._update_ui_after_detection(detected))
-            
-        except Exception as e:
-            QTimer.singleShot(0, lambda: self._detection_error(str(e)))
+        # Results arrive through detection_refreshed, like a background refresh of a stale cache.
+        self.detection_thread = ProviderDetectionWorker(self.detector, use_cache, self.detection_refreshed.emit)
+        self.detection_thread.detection_completed.connect(self.detection_refreshed)
+        self.detection_thread.detection_failed.connect(self._detection_error)
+        self.detection_thread.start()
     
     def _update_ui_after_detection(self, detected_providers):
         """Update UI after provider detection."""
@@ -146,9 +185,11 @@ class LLMProviderWidget(QWidget):
             
             self.status_label.setText(f"✅ Detected {len(detected_providers)} provider(s)")
             self.test_btn.setEnabled(True)
+            self.benchmark_btn.setEnabled(True)
         else:
             self.status_label.setText("❌ No providers detected")
             self.test_btn.setEnabled(False)
+            self.benchmark_btn.setEnabled(False)
         
         self._update_status_display()
     
@@ -158,6 +199,36 @@ class LLMProviderWidget(QWidget):
         self.refresh_btn.setEnabled(True)
         self.status_label.setText(f"❌ Detection failed: {error_message}")
         self.test_btn.setEnabled(False)
+        self.benchmark_btn.setEnabled(False)
+    
+    def benchmark_models(self):
+        """Benchmark the detected models in the background; each can take a few seconds per run."""
+        self.status_label.setText("⏱️ Benchmarking models...")
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 0)
+        self.refresh_btn.setEnabled(False)
+        self.benchmark_btn.setEnabled(False)
+        
+        self.benchmark_thread = ModelBenchmarkWorker(self.detector)
+        self.benchmark_thread.benchmark_completed.connect(self._benchmark_completed)
+        self.benchmark_thread.start()
+    
+    def _benchmark_completed(self, results: Dict):
+        """Re-select the recommended provider and model now that benchmarks are known."""
+        if results.get('error'):
+            self._detection_error(f"benchmark failed: {results['error']}")
+            return
+        
+        self._update_ui_after_detection(self.detector.detected_providers)
+        recommended = self.detector.get_recommended_model()
+        if recommended:
+            provider_id, model_name = recommended
+            speed = self.detector.benchmarks[provider_id][model_name]['tokens_per_second']
+            self.status_label.setText(
+                f"✅ Fastest accurate model: {model_name} on {self.detector.providers[provider_id]['name']} ({speed:.1f} tok/s)"
+            )
+        else:
+            self.status_label.setText(f"⚠️ No model reached {self.detector.min_accuracy:.0%} benchmark accuracy")
     
     def _update_status_display(self):
         """Update the provider status display."""
@@ -181,6 +252,11 @@ class LLMProviderWidget(QWidget):
                     if len(status['models']) > 3:
                         status_text += f" (+{len(status['models']) - 3} more)"
                     status_text += "\n"
+                
+                best = self.detector.get_recommended_model(provider_id)
+                if best:
+                    speed = self.detector.benchmarks[provider_id][best[1]]['tokens_per_second']
+                    status_text += f"   Fastest accurate model: {best[1]} ({speed:.1f} tok/s)\n"
             else:
                 status_text += f"{icon} <b>{name}</b> ❌ Not available\n"
                 status_text += f"   Expected host: {host}\n"
@@ -202,17 +278,21 @@ class LLMProviderWidget(QWidget):
                 for model in models:
                     self.model_combo.addItem(model)
                 if models:
-                    self.model_combo.setCurrentText(models[0])
+                    best = self.detector.get_recommended_model(recommended)
+                    model_name = best[1] if best else models[0]
+                    self.model_combo.setCurrentText(model_name)
                     self.current_provider = recommended
-                    self.current_model = models[0]
+                    self.current_model = model_name
         elif provider_id in self.detector.detected_providers:
             models = self.detector.available_models.get(provider_id, [])
             for model in models:
                 self.model_combo.addItem(model)
             if models:
-                self.model_combo.setCurrentText(models[0])
+                best = self.detector.get_recommended_model(provider_id)
+                model_name = best[1] if best else models[0]
+                self.model_combo.setCurrentText(model_name)
                 self.current_provider = provider_id
-                self.current_model = models[0]
+                self.current_model = model_name
         else:
             self.model_combo.addItem("No models available")
             self.current_provider = None
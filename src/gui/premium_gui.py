@@ -45,6 +45,23 @@ class DocumentProcessorWorker(QThread):
         except Exception as e:
             self.error_occurred.emit(str(e))
 
+class PipelineWarmupWorker(QThread):
+    """Worker thread that loads the OCR libraries and model after the window is shown."""
+    
+    warmup_completed = Signal(dict)
+    
+    def __init__(self, pipeline: DocumentPipeline):
+        super().__init__()
+        self.pipeline = pipeline
+    
+    def run(self):
+        """Warm up the pipeline in the background."""
+        try:
+            results = self.pipeline.warm_up()
+        except Exception as e:
+            results = {"error": str(e)}
+        self.warmup_completed.emit(results)
+
 class DropArea(QLabel):
     """Custom drop area widget for file uploads."""
     
@@ -130,13 +147,14 @@ class PremiumDocumentProcessor(QMainWindow):
         self.selected_files = []
         self.processed_documents = []
         self.worker_thread = None
+        self.warmup_thread = None
         
         self.setup_pipeline()
         self.setup_ui()
         self.setup_connections()
         self.setup_menu_bar()
         
-        QTimer.singleShot(1000, self.test_system_components)
+        QTimer.singleShot(0, self.start_warm_up)
     
     def setup_pipeline(self):
         """Initialize the document processing pipeline."""
@@ -268,6 +286,11 @@ class PremiumDocumentProcessor(QMainWindow):
         self.log_text.setReadOnly(True)
         self.tab_widget.addTab(self.log_text, "Processing Log")
         
+        self.latency_tree = QTreeWidget()
+        self.latency_tree.setHeaderLabels(["Metric", "Count", "p50", "p95", "p99", "Max"])
+        self.latency_tree.setAlternatingRowColors(True)
+        self.tab_widget.addTab(self.latency_tree, "Performance")
+        
         return self.tab_widget
     
     def setup_connections(self):
@@ -410,6 +433,7 @@ class PremiumDocumentProcessor(QMainWindow):
         
         self.status_bar.showMessage(f"Processing completed: {successful} successful, {failed} failed")
         self.log_message(f"Processing completed: {successful} successful, {failed} failed")
+        self.update_latency_display()
         
         QMessageBox.information(
             self,
@@ -501,6 +525,27 @@ class PremiumDocumentProcessor(QMainWindow):
             no_issues_item.setIcon(qta.icon('fa5s.check'))
             self.validation_list.addItem(no_issues_item)
     
+    def update_latency_display(self):
+        """Show p50/p95/p99 latency per stage, OCR page and LLM call."""
+        self.latency_tree.clear()
+        
+        for metric, series in self.pipeline.metrics.snapshot().items():
+            metric_item = QTreeWidgetItem([metric.replace("_seconds", "").replace("_", " ").title(), "", "", "", "", ""])
+            self.latency_tree.addTopLevelItem(metric_item)
+            
+            for labels, summary in series.items():
+                QTreeWidgetItem(metric_item, [
+                    labels,
+                    str(summary["count"]),
+                    f"{summary['p50_seconds']:.3f}s",
+                    f"{summary['p95_seconds']:.3f}s",
+                    f"{summary['p99_seconds']:.3f}s",
+                    f"{summary['max_seconds']:.3f}s"
+                ])
+        
+        self.latency_tree.expandAll()
+        self.latency_tree.resizeColumnToContents(0)
+    
     def export_csv(self):
         """Export processing results to CSV."""
         if not self.processed_documents:
@@ -538,6 +583,26 @@ class PremiumDocumentProcessor(QMainWindow):
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Could not open folder:\n{str(e)}")
     
+    def start_warm_up(self):
+        """Load heavy components in the background once the window is visible."""
+        if not hasattr(self, 'pipeline'):
+            return
+        
+        self.status_bar.showMessage("Loading AI model in the background...")
+        self.warmup_thread = PipelineWarmupWorker(self.pipeline)
+        self.warmup_thread.warmup_completed.connect(self.warm_up_completed)
+        self.warmup_thread.start()
+    
+    def warm_up_completed(self, results: Dict):
+        """Handle completion of the background warm-up."""
+        if results.get('error'):
+            self.log_message(f"Warm-up failed: {results['error']}")
+        else:
+            self.log_message(f"Components loaded in {results.get('warm_up_seconds', 0):.1f} seconds")
+        
+        self.status_bar.showMessage("Ready to process documents")
+        self.test_system_components()
+    
     def test_system_components(self):
         """Test all system components."""
         self.status_text.clear()
@@ -578,6 +643,25 @@ class PremiumDocumentProcessor(QMainWindow):
         
         layout.addWidget(ollama_group)
         
+        profiling_group = QGroupBox("Profiling")
+        profiling_layout = QFormLayout(profiling_group)
+        
+        profile_every_spin = QSpinBox()
+        profile_every_spin.setRange(0, 10000)
+        profile_every_spin.setSpecialValueText("Off")
+        profile_every_spin.setValue(int(self.pipeline.config.get('profile_every') or 0))
+        
+        profile_slow_spin = QDoubleSpinBox()
+        profile_slow_spin.setRange(0, 3600)
+        profile_slow_spin.setSuffix(" s")
+        profile_slow_spin.setSpecialValueText("Off")
+        profile_slow_spin.setValue(float(self.pipeline.config.get('profile_slower_than') or 0))
+        
+        profiling_layout.addRow("Profile every Nth document:", profile_every_spin)
+        profiling_layout.addRow("Profile documents slower than:", profile_slow_spin)
+        
+        layout.addWidget(profiling_group)
+        
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         button_box.accepted.connect(dialog.accept)
         button_box.rejected.connect(dialog.reject)
@@ -586,10 +670,14 @@ class PremiumDocumentProcessor(QMainWindow):
         if dialog.exec() == QDialog.Accepted:
             new_config = {
                 'ollama_host': host_edit.text(),
-                'model': model_edit.text()
+                'model': model_edit.text(),
+                'profile_every': profile_every_spin.value(),
+                'profile_slower_than': profile_slow_spin.value() or None
             }
             self.pipeline.update_config(new_config)
             self.log_message("Configuration updated")
+            if self.pipeline.profiler is not None:
+                self.log_message(f"Profiling on; reports go to {self.pipeline.profiler.directory}")
     
     def show_about(self):
         """Show about dialog."""
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Schema-Constrained JSON Decoding
+Restricts text generation to valid prefixes of a fixed JSON field schema
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = " \t\n\r"
+
+# A compiled schema is a flat list of segments: literal text that must be
+# produced verbatim (modulo whitespace between JSON tokens) and string slots
+# where the model writes a field value.
+STRING_SLOT = None
+
+# Decoder state: (segment index, position in literal, whitespace run,
+#                 pending escape, unicode hex digits left, slot length)
+GrammarState = Tuple[int, int, int, bool, int, int]
+
+class SchemaGrammar:
+    """Character-level recognizer for prefixes of a JSON object with string leaves."""
+
+    def __init__(self, schema: Dict, max_string_length: int = 200, max_whitespace: int = 8):
+        """
+        Compile a schema into literal segments and string slots.
+
+        Args:
+            schema: Mapping of key -> "string" or a nested mapping with the same shape
+            max_string_length: Longest value the model may write for one field
+            max_whitespace: Longest run of whitespace allowed between JSON tokens
+        """
+        self.schema = schema
+        self.max_string_length = max_string_length
+        self.max_whitespace = max_whitespace
+        self.segments = self._compile(schema)
+        self._quoted = [self._quote_map(i) for i in range(len(self.segments))]
+
+    def _compile(self, schema: Dict) -> List[Optional[str]]:
+        """Flatten the schema into alternating literal/slot segments."""
+        segments: List[Optional[str]] = []
+        literal = []
+
+        def emit(obj: Dict):
+            literal.append("{")
+            for i, (key, value) in enumerate(obj.items()):
+                if i:
+                    literal.append(",")
+                literal.append(f'"{key}":')
+                if isinstance(value, dict):
+                    emit(value)
+                else:
+                    literal.append('"')
+                    segments.append("".join(literal))
+                    segments.append(STRING_SLOT)
+                    literal.clear()
+                    literal.append('"')
+            literal.append("}")
+
+        emit(schema)
+        segments.append("".join(literal))
+        return segments
+
+    def _quote_map(self, index: int) -> List[bool]:
+        """For each position of a literal segment, whether it lies inside a JSON string."""
+        literal = self.segments[index]
+        if literal is STRING_SLOT:
+            return []
+
+        # A literal that follows a slot starts with the slot's closing quote.
+        inside = index > 0
+        quoted = []
+        for char in literal:
+            quoted.append(inside)
+            if char == '"':
+                inside = not inside
+        quoted.append(inside)
+        return quoted
+
+    @property
+    def initial_state(self) -> GrammarState:
+        return (0, 0, 0, False, 0, 0)
+
+    def is_complete(self, state: GrammarState) -> bool:
+        """Whether the text consumed so far is a complete object."""
+        return state[0] >= len(self.segments)
+
+    def advance(self, state: GrammarState, text: str) -> Optional[GrammarState]:
+        """Feed text into the recognizer, returning the new state or None if it is not a valid prefix."""
+        segment, pos, ws, escape, hex_left, slot_len = state
+
+        for char in text:
+            while True:
+                if segment >= len(self.segments):
+                    if char in WHITESPACE and ws < self.max_whitespace:
+                        ws += 1
+                        break
+                    return None
+
+                literal = self.segments[segment]
+
+                if literal is STRING_SLOT:
+                    if hex_left:
+                        if char not in "0123456789abcdefABCDEF":
+                            return None
+                        hex_left -= 1
+                    elif escape:
+                        if char == "u":
+                            hex_left = 4
+                        elif char not in '"\\/bfnrt':
+                            return None
+                        escape = False
+                    elif char == "\\":
+                        escape = True
+                    elif char == '"':
+                        # Closing quote belongs to the next literal segment.
+                        segment, pos, ws, slot_len = segment + 1, 0, 0, 0
+                        continue
+                    elif ord(char) < 0x20:
+                        return None
+
+                    slot_len += 1
+                    if slot_len > self.max_string_length:
+                        return None
+                    break
+
+                if char == literal[pos]:
+                    pos += 1
+                    ws = 0
+                    if pos == len(literal):
+                        segment, pos = segment + 1, 0
+                    break
+
+                if char in WHITESPACE and not self._quoted[segment][pos] and ws < self.max_whitespace:
+                    ws += 1
+                    break
+
+                return None
+
+        return (segment, pos, ws, escape, hex_left, slot_len)
+
+    def is_valid_prefix(self, text: str) -> bool:
+        """Whether text could be extended into a complete object."""
+        return self.advance(self.initial_state, text) is not None
+
+class JSONSchemaLogitsProcessor:
+    """
+    Logits processor that masks every token which would break the schema.
+
+    Compatible with ``transformers`` ``LogitsProcessorList``. Only the highest
+    scoring candidates are checked each step, so the per-token cost stays
+    small even for large vocabularies. Beam search is not supported.
+    """
+
+    def __init__(self, grammar: SchemaGrammar, token_texts: List[str], eos_token_id: Optional[int],
+                 max_candidates: int = 16, scan_limit: int = 1024):
+        self.grammar = grammar
+        self.token_texts = token_texts
+        self.eos_token_id = eos_token_id
+        self.max_candidates = max_candidates
+        self.scan_limit = scan_limit
+        self._states: Optional[List[Optional[GrammarState]]] = None
+
+    def __call__(self, input_ids, scores):
+        import torch
+
+        if self._states is None:
+            self._states = [self.grammar.initial_state] * input_ids.shape[0]
+        else:
+            for row in range(input_ids.shape[0]):
+                state = self._states[row]
+                if state is not None and not self.grammar.is_complete(state):
+                    token_id = int(input_ids[row, -1])
+                    self._states[row] = self.grammar.advance(state, self._token_text(token_id))
+
+        for row, state in enumerate(self._states):
+            allowed = self._allowed_tokens(state, scores[row])
+            if not allowed:
+                continue
+
+            index = torch.tensor(allowed, device=scores.device)
+            masked = torch.full_like(scores[row], float("-inf"))
+            masked[index] = scores[row, index]
+            scores[row] = masked
+
+        return scores
+
+    def _token_text(self, token_id: int) -> str:
+        if 0 <= token_id < len(self.token_texts):
+            return self.token_texts[token_id]
+        return ""
+
+    def _allowed_tokens(self, state: Optional[GrammarState], row_scores) -> List[int]:
+        """Pick the best scoring tokens that keep the output a valid prefix."""
+        import torch
+
+        if state is None:
+            return [self.eos_token_id] if self.eos_token_id is not None else []
+
+        if self.grammar.is_complete(state):
+            return [self.eos_token_id] if self.eos_token_id is not None else []
+
+        allowed = []
+        limit = min(self.scan_limit, row_scores.shape[-1])
+        candidates = torch.topk(row_scores, limit).indices.tolist()
+
+        for attempt in (candidates, None):
+            if attempt is None:
+                # Nothing in the top of the distribution fits; search the whole vocabulary.
+                attempt = torch.argsort(row_scores, descending=True).tolist()[limit:]
+
+            for token_id in attempt:
+                text = self._token_text(token_id)
+                if text and self.grammar.advance(state, text) is not None:
+                    allowed.append(token_id)
+                    if len(allowed) >= self.max_candidates:
+                        return allowed
+
+            if allowed:
+                break
+
+        return allowed
+
+_token_text_cache: Dict[str, List[str]] = {}
+
+def get_token_texts(tokenizer) -> List[str]:
+    """Decode every vocabulary entry once per tokenizer, keeping leading spaces."""
+    cache_key = getattr(tokenizer, "name_or_path", None) or str(id(tokenizer))
+    if cache_key in _token_text_cache:
+        return _token_text_cache[cache_key]
+
+    special_ids = set(getattr(tokenizer, "all_special_ids", []) or [])
+    texts = []
+    for token_id in range(len(tokenizer)):
+        if token_id in special_ids:
+            texts.append("")
+            continue
+
+        text = tokenizer.decode([token_id], clean_up_tokenization_spaces=False)
+        piece = tokenizer.convert_ids_to_tokens(token_id)
+        # SentencePiece tokenizers drop the word-boundary marker when decoding a single token.
+        if isinstance(piece, str) and piece.startswith("▁") and not text.startswith(" "):
+            text = " " + text
+        texts.append(text)
+
+    _token_text_cache[cache_key] = texts
+    return texts
+
+def build_logits_processor(tokenizer, schema: Union[Dict, SchemaGrammar], **kwargs) -> JSONSchemaLogitsProcessor:
+    """Create a fresh (stateful) processor for one generation call."""
+    grammar = schema if isinstance(schema, SchemaGrammar) else SchemaGrammar(schema)
+    return JSONSchemaLogitsProcessor(
+        grammar,
+        get_token_texts(tokenizer),
+        getattr(tokenizer, "eos_token_id", None),
+        **kwargs
+    )
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Tolerant JSON Salvage Parser
+Recovers complete key/value pairs from truncated or slightly malformed model output
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = " \t\n\r"
+BARE_WORDS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+
+class _Truncated(Exception):
+    """Raised internally when the input ends in the middle of a value."""
+
+class TolerantJSONParser:
+    """
+    Single-pass recursive-descent parser that never raises on bad input.
+
+    Handles: text before the first brace, single-quoted or bare keys,
+    missing or trailing commas, raw newlines that end an unclosed string,
+    and input that stops mid-object. Values cut off by the end of the input
+    are dropped and their dotted paths reported in ``partial_keys``.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.partial_keys: List[str] = []
+        self.repairs: List[str] = []
+        self.truncated = False
+
+    def parse(self) -> Dict[str, Any]:
+        """Parse the first object in the text, returning whatever could be recovered."""
+        start = self.text.find("{")
+        if start == -1:
+            return {}
+
+        self.pos = start
+        data, _ = self._parse_object("")
+        return data
+
+    def _peek(self) -> Optional[str]:
+        return self.text[self.pos] if self.pos < len(self.text) else None
+
+    def _skip_whitespace(self):
+        while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+            self.pos += 1
+
+    def _parse_object(self, path: str) -> Tuple[Dict[str, Any], bool]:
+        """Parse an object starting at '{'. Returns (pairs recovered, closed properly)."""
+        self.pos += 1
+        obj: Dict[str, Any] = {}
+
+        while True:
+            self._skip_whitespace()
+            char = self._peek()
+
+            if char is None:
+                self.truncated = True
+                return obj, False
+            if char == "}":
+                self.pos += 1
+                return obj, True
+            if char == ",":
+                self.pos += 1
+                continue
+
+            key = self._parse_key()
+            if key is None:
+                # Unparseable junk between pairs; skip it.
+                self.pos += 1
+                continue
+
+            key_path = f"{path}.{key}" if path else key
+            self._skip_whitespace()
+
+            if self._peek() == ":":
+                self.pos += 1
+            elif self._peek() is None:
+                self.truncated = True
+                self.partial_keys.append(key_path)
+                return obj, False
+            else:
+                self.repairs.append(f"missing ':' after {key_path}")
+
+            self._skip_whitespace()
+            try:
+                value, complete = self._parse_value(key_path)
+            except _Truncated:
+                self.truncated = True
+                self.partial_keys.append(key_path)
+                return obj, False
+
+            if isinstance(value, dict):
+                # Keep the complete pairs of a nested object even if it was cut off.
+                obj[key] = value
+                if not complete:
+                    return obj, False
+            elif complete:
+                obj[key] = value
+            else:
+                self.partial_keys.append(key_path)
+                return obj, False
+
+    def _parse_key(self) -> Optional[str]:
+        char = self._peek()
+        if char in ('"', "'"):
+            try:
+                key, _ = self._parse_string(char)
+            except _Truncated:
+                self.truncated = True
+                return None
+            return key
+
+        start = self.pos
+        while self.pos < len(self.text) and (self.text[self.pos].isalnum() or self.text[self.pos] in "_-"):
+            self.pos += 1
+        if self.pos == start:
+            return None
+        self.repairs.append(f"unquoted key {self.text[start:self.pos]}")
+        return self.text[start:self.pos]
+
+    def _parse_value(self, path: str) -> Tuple[Any, bool]:
+        """Parse any JSON value. Returns (value, complete)."""
+        char = self._peek()
+
+        if char is None:
+            raise _Truncated()
+        if char == "{":
+            return self._parse_object(path)
+        if char == "[":
+            return self._parse_array(path)
+        if char in ('"', "'"):
+            return self._parse_string(char)
+        return self._parse_bare()
+
+    def _parse_array(self, path: str) -> Tuple[List[Any], bool]:
+        self.pos += 1
+        items: List[Any] = []
+
+        while True:
+            self._skip_whitespace()
+            char = self._peek()
+
+            if char is None:
+                raise _Truncated()
+            if char == "]":
+                self.pos += 1
+                return items, True
+            if char == ",":
+                self.pos += 1
+                continue
+
+            value, complete = self._parse_value(path)
+            if not complete:
+                raise _Truncated()
+            items.append(value)
+
+    def _parse_string(self, quote: str) -> Tuple[str, bool]:
+        self.pos += 1
+        chars = []
+        escapes = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+
+            if char == "\\":
+                if self.pos + 1 >= len(self.text):
+                    break
+                nxt = self.text[self.pos + 1]
+                if nxt == "u" and self.pos + 6 <= len(self.text):
+                    try:
+                        chars.append(chr(int(self.text[self.pos + 2:self.pos + 6], 16)))
+                        self.pos += 6
+                        continue
+                    except ValueError:
+                        pass
+                chars.append(escapes.get(nxt, nxt))
+                self.pos += 2
+                continue
+
+            if char == quote:
+                self.pos += 1
+                return "".join(chars), True
+
+            if char in "\r\n":
+                # JSON strings cannot span lines: treat the line end as the missing close quote.
+                self.repairs.append("unterminated string closed at line end")
+                return "".join(chars).rstrip().rstrip(",").rstrip(), True
+
+            chars.append(char)
+            self.pos += 1
+
+        raise _Truncated()
+
+    def _parse_bare(self) -> Tuple[Any, bool]:
+        """Numbers, true/false/null and unquoted words, up to the next delimiter."""
+        start = self.pos
+        while self.pos < len(self.text) and self.text[self.pos] not in ",}]\n\r":
+            self.pos += 1
+
+        if self.pos >= len(self.text):
+            # The value might have continued past the end of the input.
+            raise _Truncated()
+
+        word = self.text[start:self.pos].strip()
+        if word in BARE_WORDS:
+            return BARE_WORDS[word], True
+
+        try:
+            number = float(word)
+            return int(number) if number.is_integer() and "." not in word else number, True
+        except ValueError:
+            self.repairs.append(f"unquoted value {word!r}")
+            return word, True
+
+def salvage_json(text: str) -> Dict[str, Any]:
+    """
+    Recover as much of a JSON object as possible.
+
+    Returns:
+        Dictionary with the recovered ``data``, whether the input was
+        ``truncated``, the dotted ``partial_keys`` that were cut off and the
+        ``repairs`` applied along the way.
+    """
+    parser = TolerantJSONParser(text)
+    data = parser.parse()
+    return {
+        "data": data,
+        "truncated": parser.truncated,
+        "partial_keys": parser.partial_keys,
+        "repairs": parser.repairs
+    }
+
+def missing_fields(schema: Dict, data: Dict) -> Dict:
+    """Return the part of the schema whose leaves are absent from data."""
+    missing = {}
+    for key, value in schema.items():
+        if isinstance(value, dict):
+            present = data.get(key)
+            nested = missing_fields(value, present if isinstance(present, dict) else {})
+            if nested:
+                missing[key] = nested
+        elif key not in data:
+            missing[key] = value
+    return missing
+
+def merge_fields(base: Dict, extra: Dict) -> Dict:
+    """Fill keys missing from base with values from extra, recursing into nested objects."""
+    merged = dict(base)
+    for key, value in extra.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_fields(merged[key], value)
+        elif key not in merged:
+            merged[key] = value
+    return merged
+
+def flatten_keys(schema: Dict, prefix: str = "") -> List[str]:
+    """Dotted paths of every leaf in a schema."""
+    keys = []
+    for key, value in schema.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            keys.extend(flatten_keys(value, path))
+        else:
+            keys.append(path)
+    return keys
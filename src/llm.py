@@ -6,121 +6,198 @@ Handles document parsing using local LLMs via transformers
 
 import logging
 import re
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any, List
-import torch
-from transformers import pipeline
+from typing import Dict, Any, List, Optional
+
+from .cpu_budget import limit_loaded_libraries
+from .metrics import REGISTRY
+from .tracing import TRACER
 
 logger = logging.getLogger(__name__)
 
 class LLMParser:
-    import torch
-    from transformers import pipeline
+    """Parses OCR text with a local transformers model, loaded on first use, or with LLM servers over HTTP."""
+    
+    # Bump when prompts or response handling change what parse_document returns.
+    STAGE_VERSION = "1"
     
-    class LLMParser:
-        def __init__(self, model_name: str = "microsoft/phi-2", ollama_host: str = "http://localhost:11434", model: str = None):
-            try:
-                if model and not model_name:
-                    model_name = model
-                    
-                self.model = model_name
-                self.ollama_host = ollama_host
-                
-                if ollama_host and model_name in ["llama", "phi", "mistral"]:
-                    logger.info(f"Using Ollama model {model_name} at {ollama_host}")
-                
-                self.generator = pipeline(
-                    "text-generation",
-                    model=model_name,
-                    device="cuda" if torch.cuda.is_available() else "cpu"
-                )
-                logger.info(f"Initialized LLM with model: {model_name}")
-            except Exception as e:
-                logger.error(f"Failed to initialize LLM: {e}")
-                raise
-
-    def parse_document(self, text: str, filename: str = None) -> Dict[str, Any]:
+    def __init__(self, model_name: str = "microsoft/phi-2", ollama_host: str = "http://localhost:11434", model: str = None,
+                 provider: Optional[str] = None, hosts: Optional[List[str]] = None, max_concurrency: int = 32):
+        """
+        Args:
+            model_name: transformers model, or the server-side model name when hosts are given
+            ollama_host: Legacy single Ollama host (informational)
+            model: Alias for model_name
+            provider: LLM server type from llm_detector (e.g. 'ollama', 'llama_cpp')
+            hosts: Server URLs; when set, generation is load-balanced across them instead of running locally
+            max_concurrency: Upper bound for each server's adaptive in-flight request limit
+        """
+        if model and not model_name:
+            model_name = model
+            
+        self.model = model_name
+        self.ollama_host = ollama_host
+        self.provider = provider
+        self.hosts = hosts or []
+        self.max_concurrency = max_concurrency
+        self.client = None
+        self._generator = None
+        self._load_lock = threading.Lock()
+        
+        if ollama_host and model_name in ["llama", "phi", "mistral"]:
+            logger.info(f"Using Ollama model {model_name} at {ollama_host}")
+    
+    @property
+    def generator(self):
+        """Text-generation pipeline, created on first access."""
+        if self._generator is None:
+            with self._load_lock:
+                if self._generator is None:
+                    self._generator = self._load_generator()
+        return self._generator
+    
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the model has already been loaded."""
+        return self._generator is not None
+    
+    def _load_generator(self):
+        """Import torch/transformers and build the generation pipeline."""
+        if self.hosts:
+            from .llm_client import MultiEndpointClient, HTTPGenerator
+            
+            self.client = MultiEndpointClient(self.provider or 'ollama', self.hosts, self.model,
+                                              max_concurrency=self.max_concurrency)
+            self.client.start_health_checks()
+            logger.info(f"Using {len(self.hosts)} {self.provider or 'ollama'} endpoint(s) for model {self.model}")
+            return HTTPGenerator(self.client)
+        
+        try:
+            import torch
+            from transformers import pipeline
+            limit_loaded_libraries()
+            
+            generator = pipeline(
+                "text-generation",
+                model=self.model,
+                device="cuda" if torch.cuda.is_available() else "cpu"
+            )
+            logger.info(f"Initialized LLM with model: {self.model}")
+            return generator
+        except Exception as e:
+            logger.error(f"Failed to initialize LLM: {e}")
+            raise
+    
+    def warm_up(self) -> bool:
+        """Load the model ahead of the first document so parsing starts immediately."""
+        try:
+            self.generator
+            return True
+        except Exception as e:
+            logger.warning(f"LLM warm-up failed: {e}")
+            return False
+
+    # (section, field, prompt key) for every generation parse_document makes;
+    # section None means a top-level field.
+    FIELD_PLAN = [
+        (None, "merchant_name", "merchant_name"),
+        (None, "ein_or_ssn", "ein_or_ssn"),
+        (None, "document_type", "document_type"),
+        (None, "requested_amount", "requested_amount"),
+        ("address", "street", "address_street"),
+        ("address", "city", "address_city"),
+        ("address", "state", "address_state"),
+        ("address", "zip", "address_zip"),
+        ("contact_info", "phone", "contact_phone"),
+        ("contact_info", "email", "contact_email"),
+        ("business_info", "business_type", "business_type"),
+        ("business_info", "annual_revenue", "annual_revenue"),
+        ("business_info", "years_in_business", "years_in_business"),
+        ("business_info", "processing_volume", "processing_volume"),
+    ]
+
+    def _field_plan(self, fields: Optional[List[str]]) -> List:
+        if fields is None:
+            return self.FIELD_PLAN
+        return [entry for entry in self.FIELD_PLAN if entry[2] in fields]
+
+    def parse_document(self, text: str, filename: str = None, fields: Optional[List[str]] = None,
+                       document_type: Optional[str] = None) -> Dict[str, Any]:
         """
         Parse document text to extract structured information.
 
         Args:
             text: OCR-extracted text from document
             filename: Optional source filename for logging and context
+            fields: Prompt keys to ask for (default: the whole FIELD_PLAN)
+            document_type: Already known type, stored instead of being asked
 
         Returns:
             Dictionary containing extracted fields
         """
         try:
             chunks = self._chunk_text(text)
+            structured_data = self._empty_structure(filename)
+            if document_type:
+                structured_data["document_type"] = document_type
 
-            structured_data = {
-                "merchant_name": "",
-                "ein_or_ssn": "",
-                "document_type": "application",
-                "address": {
-                    "street": "",
-                    "city": "",
-                    "state": "",
-                    "zip": ""
-                },
-                "contact_info": {
-                    "phone": "",
-                    "email": ""
-                },
-                "business_info": {
-                    "business_type": "",
-                    "annual_revenue": "",
-                    "years_in_business": "",
-                    "processing_volume": ""
-                },
-                "requested_amount": "",
-                "source_file": filename if filename else "unknown",
-                "confidence_score": 0.7,
-                "flagged_issues": []
-            }
-
-            direct_fields = ["merchant_name", "ein_or_ssn", "document_type", "requested_amount"]
-            
-            for field in direct_fields:
-                prompt = self._get_field_prompt(field, chunks[0])
-                response = self.generator(prompt, max_length=100, num_return_sequences=1)
-                if isinstance(response, list) and len(response) > 0:
-                    if isinstance(response[0], dict) and 'generated_text' in response[0]:
-                        structured_data[field] = self._clean_response(response[0]['generated_text'])
-                    else:
-                        structured_data[field] = self._clean_response(str(response[0]))
-                else:
-                    structured_data[field] = ""
-            
-            address_fields = ["street", "city", "state", "zip"]
-            for field in address_fields:
-                prompt = self._get_field_prompt(f"address_{field}", chunks[0])
-                response = self.generator(prompt, max_length=100, num_return_sequences=1)
-                if isinstance(response, list) and len(response) > 0:
-                    if isinstance(response[0], dict) and 'generated_text' in response[0]:
-                        structured_data["address"][field] = self._clean_response(response[0]['generated_text'])
-                    else:
-                        structured_data["address"][field] = self._clean_response(str(response[0]))
-            
-            contact_fields = ["phone", "email"]
-            for field in contact_fields:
-                prompt = self._get_field_prompt(f"contact_{field}", chunks[0])
-                response = self.generator(prompt, max_length=100, num_return_sequences=1)
-                if isinstance(response, list) and len(response) > 0:
-                    if isinstance(response[0], dict) and 'generated_text' in response[0]:
-                        structured_data["contact_info"][field] = self._clean_response(response[0]['generated_text'])
-                    else:
-                        structured_data["contact_info"][field] = self._clean_response(str(response[0]))
-            
-            business_fields = ["business_type", "annual_revenue", "years_in_business", "processing_volume"]
-            for field in business_fields:
-                prompt = self._get_field_prompt(field, chunks[0])
-                response = self.generator(prompt, max_length=100, num_return_sequences=1)
-                if isinstance(response, list) and len(response) > 0:
-                    if isinstance(response[0], dict) and 'generated_text' in response[0]:
-                        structured_data["business_info"][field] = self._clean_response(response[0]['generated_text'])
-                    else:
-                        structured_data["business_info"][field] = self._clean_response(str(response[0]))
+            for section, field, prompt_key in self._field_plan(fields):
+                prompt = self._get_field_prompt(prompt_key, chunks[0])
+                with REGISTRY.timer("llm_call_seconds", field=prompt_key), \
+                        TRACER.span("llm_call", cat="llm", field=prompt_key) as span:
+                    response = self.generator(prompt, max_length=100, num_return_sequences=1)
+                    if TRACER.enabled:
+                        span.set(prompt_tokens=self._count_tokens(prompt))
+                self._store_field(structured_data, section, field, self._response_text(response))
+
+            logger.info("Successfully parsed document")
+            return structured_data
+
+        except Exception as e:
+            logger.error(f"Error parsing document: {e}")
+            raise
+
+    async def aparse_document(self, text: str, filename: str = None, executor=None, fields: Optional[List[str]] = None,
+                              document_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async parse_document.
+
+        With LLM servers configured the field prompts are sent concurrently
+        over async HTTP; a local transformers model runs in the executor.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if not self.hosts:
+            return await loop.run_in_executor(executor, lambda: self.parse_document(text, filename, fields, document_type))
+
+        if not self.is_loaded:
+            await loop.run_in_executor(executor, lambda: self.generator)
+
+        try:
+            chunks = self._chunk_text(text)
+            structured_data = self._empty_structure(filename)
+            if document_type:
+                structured_data["document_type"] = document_type
+            plan = self._field_plan(fields)
+
+            async def generate(prompt_key: str) -> str:
+                prompt = self._get_field_prompt(prompt_key, chunks[0])
+                start = time.perf_counter()
+                # The field calls overlap on the event loop thread, so each gets its own async track.
+                with TRACER.span("llm_call", cat="llm", async_track=True, field=prompt_key) as span:
+                    if TRACER.enabled:
+                        span.set(prompt_tokens=self._count_tokens(prompt))
+                    try:
+                        return await self.client.agenerate(prompt, max_tokens=100)
+                    finally:
+                        REGISTRY.observe("llm_call_seconds", time.perf_counter() - start, field=prompt_key)
+
+            responses = await asyncio.gather(*(generate(prompt_key) for _, _, prompt_key in plan))
+            for (section, field, _), response in zip(plan, responses):
+                self._store_field(structured_data, section, field, self._clean_response(response))
 
             logger.info("Successfully parsed document")
             return structured_data
@@ -129,6 +206,63 @@ class LLMParser:
             logger.error(f"Error parsing document: {e}")
             raise
 
+    def cache_fingerprint(self) -> Dict[str, Any]:
+        """Settings that affect parsed output, for the stage cache."""
+        return {
+            "model": self.model,
+            "backend": self.provider or ('ollama' if self.hosts else 'transformers'),
+            "fields": [prompt_key for _, _, prompt_key in self.FIELD_PLAN]
+        }
+
+    def _count_tokens(self, prompt: str) -> int:
+        """Prompt length in model tokens when a local tokenizer is loaded, otherwise in words."""
+        tokenizer = getattr(self._generator, 'tokenizer', None)
+        if tokenizer is not None:
+            return len(tokenizer.encode(prompt))
+        return len(prompt.split())
+
+    def _empty_structure(self, filename: Optional[str]) -> Dict[str, Any]:
+        return {
+            "merchant_name": "",
+            "ein_or_ssn": "",
+            "document_type": "application",
+            "address": {
+                "street": "",
+                "city": "",
+                "state": "",
+                "zip": ""
+            },
+            "contact_info": {
+                "phone": "",
+                "email": ""
+            },
+            "business_info": {
+                "business_type": "",
+                "annual_revenue": "",
+                "years_in_business": "",
+                "processing_volume": ""
+            },
+            "requested_amount": "",
+            "source_file": filename if filename else "unknown",
+            "confidence_score": 0.7,
+            "flagged_issues": []
+        }
+
+    def _response_text(self, response) -> str:
+        """Cleaned text of a generator response, or "" when it produced nothing."""
+        if isinstance(response, list) and len(response) > 0:
+            if isinstance(response[0], dict) and 'generated_text' in response[0]:
+                return self._clean_response(response[0]['generated_text'])
+            return self._clean_response(str(response[0]))
+        return ""
+
+    @staticmethod
+    def _store_field(structured_data: Dict[str, Any], section: Optional[str], field: str, value: str):
+        if section is None:
+            structured_data[field] = value
+        else:
+            structured_data[section][field] = value
+
     def _chunk_text(self, text: str, max_length: int = 512) -> List[str]:
         """Split text into manageable chunks."""
         paragraphs = text.split('\n\n')
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Multi-Endpoint LLM Client
+Spreads generation requests across several local LLM servers by observed latency and load
+"""
+
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from .concurrency import AdaptiveConcurrencyLimiter
+from .llm_detector import PROVIDER_DEFINITIONS, build_generate_payload
+
+logger = logging.getLogger(__name__)
+
+def extract_generated_text(provider_id: str, data: Dict) -> str:
+    """Pull the completion text out of a provider's non-streaming response."""
+    if provider_id == 'ollama':
+        return data.get('response', '')
+
+    choices = data.get('choices') or [{}]
+    message = choices[0].get('message') or {}
+    return message.get('content') or choices[0].get('text', '')
+
+class EndpointState:
+    """Health and load bookkeeping for one server."""
+
+    def __init__(self, host: str, limiter: Optional[AdaptiveConcurrencyLimiter] = None):
+        self.host = host.rstrip('/')
+        self.limiter = limiter or AdaptiveConcurrencyLimiter(name=self.host)
+        self.ewma_latency: Optional[float] = None
+        self.in_flight = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_at: Optional[float] = None
+        # Set on re-admission: one request at a time until a real latency sample arrives.
+        self.probation = False
+        self.total_requests = 0
+        self.total_failures = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'host': self.host,
+            'healthy': self.healthy,
+            'probation': self.probation,
+            'ewma_latency': self.ewma_latency,
+            'in_flight': self.in_flight,
+            'consecutive_failures': self.consecutive_failures,
+            'total_requests': self.total_requests,
+            'total_failures': self.total_failures,
+            'concurrency': self.limiter.get_metrics()
+        }
+
+class MultiEndpointClient:
+    """
+    Routes each generation to the least-loaded healthy endpoint.
+
+    An endpoint's cost is its EWMA latency times (in-flight requests + 1);
+    endpoints with no latency sample yet are preferred so they get measured.
+    After max_failures consecutive errors an endpoint is ejected, and it is
+    re-admitted once a health check against its test endpoint succeeds. A
+    re-admitted endpoint starts from the median latency of the others and
+    serves one request at a time until that request succeeds (or is ejected
+    again if it fails), so a flaky server does not draw every new request.
+
+    Each endpoint also has an AIMD concurrency limit; when every healthy
+    endpoint is at its limit, callers wait for a slot instead of piling
+    more requests onto a saturated server.
+    """
+
+    def __init__(self, provider_id: str, hosts: List[str], model: str, timeout: float = 120.0,
+                 ewma_alpha: float = 0.3, max_failures: int = 3, readmit_interval: float = 30.0,
+                 initial_concurrency: int = 4, max_concurrency: int = 32, acquire_timeout: float = 300.0):
+        if provider_id not in PROVIDER_DEFINITIONS:
+            raise ValueError(f"Unknown LLM provider: {provider_id}")
+        if not hosts:
+            raise ValueError("At least one host is required")
+
+        self.provider_id = provider_id
+        self.provider_info = PROVIDER_DEFINITIONS[provider_id]
+        self.model = model
+        self.timeout = timeout
+        self.ewma_alpha = ewma_alpha
+        self.max_failures = max_failures
+        self.readmit_interval = readmit_interval
+
+        self.acquire_timeout = acquire_timeout
+
+        self.endpoints = [
+            EndpointState(host, AdaptiveConcurrencyLimiter(initial_limit=initial_concurrency,
+                                                           max_limit=max_concurrency, name=host))
+            for host in hosts
+        ]
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._slot_available = threading.Condition(self._lock)
+        self._async_sessions = weakref.WeakKeyDictionary()
+        self._health_thread = None
+        self._stop_event = threading.Event()
+
+    def generate(self, prompt: str, max_tokens: int = 256, temperature: float = 0.3) -> str:
+        """Generate a completion, failing over to the next endpoint on errors."""
+        payload = build_generate_payload(self.provider_id, self.model, prompt,
+                                         max_tokens=max_tokens, temperature=temperature)
+        tried = set()
+        last_error = None
+
+        while True:
+            endpoint = self._acquire_endpoint(exclude=tried)
+            if endpoint is None:
+                break
+            tried.add(endpoint.host)
+
+            start_time = time.perf_counter()
+            try:
+                response = self.session.post(
+                    f"{endpoint.host}{self.provider_info['generate_endpoint']}",
+                    json=payload,
+                    timeout=(2.0, self.timeout)
+                )
+                response.raise_for_status()
+                text = extract_generated_text(self.provider_id, response.json())
+                self._release_endpoint(endpoint, time.perf_counter() - start_time, success=True)
+                return text
+
+            except Exception as e:
+                last_error = e
+                self._release_endpoint(endpoint, time.perf_counter() - start_time, success=False,
+                                       timed_out=isinstance(e, requests.Timeout))
+                logger.warning(f"LLM request to {endpoint.host} failed: {e}")
+
+        raise RuntimeError(f"No healthy {self.provider_info['name']} endpoint could serve the request: {last_error}")
+
+    def _acquire_endpoint(self, exclude=()) -> Optional[EndpointState]:
+        """Pick the cheapest healthy endpoint with a free slot and count the request against it."""
+        candidates = self._candidate_endpoints(exclude)
+        if not candidates:
+            return None
+
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._lock:
+            while True:
+                candidates = [e for e in candidates if e.healthy]
+                if not candidates:
+                    return None
+
+                endpoint = self._take_slot(candidates)
+                if endpoint is not None:
+                    return endpoint
+
+                # Every candidate is at its concurrency limit; wait for a release.
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Timed out waiting for a free LLM slot after {self.acquire_timeout:.0f}s")
+                    return None
+                self._slot_available.wait(min(remaining, 1.0))
+
+    def _candidate_endpoints(self, exclude=()) -> List[EndpointState]:
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy and e.host not in exclude]
+
+        if not candidates and not exclude:
+            # Everything is ejected; try to bring endpoints back before giving up.
+            self.check_health(include_healthy=False, force=True)
+            with self._lock:
+                candidates = [e for e in self.endpoints if e.healthy]
+        return candidates
+
+    def _take_slot(self, candidates: List[EndpointState]) -> Optional[EndpointState]:
+        """Claim a slot on the cheapest candidate that has one. Caller holds the lock."""
+        for endpoint in sorted(candidates, key=self._endpoint_cost):
+            if endpoint.probation and endpoint.in_flight:
+                continue
+            if endpoint.limiter.try_acquire():
+                endpoint.in_flight += 1
+                endpoint.total_requests += 1
+                return endpoint
+        return None
+
+    async def agenerate(self, prompt: str, max_tokens: int = 256, temperature: float = 0.3) -> str:
+        """
+        Async generate over aiohttp, with the same routing, limits and failover.
+
+        Falls back to running generate() in the default executor when aiohttp
+        is not installed.
+        """
+        import asyncio
+
+        try:
+            import aiohttp
+        except ImportError:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: self.generate(prompt, max_tokens, temperature))
+
+        payload = build_generate_payload(self.provider_id, self.model, prompt,
+                                         max_tokens=max_tokens, temperature=temperature)
+        session = self._get_async_session(aiohttp)
+        tried = set()
+        last_error = None
+
+        while True:
+            endpoint = await self._acquire_endpoint_async(exclude=tried)
+            if endpoint is None:
+                break
+            tried.add(endpoint.host)
+
+            start_time = time.perf_counter()
+            try:
+                async with session.post(f"{endpoint.host}{self.provider_info['generate_endpoint']}",
+                                        json=payload) as response:
+                    response.raise_for_status()
+                    text = extract_generated_text(self.provider_id, await response.json(content_type=None))
+                self._release_endpoint(endpoint, time.perf_counter() - start_time, success=True)
+                return text
+
+            except Exception as e:
+                last_error = e
+                self._release_endpoint(endpoint, time.perf_counter() - start_time, success=False,
+                                       timed_out=isinstance(e, asyncio.TimeoutError))
+                logger.warning(f"LLM request to {endpoint.host} failed: {e}")
+
+        raise RuntimeError(f"No healthy {self.provider_info['name']} endpoint could serve the request: {last_error}")
+
+    async def _acquire_endpoint_async(self, exclude=()) -> Optional[EndpointState]:
+        """_acquire_endpoint without blocking the event loop while endpoints are saturated."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy and e.host not in exclude]
+        if not candidates and not exclude:
+            # Health probes are blocking HTTP; keep them off the loop.
+            candidates = await loop.run_in_executor(None, self._candidate_endpoints, exclude)
+
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._lock:
+                candidates = [e for e in candidates if e.healthy]
+                if not candidates:
+                    return None
+                endpoint = self._take_slot(candidates)
+            if endpoint is not None:
+                return endpoint
+            if time.monotonic() > deadline:
+                logger.warning(f"Timed out waiting for a free LLM slot after {self.acquire_timeout:.0f}s")
+                return None
+            await asyncio.sleep(0.02)
+
+    def _get_async_session(self, aiohttp):
+        """One aiohttp session per event loop; sessions cannot be shared across loops."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        session = self._async_sessions.get(loop)
+        if session is None or session.closed:
+            timeout = aiohttp.ClientTimeout(sock_connect=2.0, total=self.timeout)
+            session = aiohttp.ClientSession(timeout=timeout)
+            self._async_sessions[loop] = session
+        return session
+
+    async def aclose(self):
+        """Close the aiohttp session for the running loop."""
+        import asyncio
+
+        session = self._async_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    def _endpoint_cost(self, endpoint: EndpointState) -> float:
+        if endpoint.ewma_latency is None:
+            return endpoint.in_flight * 1e-6
+        return endpoint.ewma_latency * (endpoint.in_flight + 1)
+
+    def _release_endpoint(self, endpoint: EndpointState, latency: float, success: bool, timed_out: bool = False):
+        """Record the outcome of a request."""
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.limiter.release(latency, success=success, timed_out=timed_out)
+            self._slot_available.notify_all()
+
+            if success:
+                endpoint.consecutive_failures = 0
+                if endpoint.ewma_latency is None or endpoint.probation:
+                    # The first real sample replaces the seeded estimate.
+                    endpoint.ewma_latency = latency
+                    endpoint.probation = False
+                else:
+                    endpoint.ewma_latency += self.ewma_alpha * (latency - endpoint.ewma_latency)
+                return
+
+            endpoint.total_failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.healthy and (endpoint.probation or endpoint.consecutive_failures >= self.max_failures):
+                self._eject(endpoint)
+
+    def _eject(self, endpoint: EndpointState):
+        endpoint.healthy = False
+        endpoint.ejected_at = time.time()
+        logger.warning(f"Ejected LLM endpoint {endpoint.host} after {endpoint.consecutive_failures} failures")
+
+    def check_health(self, include_healthy: bool = True, force: bool = False) -> List[Dict[str, Any]]:
+        """
+        Probe endpoints and update their health.
+
+        Ejected endpoints are only re-probed after readmit_interval unless force
+        is set; healthy endpoints that fail the probe are ejected.
+        """
+        now = time.time()
+        for endpoint in list(self.endpoints):
+            if endpoint.healthy and not include_healthy:
+                continue
+            if not endpoint.healthy and not force and now - (endpoint.ejected_at or 0) < self.readmit_interval:
+                continue
+
+            alive = self._probe(endpoint)
+            with self._lock:
+                if alive and not endpoint.healthy:
+                    endpoint.healthy = True
+                    endpoint.consecutive_failures = 0
+                    endpoint.ewma_latency = self._median_latency()
+                    endpoint.probation = True
+                    logger.info(f"Re-admitted LLM endpoint {endpoint.host} on probation")
+                elif not alive and endpoint.healthy:
+                    endpoint.consecutive_failures = self.max_failures
+                    self._eject(endpoint)
+                elif not alive:
+                    endpoint.ejected_at = now
+
+        return self.get_endpoint_status()
+
+    def _median_latency(self) -> Optional[float]:
+        """Median EWMA latency of the healthy, measured endpoints. Caller holds the lock."""
+        samples = sorted(e.ewma_latency for e in self.endpoints
+                         if e.healthy and not e.probation and e.ewma_latency is not None)
+        return samples[len(samples) // 2] if samples else None
+
+    def _probe(self, endpoint: EndpointState) -> bool:
+        try:
+            response = self.session.get(f"{endpoint.host}{self.provider_info['test_endpoint']}", timeout=(0.5, 3.0))
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    def start_health_checks(self, interval: float = 10.0):
+        """Run check_health periodically on a daemon thread."""
+        if self._health_thread and self._health_thread.is_alive():
+            return
+
+        def loop():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.check_health()
+                except Exception as e:
+                    logger.debug(f"Health check failed: {e}")
+
+        self._stop_event.clear()
+        self._health_thread = threading.Thread(target=loop, name="llm-health-check", daemon=True)
+        self._health_thread.start()
+
+    def get_endpoint_status(self) -> List[Dict[str, Any]]:
+        """Snapshot of every endpoint's health and load."""
+        with self._lock:
+            return [endpoint.to_dict() for endpoint in self.endpoints]
+
+    def get_concurrency_metrics(self) -> Dict[str, Any]:
+        """Per-endpoint concurrency limits and latency percentiles, plus totals."""
+        with self._lock:
+            endpoints = {endpoint.host: endpoint.limiter.get_metrics() for endpoint in self.endpoints}
+
+        return {
+            'total_limit': sum(m['limit'] for m in endpoints.values()),
+            'total_in_flight': sum(m['in_flight'] for m in endpoints.values()),
+            'endpoints': endpoints
+        }
+
+    def close(self):
+        """Stop health checks and release HTTP connections."""
+        self._stop_event.set()
+        self.session.close()
+
+class HTTPGenerator:
+    """Adapter giving a MultiEndpointClient the call signature of a transformers text-generation pipeline."""
+
+    def __init__(self, client: MultiEndpointClient):
+        self.client = client
+
+    def __call__(self, prompt: str, max_length: int = 100, num_return_sequences: int = 1, **kwargs) -> List[Dict[str, str]]:
+        temperature = kwargs.get('temperature', 0.3)
+        return [
+            {'generated_text': self.client.generate(prompt, max_tokens=max_length, temperature=temperature)}
+            for _ in range(num_return_sequences)
+        ]
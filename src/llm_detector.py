@@ -4,121 +4,322 @@ LLM Provider Detection and Management
 Automatically detects available LLM providers and manages connections
 """
 
+import copy
 import logging
 import requests
 import json
+import threading
 import yaml
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 import subprocess
 import time
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CACHE_PATH = "output/cache/llm_providers.json"
+
+# Connection details for each supported provider.
+PROVIDER_DEFINITIONS = {
+    'ollama': {
+        'name': 'Ollama',
+        'default_host': 'http://localhost:11434',
+        'test_endpoint': '/api/tags',
+        'models_endpoint': '/api/tags',
+        'generate_endpoint': '/api/generate',
+        'icon': '🐙'
+    },
+    'lm_studio': {
+        'name': 'LM Studio',
+        'default_host': 'http://localhost:1234',
+        'test_endpoint': '/v1/models',
+        'models_endpoint': '/v1/models',
+        'generate_endpoint': '/v1/chat/completions',
+        'icon': '🎯'
+    },
+    'lm_studio_ci': {
+        'name': 'LM Studio CI',
+        'default_host': 'http://localhost:1234',
+        'test_endpoint': '/v1/models',
+        'models_endpoint': '/v1/models',
+        'generate_endpoint': '/v1/chat/completions',
+        'icon': '🚀'
+    },
+    'llama_cpp': {
+        'name': 'llama.cpp',
+        'default_host': 'http://localhost:8080',
+        'test_endpoint': '/v1/models',
+        'models_endpoint': '/v1/models',
+        'generate_endpoint': '/v1/chat/completions',
+        'icon': '🦙'
+    }
+}
+
+# Fixed extraction task used to compare models; the expected values are
+# checked in the output to score accuracy.
+BENCHMARK_DOCUMENT = """MERCHANT CASH ADVANCE APPLICATION
+Business Name: Riverside Coffee Roasters LLC
+EIN: 84-1234567
+Address: 1200 Harbor Blvd, Tampa, FL 33602
+Phone: (813) 555-0142
+Email: owner@riversidecoffee.com
+Requested Amount: $75,000"""
+
+BENCHMARK_PROMPT = f"""Extract merchant information from this document:
+
+{BENCHMARK_DOCUMENT}
+
+Return JSON with business_name, tax_id, phone, email, zip and requested_amount.
+
+Response:"""
+
+BENCHMARK_EXPECTED = {
+    "business_name": "riverside coffee roasters",
+    "tax_id": "84-1234567",
+    "phone": "555-0142",
+    "email": "owner@riversidecoffee.com",
+    "zip": "33602",
+    "requested_amount": "75,000"
+}
+
+def build_generate_payload(provider_id: str, model_name: str, prompt: str, max_tokens: int = 10,
+                           temperature: float = 0.7, stream: bool = False) -> Dict:
+    """Build a generation request body for a provider's generate endpoint."""
+    if provider_id == 'ollama':
+        return {
+            "model": model_name,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+    
+    return {
+        "model": model_name,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": stream
+    }
+
 class LLMProviderDetector:
     """Detects and manages different LLM providers."""
     
-    def __init__(self):
-        self.providers = {
-            'ollama': {
-                'name': 'Ollama',
-                'default_host': 'http://localhost:11434',
-                'test_endpoint': '/api/tags',
-                'models_endpoint': '/api/tags',
-                'generate_endpoint': '/api/generate',
-                'icon': '🐙'
-            },
-            'lm_studio': {
-                'name': 'LM Studio',
-                'default_host': 'http://localhost:1234',
-                'test_endpoint': '/v1/models',
-                'models_endpoint': '/v1/models',
-                'generate_endpoint': '/v1/chat/completions',
-                'icon': '🎯'
-            },
-            'lm_studio_ci': {
-                'name': 'LM Studio CI',
-                'default_host': 'http://localhost:1234',
-                'test_endpoint': '/v1/models',
-                'models_endpoint': '/v1/models',
-                'generate_endpoint': '/v1/chat/completions',
-                'icon': '🚀'
-            },
-            'llama_cpp': {
-                'name': 'llama.cpp',
-                'default_host': 'http://localhost:8080',
-                'test_endpoint': '/v1/models',
-                'models_endpoint': '/v1/models',
-                'generate_endpoint': '/v1/chat/completions',
-                'icon': '🦙'
-            }
-        }
+    def __init__(self, cache_path: Optional[str] = DEFAULT_CACHE_PATH, cache_ttl: float = 300.0,
+                 connect_timeout: float = 0.5, read_timeout: float = 3.0, min_accuracy: float = 0.8):
+        """
+        Args:
+            cache_path: JSON file holding the last detection result (None disables caching)
+            cache_ttl: Seconds before a cached result is refreshed in the background
+            connect_timeout: Seconds to wait for a provider to accept the connection
+            read_timeout: Seconds to wait for a provider's response once connected
+            min_accuracy: Benchmark accuracy a model needs before it can be recommended
+        """
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.cache_ttl = cache_ttl
+        self.min_accuracy = min_accuracy
+        self.timeout = (connect_timeout, read_timeout)
+        self._lock = threading.RLock()
+        self._refresh_thread = None
+        
+        self.providers = copy.deepcopy(PROVIDER_DEFINITIONS)
         
         self.detected_providers = {}
         self.available_models = {}
+        self.benchmarks = {}
+        self.last_detection = None
     
-    def detect_all_providers(self) -> Dict[str, Dict]:
-        """Detect all available LLM providers."""
-        logger.info("Detecting available LLM providers...")
+    def detect_all_providers(self, use_cache: bool = True, on_refresh: Callable[[Dict[str, Dict]], None] = None) -> Dict[str, Dict]:
+        """
+        Detect all available LLM providers.
         
-        self.detected_providers = {}
+        With use_cache, the last known state is returned immediately from disk;
+        if it is older than cache_ttl a background refresh is started and
+        on_refresh is called with the new result when it finishes.
+        """
+        if use_cache and self._load_cache():
+            if time.time() - self.last_detection > self.cache_ttl:
+                self.refresh_in_background(on_refresh)
+            return self.detected_providers
+        
+        return self._probe_all_providers()
+    
+    def refresh_in_background(self, on_refresh: Callable[[Dict[str, Dict]], None] = None) -> threading.Thread:
+        """Re-probe providers on a daemon thread, updating the cache when done."""
+        with self._lock:
+            if self._refresh_thread and self._refresh_thread.is_alive():
+                return self._refresh_thread
+            
+            def refresh():
+                detected = self._probe_all_providers()
+                if on_refresh:
+                    on_refresh(detected)
+            
+            self._refresh_thread = threading.Thread(target=refresh, name="llm-provider-refresh", daemon=True)
+            self._refresh_thread.start()
+            return self._refresh_thread
+    
+    def _probe_all_providers(self) -> Dict[str, Dict]:
+        """Probe every provider concurrently and cache the result."""
+        logger.info("Detecting available LLM providers...")
         
+        # Providers sharing a URL (LM Studio and LM Studio CI) are probed once.
+        urls = {}
         for provider_id, provider_info in self.providers.items():
-            if self._test_provider_connection(provider_id, provider_info):
-                self.detected_providers[provider_id] = provider_info
+            url = f"{provider_info['default_host']}{provider_info['test_endpoint']}"
+            urls.setdefault(url, []).append(provider_id)
+        
+        with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            responses = dict(zip(urls, executor.map(self._fetch_json, urls)))
+        
+        detected = {}
+        models = {}
+        for url, provider_ids in urls.items():
+            for provider_id in provider_ids:
+                provider_info = self.providers[provider_id]
+                data = responses[url]
+                
+                if data is None:
+                    logger.info(f"❌ {provider_info['name']} not available")
+                    continue
+                
+                provider_info['host'] = provider_info['default_host']
+                provider_info['status'] = 'available'
+                detected[provider_id] = provider_info
+                
+                if provider_info['models_endpoint'] == provider_info['test_endpoint']:
+                    models[provider_id] = self._parse_models(provider_id, data)
                 logger.info(f"✅ Detected {provider_info['name']}")
-            else:
-                logger.info(f"❌ {provider_info['name']} not available")
         
-        return self.detected_providers
+        with self._lock:
+            self.detected_providers = detected
+            self.available_models = models
+            self.last_detection = time.time()
+            self._save_cache()
+        
+        return detected
     
-    def _test_provider_connection(self, provider_id: str, provider_info: Dict) -> bool:
-        """Test if a specific provider is available."""
+    def _fetch_json(self, url: str) -> Optional[Dict]:
+        """GET a provider endpoint, returning its JSON body or None if unavailable."""
         try:
-            host = provider_info['default_host']
-            endpoint = provider_info['test_endpoint']
-            
-            response = requests.get(f"{host}{endpoint}", timeout=5)
+            response = requests.get(url, timeout=self.timeout)
             
             if response.status_code == 200:
-                provider_info['host'] = host
-                provider_info['status'] = 'available'
-                return True
-            else:
-                logger.debug(f"{provider_info['name']} returned status {response.status_code}")
-                return False
-                
+                return response.json()
+            
+            logger.debug(f"{url} returned status {response.status_code}")
+            return None
+            
         except requests.exceptions.RequestException as e:
-            logger.debug(f"{provider_info['name']} connection failed: {e}")
+            logger.debug(f"{url} connection failed: {e}")
+            return None
+        except Exception as e:
+            logger.debug(f"Error probing {url}: {e}")
+            return None
+    
+    def _parse_models(self, provider_id: str, data: Dict) -> List[str]:
+        """Extract model names from a provider's models endpoint response."""
+        if provider_id == 'ollama':
+            entries, key = data.get('models') if isinstance(data, dict) else None, 'name'
+        elif provider_id in ['lm_studio', 'lm_studio_ci', 'llama_cpp']:
+            entries, key = data.get('data') if isinstance(data, dict) else None, 'id'
+        else:
+            return []
+        
+        # Skip malformed entries rather than failing detection for every provider.
+        models = []
+        for model in entries if isinstance(entries, list) else []:
+            name = model.get(key) if isinstance(model, dict) else None
+            if isinstance(name, str) and name:
+                models.append(name)
+            else:
+                logger.debug(f"Ignoring malformed model entry from {provider_id}: {model!r}")
+        return models
+    
+    def _test_provider_connection(self, provider_id: str, provider_info: Dict) -> bool:
+        """Test if a specific provider is available."""
+        host = provider_info['default_host']
+        if self._fetch_json(f"{host}{provider_info['test_endpoint']}") is None:
             return False
+        
+        provider_info['host'] = host
+        provider_info['status'] = 'available'
+        return True
+    
+    def _load_cache(self) -> bool:
+        """Restore the last detection result from disk. Returns False if there is none."""
+        if not self.cache_path or not self.cache_path.exists():
+            return False
+        
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            
+            with self._lock:
+                self.detected_providers = {}
+                for provider_id, cached in cache.get('providers', {}).items():
+                    if provider_id in self.providers:
+                        provider_info = self.providers[provider_id]
+                        provider_info['host'] = cached.get('host', provider_info['default_host'])
+                        provider_info['status'] = 'available'
+                        self.detected_providers[provider_id] = provider_info
+                self.available_models = cache.get('models', {})
+                self.benchmarks = cache.get('benchmarks', {})
+                self.last_detection = cache.get('timestamp') or 0
+            return True
+            
         except Exception as e:
-            logger.debug(f"Error testing {provider_info['name']}: {e}")
+            logger.warning(f"Ignoring unreadable provider cache {self.cache_path}: {e}")
             return False
     
-    def get_available_models(self, provider_id: str) -> List[str]:
-        """Get available models for a specific provider."""
+    def _save_cache(self):
+        """Persist the current detection result."""
+        if not self.cache_path:
+            return
+        
+        cache = {
+            'timestamp': self.last_detection,
+            'providers': {
+                provider_id: {'host': info.get('host', info['default_host'])}
+                for provider_id, info in self.detected_providers.items()
+            },
+            'models': self.available_models,
+            'benchmarks': self.benchmarks
+        }
+        
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=2)
+            tmp_path.replace(self.cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to write provider cache: {e}")
+    
+    def get_available_models(self, provider_id: str, refresh: bool = False) -> List[str]:
+        """Get available models for a specific provider, reusing the detection result unless refresh is set."""
         if provider_id not in self.detected_providers:
             return []
         
+        if not refresh and provider_id in self.available_models:
+            return self.available_models[provider_id]
+        
         try:
             provider_info = self.detected_providers[provider_id]
             host = provider_info['host']
             endpoint = provider_info['models_endpoint']
             
-            response = requests.get(f"{host}{endpoint}", timeout=10)
+            response = requests.get(f"{host}{endpoint}", timeout=self.timeout)
             
             if response.status_code == 200:
-                models = []
-                data = response.json()
-                
-                if provider_id == 'ollama':
-                    for model in data.get('models', []):
-                        models.append(model['name'])
-                elif provider_id in ['lm_studio', 'lm_studio_ci', 'llama_cpp']:
-                    for model in data.get('data', []):
-                        models.append(model['id'])
+                models = self._parse_models(provider_id, response.json())
                 
-                self.available_models[provider_id] = models
+                with self._lock:
+                    self.available_models[provider_id] = models
+                    self._save_cache()
                 return models
             else:
                 logger.warning(f"Failed to get models for {provider_info['name']}: {response.status_code}")
@@ -138,24 +339,7 @@ class LLMProviderDetector:
             host = provider_info['host']
             endpoint = provider_info['generate_endpoint']
             
-            if provider_id == 'ollama':
-                payload = {
-                    "model": model_name,
-                    "prompt": "Hello",
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,
-                        "num_predict": 10
-                    }
-                }
-            else:
-                payload = {
-                    "model": model_name,
-                    "messages": [{"role": "user", "content": "Hello"}],
-                    "temperature": 0.7,
-                    "max_tokens": 10,
-                    "stream": False
-                }
+            payload = build_generate_payload(provider_id, model_name, "Hello")
             
             response = requests.post(
                 f"{host}{endpoint}",
@@ -189,11 +373,157 @@ class LLMProviderDetector:
         
         return status
     
+    def benchmark_models(self, runs: int = 2, max_tokens: int = 200,
+                         providers: Optional[List[str]] = None) -> Dict[str, Dict[str, Dict]]:
+        """
+        Run the fixed extraction prompt against every detected provider/model pair.
+        
+        Records time-to-first-token, tokens/sec, success rate and accuracy
+        (fraction of BENCHMARK_EXPECTED values found in the output) per model,
+        and stores them in the detection cache. Providers served by the same
+        server (LM Studio and LM Studio CI) are benchmarked once per model and
+        share the result.
+        """
+        targets = {}
+        for provider_id in providers or list(self.detected_providers):
+            if provider_id not in self.detected_providers:
+                continue
+            provider_info = self.detected_providers[provider_id]
+            endpoint = f"{provider_info['host']}{provider_info['generate_endpoint']}"
+            for model_name in self.get_available_models(provider_id):
+                targets.setdefault((endpoint, model_name), []).append(provider_id)
+        
+        for (_, model_name), provider_ids in targets.items():
+            provider_id = provider_ids[0]
+            samples = [self._benchmark_once(provider_id, model_name, max_tokens) for _ in range(runs)]
+            succeeded = [sample for sample in samples if sample['success']]
+            
+            result = {
+                'runs': runs,
+                'success_rate': len(succeeded) / runs if runs else 0.0,
+                'time_to_first_token': None,
+                'tokens_per_second': 0.0,
+                'accuracy': 0.0,
+                'timestamp': time.time()
+            }
+            
+            if succeeded:
+                result['time_to_first_token'] = sum(s['time_to_first_token'] for s in succeeded) / len(succeeded)
+                result['tokens_per_second'] = sum(s['tokens_per_second'] for s in succeeded) / len(succeeded)
+                result['accuracy'] = sum(s['accuracy'] for s in succeeded) / len(succeeded)
+            
+            logger.info(
+                f"Benchmark {provider_id}/{model_name}: {result['tokens_per_second']:.1f} tok/s, "
+                f"accuracy {result['accuracy']:.0%}, success {result['success_rate']:.0%}"
+            )
+            
+            with self._lock:
+                for shared_provider_id in provider_ids:
+                    self.benchmarks.setdefault(shared_provider_id, {})[model_name] = dict(result)
+        
+        with self._lock:
+            self._save_cache()
+        
+        return self.benchmarks
+    
+    def _benchmark_once(self, provider_id: str, model_name: str, max_tokens: int) -> Dict:
+        """Stream one benchmark generation and measure it."""
+        provider_info = self.detected_providers[provider_id]
+        url = f"{provider_info['host']}{provider_info['generate_endpoint']}"
+        payload = build_generate_payload(provider_id, model_name, BENCHMARK_PROMPT,
+                                         max_tokens=max_tokens, temperature=0.0, stream=True)
+        
+        sample = {'success': False, 'time_to_first_token': None, 'tokens_per_second': 0.0, 'accuracy': 0.0}
+        chunks = []
+        token_count = 0
+        first_token_time = None
+        server_tokens_per_second = None
+        
+        try:
+            start_time = time.perf_counter()
+            with requests.post(url, json=payload, stream=True, timeout=(self.timeout[0], 120)) as response:
+                if response.status_code != 200:
+                    logger.debug(f"Benchmark request to {url} returned {response.status_code}")
+                    return sample
+                
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    
+                    if provider_id == 'ollama':
+                        data = json.loads(line)
+                        text = data.get('response', '')
+                        if data.get('done') and data.get('eval_duration'):
+                            server_tokens_per_second = data.get('eval_count', 0) / (data['eval_duration'] / 1e9)
+                    else:
+                        if not line.startswith('data:'):
+                            continue
+                        body = line[len('data:'):].strip()
+                        if body == '[DONE]':
+                            break
+                        choices = json.loads(body).get('choices') or [{}]
+                        text = choices[0].get('delta', {}).get('content') or ''
+                    
+                    if text:
+                        if first_token_time is None:
+                            first_token_time = time.perf_counter()
+                        token_count += 1
+                        chunks.append(text)
+            
+            end_time = time.perf_counter()
+            
+        except Exception as e:
+            logger.debug(f"Benchmark of {model_name} on {provider_id} failed: {e}")
+            return sample
+        
+        if first_token_time is None:
+            return sample
+        
+        output = "".join(chunks).lower()
+        generation_time = end_time - first_token_time
+        
+        sample['success'] = True
+        sample['time_to_first_token'] = first_token_time - start_time
+        sample['tokens_per_second'] = server_tokens_per_second or (
+            (token_count - 1) / generation_time if generation_time > 0 else 0.0
+        )
+        sample['accuracy'] = sum(
+            1 for expected in BENCHMARK_EXPECTED.values() if expected in output
+        ) / len(BENCHMARK_EXPECTED)
+        return sample
+    
+    def get_recommended_model(self, provider_id: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """Return the fastest benchmarked (provider, model) that meets min_accuracy."""
+        best = None
+        best_speed = 0.0
+        
+        for benchmarked_provider, models in self.benchmarks.items():
+            if benchmarked_provider not in self.detected_providers:
+                continue
+            if provider_id and benchmarked_provider != provider_id:
+                continue
+            
+            available = self.available_models.get(benchmarked_provider, [])
+            for model_name, result in models.items():
+                if model_name not in available or result.get('success_rate', 0) <= 0:
+                    continue
+                if result.get('accuracy', 0) < self.min_accuracy:
+                    continue
+                if result.get('tokens_per_second', 0) > best_speed:
+                    best_speed = result['tokens_per_second']
+                    best = (benchmarked_provider, model_name)
+        
+        return best
+    
     def get_recommended_provider(self) -> Optional[str]:
-        """Get the recommended provider based on availability and model count."""
+        """Get the recommended provider: the fastest accurate benchmarked model, else the most models."""
         if not self.detected_providers:
             return None
         
+        recommended = self.get_recommended_model()
+        if recommended:
+            return recommended[0]
+        
         best_provider = None
         max_models = 0
         
@@ -205,16 +535,19 @@ class LLMProviderDetector:
         
         return best_provider
     
-    def create_config_for_provider(self, provider_id: str, model_name: str = None) -> Dict:
-        """Create a configuration dictionary for a specific provider."""
+    def create_config_for_provider(self, provider_id: str, model_name: str = None, hosts: Optional[List[str]] = None) -> Dict:
+        """Create a configuration dictionary for a specific provider, optionally spread across several hosts."""
         if provider_id not in self.detected_providers:
             raise ValueError(f"Provider {provider_id} not available")
         
         provider_info = self.detected_providers[provider_id]
         
         if not model_name:
+            recommended = self.get_recommended_model(provider_id)
             models = self.available_models.get(provider_id, [])
-            if models:
+            if recommended:
+                model_name = recommended[1]
+            elif models:
                 model_name = models[0]
             else:
                 raise ValueError(f"No models available for {provider_id}")
@@ -224,6 +557,7 @@ class LLMProviderDetector:
                 'provider': provider_id,
                 provider_id: {
                     'host': provider_info['host'],
+                    'hosts': hosts or [provider_info['host']],
                     'model': model_name,
                     'temperature': 0.7,
                     'max_tokens': 1000
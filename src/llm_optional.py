@@ -5,24 +5,52 @@ Only loads AI dependencies if they're available, falls back to basic parsing oth
 """
 
 import logging
-import re
 from pathlib import Path
 from typing import Dict, Any, List
 
+from .cpu_budget import limit_loaded_libraries
+from .json_salvage import salvage_json, missing_fields, merge_fields, flatten_keys
+from .rule_scanner import RuleSet
+
 logger = logging.getLogger(__name__)
 
+# Fields requested from the model, in the order they must be generated.
+EXTRACTION_SCHEMA = {
+    "business_name": "string",
+    "contact_info": {
+        "phone": "string",
+        "email": "string",
+        "address": "string"
+    },
+    "tax_id": "string",
+    "bank_info": {
+        "routing": "string",
+        "account": "string"
+    },
+    "document_type": "string"
+}
+
+FIELD_HINTS = {
+    "tax_id": "SSN/EIN"
+}
+
 class LLMParser:
     """LLM parser with optional AI dependencies."""
     
-    def __init__(self, model_name: str = "microsoft/phi-2", ollama_host: str = "http://localhost:11434", model: str = None):
+    def __init__(self, model_name: str = "microsoft/phi-2", ollama_host: str = "http://localhost:11434", model: str = None,
+                 constrained_decoding: bool = True, rules_path: str = None):
         """Initialize LLM parser, falling back to basic parsing if AI libraries unavailable."""
         self.has_ai = False
+        self.rule_set = RuleSet.from_file(rules_path) if rules_path else RuleSet.default()
         self.model_name = model_name
         self.ollama_host = ollama_host
+        self.constrained_decoding = constrained_decoding
+        self.parse_stats = {"ai_responses": 0, "json_failures": 0, "salvaged": 0, "follow_up_generations": 0}
         
         try:
             import torch
             from transformers import pipeline
+            limit_loaded_libraries()
             
             self.generator = pipeline(
                 "text-generation",
@@ -53,22 +81,56 @@ class LLMParser:
         try:
             prompt = self._create_parsing_prompt(text)
             
+            generate_kwargs = {}
+            if self.constrained_decoding:
+                generate_kwargs = self._constrained_generate_kwargs()
+            
             response = self.generator(
                 prompt,
                 max_length=512,
                 num_return_sequences=1,
                 temperature=0.3,
                 do_sample=True,
-                truncation=True
+                truncation=True,
+                **generate_kwargs
             )
             
             generated_text = response[0]['generated_text']
-            return self._structure_response(generated_text, filename)
+            return self._structure_response(generated_text, filename, source_text=text)
             
         except Exception as e:
             logger.error(f"AI parsing failed, falling back to basic: {e}")
             return self._parse_basic(text, filename)
     
+    def _constrained_generate_kwargs(self, schema: Dict = None) -> Dict[str, Any]:
+        """Build generation arguments that restrict output to the schema (EXTRACTION_SCHEMA by default)."""
+        try:
+            from transformers import LogitsProcessorList
+            from .json_grammar import build_logits_processor
+            
+            processor = build_logits_processor(self.generator.tokenizer, schema or EXTRACTION_SCHEMA)
+            return {
+                "logits_processor": LogitsProcessorList([processor]),
+                "return_full_text": False
+            }
+        except Exception as e:
+            logger.warning(f"Constrained decoding unavailable, generating unconstrained: {e}")
+            self.constrained_decoding = False
+            return {}
+    
+    def get_parse_statistics(self) -> Dict[str, Any]:
+        """Return how often AI responses failed to parse as JSON."""
+        responses = self.parse_stats["ai_responses"]
+        failures = self.parse_stats["json_failures"]
+        return {
+            "constrained_decoding": self.constrained_decoding,
+            "ai_responses": responses,
+            "json_failures": failures,
+            "parse_failure_rate": failures / responses if responses else 0.0,
+            "salvaged": self.parse_stats["salvaged"],
+            "follow_up_generations": self.parse_stats["follow_up_generations"]
+        }
+    
     def _parse_basic(self, text: str, filename: str = None) -> Dict[str, Any]:
         """Basic regex-based parsing when AI is not available."""
         
@@ -82,23 +144,14 @@ class LLMParser:
             "tax_id": "",
             "bank_info": {},
             "extracted_fields": {},
+            "field_positions": {},
             "confidence": "low",
             "warnings": ["AI parsing not available - using basic regex patterns"]
         }
         
-        patterns = {
-            "business_name": r"(?:business|company|entity)\s+name[:\s]+([^\n\r]+)",
-            "phone": r"(\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4})",
-            "email": r"([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
-            "ssn_ein": r"(?:SSN|EIN|Tax\s+ID)[:\s]*([0-9-]{9,11})",
-            "routing": r"(?:routing|ABA)[:\s]*([0-9]{9})",
-            "account": r"(?:account)[:\s]*([0-9]{4,17})",
-        }
-        
-        for field, pattern in patterns.items():
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                result["extracted_fields"][field] = matches[0] if len(matches) == 1 else matches
+        fields, positions = self.rule_set.group_matches(self.rule_set.scan(text))
+        result["extracted_fields"] = fields
+        result["field_positions"] = positions
         
         if "business_name" in result["extracted_fields"]:
             result["business_name"] = result["extracted_fields"]["business_name"]
@@ -120,23 +173,27 @@ class LLMParser:
         
         return result
     
-    def _create_parsing_prompt(self, text: str) -> str:
+    def _create_parsing_prompt(self, text: str, schema: Dict = None) -> str:
         """Create prompt for AI parsing."""
+        field_lines = []
+        for key, value in (schema or EXTRACTION_SCHEMA).items():
+            hint = ", ".join(value) if isinstance(value, dict) else FIELD_HINTS.get(key)
+            field_lines.append(f"- {key} ({hint})" if hint else f"- {key}")
+        fields = "\n".join(field_lines)
+        
         return f"""Extract merchant information from this document:
 
 {text[:1000]}
 
 Extract the following information in JSON format:
-- business_name
-- contact_info (phone, email, address)
-- tax_id (SSN/EIN)
-- bank_info (routing, account)
-- document_type
+{fields}
 
 Response:"""
     
-    def _structure_response(self, generated_text: str, filename: str) -> Dict[str, Any]:
+    def _structure_response(self, generated_text: str, filename: str, source_text: str = None) -> Dict[str, Any]:
         """Structure the AI response into our standard format."""
+        self.parse_stats["ai_responses"] += 1
+        
         try:
             import json
             
@@ -147,26 +204,89 @@ Response:"""
                 json_str = generated_text[json_start:json_end]
                 parsed = json.loads(json_str)
                 
-                result = {
-                    "filename": filename or "unknown",
-                    "parsing_method": "ai_enhanced",
-                    "business_name": parsed.get("business_name", ""),
-                    "contact_info": parsed.get("contact_info", {}),
-                    "tax_id": parsed.get("tax_id", ""),
-                    "bank_info": parsed.get("bank_info", {}),
-                    "extracted_fields": parsed,
-                    "confidence": "high",
-                    "warnings": []
-                }
-                return result
+                return self._build_ai_result(parsed, filename, "ai_enhanced", "high", [])
                 
         except Exception as e:
             logger.warning(f"Failed to parse AI response as JSON: {e}")
         
+        self.parse_stats["json_failures"] += 1
+        
+        salvaged = self._salvage_response(generated_text, filename, source_text)
+        if salvaged:
+            return salvaged
+        
         return {
             "filename": filename or "unknown",
             "parsing_method": "ai_unstructured",
             "raw_response": generated_text,
             "confidence": "medium",
             "warnings": ["AI response could not be parsed as structured data"]
-        }
\ No newline at end of file
+        }
+    
+    def _build_ai_result(self, parsed: Dict, filename: str, method: str, confidence: str, warnings: List[str]) -> Dict[str, Any]:
+        """Map parsed model output onto the standard result format."""
+        return {
+            "filename": filename or "unknown",
+            "parsing_method": method,
+            "business_name": parsed.get("business_name", ""),
+            "contact_info": parsed.get("contact_info", {}),
+            "tax_id": parsed.get("tax_id", ""),
+            "bank_info": parsed.get("bank_info", {}),
+            "extracted_fields": parsed,
+            "confidence": confidence,
+            "warnings": warnings
+        }
+    
+    def _salvage_response(self, generated_text: str, filename: str, source_text: str = None) -> Dict[str, Any]:
+        """Recover complete fields from a truncated response and generate only the missing ones."""
+        salvage = salvage_json(generated_text)
+        parsed = salvage["data"]
+        if not parsed:
+            return None
+        
+        self.parse_stats["salvaged"] += 1
+        total_fields = len(flatten_keys(EXTRACTION_SCHEMA))
+        missing = missing_fields(EXTRACTION_SCHEMA, parsed)
+        warnings = [
+            f"AI response was incomplete; recovered {total_fields - len(flatten_keys(missing))} of {total_fields} fields"
+        ]
+        
+        if missing and source_text and self.has_ai:
+            parsed = merge_fields(parsed, self._generate_missing_fields(source_text, missing))
+            missing = missing_fields(EXTRACTION_SCHEMA, parsed)
+        
+        if missing:
+            warnings.append(f"Fields not extracted: {', '.join(flatten_keys(missing))}")
+        
+        logger.info(f"Salvaged AI response for {filename}: {len(flatten_keys(missing))} field(s) still missing")
+        return self._build_ai_result(parsed, filename, "ai_salvaged", "medium", warnings)
+    
+    def _generate_missing_fields(self, text: str, schema: Dict) -> Dict[str, Any]:
+        """Run a follow-up generation restricted to the fields that are still missing."""
+        try:
+            self.parse_stats["follow_up_generations"] += 1
+            prompt = self._create_parsing_prompt(text, schema)
+            
+            generate_kwargs = {}
+            if self.constrained_decoding:
+                generate_kwargs = self._constrained_generate_kwargs(schema)
+            
+            response = self.generator(
+                prompt,
+                max_length=512,
+                num_return_sequences=1,
+                temperature=0.3,
+                do_sample=True,
+                truncation=True,
+                **generate_kwargs
+            )
+            
+            generated_text = response[0]['generated_text']
+            if generated_text.startswith(prompt):
+                generated_text = generated_text[len(prompt):]
+            
+            return salvage_json(generated_text)["data"]
+            
+        except Exception as e:
+            logger.warning(f"Follow-up generation for missing fields failed: {e}")
+            return {}
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Processing Manifest
+Persistent per-document, per-stage progress keyed by file content hash and pipeline version
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PATH = os.path.join("output", "cache", "manifest.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    content_hash TEXT NOT NULL,
+    pipeline_version TEXT NOT NULL,
+    source_path TEXT,
+    status TEXT NOT NULL,
+    failed_stage TEXT,
+    error TEXT,
+    result TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (content_hash, pipeline_version)
+);
+CREATE TABLE IF NOT EXISTS stages (
+    content_hash TEXT NOT NULL,
+    pipeline_version TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    output TEXT NOT NULL,
+    completed_at TEXT NOT NULL,
+    PRIMARY KEY (content_hash, pipeline_version, stage)
+);
+"""
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ProcessingManifest:
+    """
+    SQLite record of which stages each document has completed.
+
+    Documents are identified by content hash, so a renamed or re-dropped
+    file is still recognised, and by pipeline version, so a new release
+    reprocesses everything. Each completed stage stores the output the next
+    stage needs; a rerun loads those outputs and carries on from the first
+    stage that did not finish. The database runs in WAL mode so threads and
+    worker processes can share it.
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH, pipeline_version: str = "1"):
+        self.path = path
+        self.pipeline_version = pipeline_version
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def load(self, content_hash: str) -> Dict[str, Any]:
+        """Completed stage outputs and the document record for a hash (empty when unseen)."""
+        with self._lock:
+            stage_rows = self._conn.execute(
+                "SELECT stage, output FROM stages WHERE content_hash = ? AND pipeline_version = ?",
+                (content_hash, self.pipeline_version)
+            ).fetchall()
+            document_row = self._conn.execute(
+                "SELECT status, result FROM documents WHERE content_hash = ? AND pipeline_version = ?",
+                (content_hash, self.pipeline_version)
+            ).fetchone()
+
+        record = {"stages": {stage: json.loads(output) for stage, output in stage_rows}}
+        if document_row:
+            record["status"] = document_row[0]
+            record["result"] = json.loads(document_row[1]) if document_row[1] else None
+        return record
+
+    def record_stage(self, content_hash: str, stage: str, output: Dict[str, Any], source_path: Optional[str] = None):
+        """Mark a stage complete and store the output later stages need."""
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?)",
+                (content_hash, self.pipeline_version, stage, json.dumps(output, default=str), now)
+            )
+            self._conn.execute(
+                "INSERT INTO documents (content_hash, pipeline_version, source_path, status, updated_at) "
+                "VALUES (?, ?, ?, 'in_progress', ?) "
+                "ON CONFLICT(content_hash, pipeline_version) DO UPDATE SET updated_at = excluded.updated_at",
+                (content_hash, self.pipeline_version, source_path, now)
+            )
+
+    def record_result(self, content_hash: str, result: Dict[str, Any], source_path: Optional[str] = None):
+        """Store a document's final result (completed or failed)."""
+        status = result.get("processing_status", "failed")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, self.pipeline_version, source_path, status, result.get("failed_stage"),
+                 result.get("error"), json.dumps(result, default=str), datetime.now().isoformat())
+            )
+
+    def get_summary(self) -> Dict[str, int]:
+        """Document counts by status for the current pipeline version."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM documents WHERE pipeline_version = ? GROUP BY status",
+                (self.pipeline_version,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Memory Governor
+Admits OCR work only while the projected resident set stays under a memory budget, lowering DPI or waiting instead of running out of memory
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DPI = 200  # pdf2image's default rasterisation resolution
+LETTER_INCHES = (8.5, 11.0)
+
+# convert_from_path keeps every page of a PDF as an RGB image until OCR finishes.
+RASTER_BYTES_PER_PIXEL = 3
+# The page being OCR'd also exists as a numpy copy, BGR, grayscale, threshold and
+# denoised arrays, plus Tesseract's own buffers.
+WORKING_BYTES_PER_PIXEL = 12
+
+MB = 1024 * 1024
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process, or None where it cannot be read cheaply."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current RSS outside Linux, which errs on the safe side.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / MB
+
+def _pdf_pages(path: str) -> Dict:
+    """Page count and first-page size in inches, without rasterising."""
+    try:
+        from pdf2image import pdfinfo_from_path
+
+        info = pdfinfo_from_path(path)
+        size = re.match(r"([\d.]+) x ([\d.]+) pts", info.get("Page size", ""))
+        inches = (float(size.group(1)) / 72, float(size.group(2)) / 72) if size else LETTER_INCHES
+        return {"pages": int(info["Pages"]), "inches": inches}
+    except Exception:
+        # No poppler here (or a damaged file): count page objects in the raw PDF.
+        with open(path, "rb") as f:
+            pages = len(re.findall(rb"/Type\s*/Page(?!s)", f.read()))
+        return {"pages": max(1, pages), "inches": LETTER_INCHES}
+
+class Admission:
+    """A reservation for one document's OCR; release it (or leave the with block) once the pages are freed."""
+
+    def __init__(self, governor: "MemoryGovernor", filename: str, cost_mb: float, dpi: Optional[int]):
+        self.governor = governor
+        self.filename = filename
+        self.cost_mb = cost_mb
+        self.dpi = dpi
+        self.degraded = False
+        self.waited_seconds = 0.0
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.governor._release(self)
+
+    def __enter__(self) -> "Admission":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
+
+class MemoryGovernor:
+    """
+    Budgets resident memory for concurrent page rasters.
+
+    Each document's cost is estimated before it is rasterised: pages x
+    (DPI x page size)^2 x bytes per pixel for the rasters held at once,
+    plus the working copies of the page being OCR'd. A document is
+    admitted while the baseline (RSS measured whenever nothing is in
+    flight, and at least the startup RSS plus the model footprint still
+    to be loaded) plus every admitted reservation stays under the budget.
+
+    A document that would not fit even on its own is rasterised at a
+    lower DPI, down to min_dpi. One that fits alone but not alongside the
+    documents in flight waits, which leaves fewer stages working at once.
+    When nothing is in flight a document is always admitted, so an
+    oversized file is slowed down but never deadlocks the batch.
+    """
+
+    def __init__(self, budget_mb: float, model_mb: float = 0.0, dpi: int = DEFAULT_DPI, min_dpi: int = 100,
+                 dpi_step: int = 50, max_wait: Optional[float] = None):
+        self.budget_mb = float(budget_mb)
+        self.model_mb = float(model_mb or 0)
+        self.dpi = dpi
+        self.min_dpi = min(min_dpi, dpi)
+        self.dpi_step = max(1, dpi_step)
+        self.max_wait = max_wait
+
+        self.reserved_mb = 0.0
+        self.in_flight = 0
+        self.stats = {"admitted": 0, "waited": 0, "degraded": 0, "over_budget": 0, "peak_projected_mb": 0.0}
+
+        self._startup_rss_mb = current_rss_mb() or 0.0
+        self._idle_rss_mb = self._startup_rss_mb
+        self._condition = threading.Condition()
+
+    @property
+    def baseline_mb(self) -> float:
+        return max(self._idle_rss_mb, self._startup_rss_mb + self.model_mb)
+
+    def estimate(self, file_path: str, dpi: Optional[int] = None) -> Dict:
+        """Projected peak memory (MB) for OCR'ing one file at the given DPI."""
+        dpi = dpi or self.dpi
+        if file_path.lower().endswith(".pdf"):
+            layout = _pdf_pages(file_path)
+            pages = layout["pages"]
+            pixels = layout["inches"][0] * dpi * layout["inches"][1] * dpi
+        else:
+            # Images are read at their native size, so DPI does not apply.
+            from PIL import Image
+
+            with Image.open(file_path) as image:
+                pixels = image.width * image.height
+            pages = 1
+        return {"pages": pages, "cost_mb": self._cost_mb(pages, pixels), "pdf": file_path.lower().endswith(".pdf")}
+
+    @staticmethod
+    def _cost_mb(pages: int, pixels: float) -> float:
+        return (pages * RASTER_BYTES_PER_PIXEL + WORKING_BYTES_PER_PIXEL) * pixels / MB
+
+    def typical_document_mb(self, pages: int = 3) -> float:
+        """Cost of a letter-size PDF of the given length at the configured DPI."""
+        return self._cost_mb(pages, LETTER_INCHES[0] * self.dpi * LETTER_INCHES[1] * self.dpi)
+
+    def admit(self, file_path: str) -> Admission:
+        """Block until the file's OCR fits in the budget; returns the reservation and the DPI to use."""
+        filename = os.path.basename(file_path)
+        try:
+            estimate = self.estimate(file_path)
+        except Exception as e:
+            logger.warning(f"Memory governor could not size {filename} ({e}); admitting it unestimated")
+            estimate = {"pages": 1, "cost_mb": 0.0, "pdf": False}
+
+        dpi = self.dpi if estimate["pdf"] else None
+        headroom = self.budget_mb - self.baseline_mb
+        while dpi is not None and estimate["cost_mb"] > headroom and dpi - self.dpi_step >= self.min_dpi:
+            dpi -= self.dpi_step
+            estimate = self.estimate(file_path, dpi)
+        admission = Admission(self, filename, estimate["cost_mb"], dpi)
+        admission.degraded = dpi is not None and dpi < self.dpi
+
+        start = time.monotonic()
+        with self._condition:
+            while self.in_flight and self.baseline_mb + self.reserved_mb + admission.cost_mb > self.budget_mb:
+                remaining = None if self.max_wait is None else self.max_wait - (time.monotonic() - start)
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            admission.waited_seconds = time.monotonic() - start
+
+            self.in_flight += 1
+            self.reserved_mb += admission.cost_mb
+            projected = self.baseline_mb + self.reserved_mb
+            self.stats["admitted"] += 1
+            self.stats["peak_projected_mb"] = max(self.stats["peak_projected_mb"], projected)
+            if admission.waited_seconds > 0.001:
+                self.stats["waited"] += 1
+            if admission.degraded:
+                self.stats["degraded"] += 1
+            if projected > self.budget_mb:
+                self.stats["over_budget"] += 1
+
+        decision = f"{estimate['pages']} page(s), ~{admission.cost_mb:.0f} MB"
+        if admission.degraded:
+            decision += f", DPI lowered to {dpi}"
+        if admission.waited_seconds > 0.001:
+            decision += f", waited {admission.waited_seconds:.2f}s"
+        if projected > self.budget_mb:
+            logger.warning(f"Memory governor admitted {filename} over budget ({decision}; projected "
+                           f"{projected:.0f} of {self.budget_mb:.0f} MB)")
+        elif admission.degraded or admission.waited_seconds > 0.001:
+            logger.info(f"Memory governor admitted {filename} ({decision}; projected {projected:.0f} of {self.budget_mb:.0f} MB)")
+        else:
+            logger.debug(f"Memory governor admitted {filename} ({decision}; projected {projected:.0f} of {self.budget_mb:.0f} MB)")
+        return admission
+
+    def _release(self, admission: Admission):
+        with self._condition:
+            self.in_flight -= 1
+            self.reserved_mb = max(0.0, self.reserved_mb - admission.cost_mb)
+            if self.in_flight == 0:
+                self._idle_rss_mb = current_rss_mb() or self._idle_rss_mb
+            self._condition.notify_all()
+
+    def max_workers(self, requested: int, worker_mb: float, document_mb: float) -> int:
+        """How many worker processes, each starting at worker_mb plus the model, fit in the budget with one document each."""
+        per_worker = worker_mb + self.model_mb + document_mb
+        fits = max(1, int(self.budget_mb // per_worker)) if per_worker > 0 else requested
+        if fits < requested:
+            logger.info(f"Memory governor: {requested} workers need ~{requested * per_worker:.0f} MB; "
+                        f"running {fits} within the {self.budget_mb:.0f} MB budget")
+        return min(requested, fits)
+
+    def snapshot(self) -> Dict:
+        with self._condition:
+            return {
+                "budget_mb": self.budget_mb,
+                "baseline_mb": self.baseline_mb,
+                "reserved_mb": self.reserved_mb,
+                "in_flight": self.in_flight,
+                **self.stats
+            }
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Latency Metrics
+HDR-style latency histograms per stage, OCR page and LLM call, with Prometheus text export
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Values are recorded in microseconds. Each power-of-two range is split into
+# 2**(SUB_BUCKET_BITS - 1) linear buckets, so any recorded value is reported
+# within 1/64 (~1.6%) of its true value, from 1 µs to hours, in a few KB.
+SUB_BUCKET_BITS = 7
+_SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRIC_HELP = {
+    "stage_seconds": "Pipeline stage latency by stage and outcome",
+    "document_seconds": "End-to-end document latency by status",
+    "ocr_rasterize_seconds": "PDF to page image conversion latency per document",
+    "ocr_page_seconds": "Preprocessing plus Tesseract latency per page",
+    "llm_call_seconds": "Latency of one LLM field extraction call",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _bucket_index(value: int) -> int:
+    if value < (1 << SUB_BUCKET_BITS):
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return (shift << (SUB_BUCKET_BITS - 1)) + (value >> shift)
+
+def _bucket_value(index: int) -> int:
+    """Midpoint of a bucket's value range."""
+    if index < (1 << SUB_BUCKET_BITS):
+        return index
+    shift = index // _SUB_BUCKET_HALF - 1
+    mantissa = index - shift * _SUB_BUCKET_HALF
+    return (mantissa << shift) + ((1 << shift) >> 1)
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram in the style of HdrHistogram.
+
+    Recording is O(1) and memory grows with the number of distinct buckets
+    hit, not the number of samples, so it can stay on for long-running
+    daemons. Histograms from different workers merge exactly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    def record(self, seconds: float):
+        value = max(0, int(seconds * 1_000_000))
+        index = _bucket_index(value)
+        with self._lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.total_us += value
+            self.min_us = value if self.min_us is None else min(self.min_us, value)
+            self.max_us = max(self.max_us, value)
+
+    def percentile(self, fraction: float) -> float:
+        """Latency in seconds at or below which `fraction` of samples fall."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, int(fraction * self.count + 0.999999))
+            seen = 0
+            for index in sorted(self.counts):
+                seen += self.counts[index]
+                if seen >= rank:
+                    return min(_bucket_value(index), self.max_us) / 1_000_000
+            return self.max_us / 1_000_000
+
+    def merge(self, other: "LatencyHistogram"):
+        state = other.to_state()
+        with self._lock:
+            self._merge_state(state)
+
+    def _merge_state(self, state: Dict):
+        for index, count in state["counts"].items():
+            index = int(index)
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += state["count"]
+        self.total_us += state["total_us"]
+        if state["min_us"] is not None:
+            self.min_us = state["min_us"] if self.min_us is None else min(self.min_us, state["min_us"])
+        self.max_us = max(self.max_us, state["max_us"])
+
+    def to_state(self) -> Dict:
+        """Picklable raw state, for shipping between processes."""
+        with self._lock:
+            return {"counts": dict(self.counts), "count": self.count, "total_us": self.total_us,
+                    "min_us": self.min_us, "max_us": self.max_us}
+
+    def summary(self) -> Dict[str, float]:
+        """count, mean, p50/p95/p99 and max, in seconds."""
+        summary = {
+            "count": self.count,
+            "mean_seconds": self.total_us / self.count / 1_000_000 if self.count else 0.0,
+            "max_seconds": self.max_us / 1_000_000
+        }
+        for quantile in QUANTILES:
+            summary[f"p{int(quantile * 100)}_seconds"] = self.percentile(quantile)
+        return summary
+
+class MetricsRegistry:
+    """Named, labelled latency histograms shared by the pipeline and its components."""
+
+    def __init__(self, namespace: str = "moneypulse"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, LatencyHistogram]] = {}
+        self._server = None
+
+    def histogram(self, name: str, **labels) -> LatencyHistogram:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            family = self._histograms.setdefault(name, {})
+            if key not in family:
+                family[key] = LatencyHistogram()
+            return family[key]
+
+    def observe(self, name: str, seconds: float, **labels):
+        self.histogram(name, **labels).record(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Record the duration of the with-block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def _families(self) -> List[Tuple[str, List[Tuple[LabelKey, LatencyHistogram]]]]:
+        with self._lock:
+            return [(name, list(family.items())) for name, family in sorted(self._histograms.items())]
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """{metric: {"label=value,...": summary}} for every histogram with samples."""
+        snapshot = {}
+        for name, family in self._families():
+            for key, histogram in family:
+                if histogram.count:
+                    label = ",".join(f"{k}={v}" for k, v in key) or "all"
+                    snapshot.setdefault(name, {})[label] = histogram.summary()
+        return snapshot
+
+    def export_state(self) -> Dict[str, List[Tuple[LabelKey, Dict]]]:
+        return {name: [(key, h.to_state()) for key, h in family if h.count] for name, family in self._families()}
+
+    def merge_state(self, state: Dict[str, List[Tuple[LabelKey, Dict]]]):
+        """Fold in histograms exported by another process."""
+        for name, family in state.items():
+            for key, histogram_state in family:
+                histogram = self.histogram(name, **dict(key))
+                with histogram._lock:
+                    histogram._merge_state(histogram_state)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format, one summary per histogram family."""
+        lines = []
+        for name, family in self._families():
+            metric = f"{self.namespace}_{name}"
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {metric} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {metric} summary")
+            for key, histogram in family:
+                labels = [f'{k}="{_escape(v)}"' for k, v in key]
+                for quantile in QUANTILES:
+                    quantile_labels = ",".join(labels + [f'quantile="{quantile}"'])
+                    lines.append(f"{metric}{{{quantile_labels}}} {histogram.percentile(quantile):.6f}")
+                suffix = "{" + ",".join(labels) + "}" if labels else ""
+                lines.append(f"{metric}_sum{suffix} {histogram.total_us / 1_000_000:.6f}")
+                lines.append(f"{metric}_count{suffix} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_file(self, path: str):
+        """Atomically write the text format, e.g. for node_exporter's textfile collector."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write metrics file {path}: {e}")
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> int:
+        """Serve /metrics on a background thread; returns the bound port. Safe to call twice."""
+        if self._server is not None:
+            return self._server.server_address[1]
+
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server.server_address[1]
+
+    def stop_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Process-wide registry; OCR and LLM code record into it without needing a pipeline reference.
+REGISTRY = MetricsRegistry()
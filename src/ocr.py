@@ -4,32 +4,60 @@ OCR Module
 Handles text extraction from PDFs and images using Tesseract OCR
 """
 
+import functools
 import logging
+import threading
+import time
+import weakref
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
-import cv2
-import numpy as np
-import pytesseract
-from pdf2image import convert_from_path
+from .cpu_budget import apply_thread_budget, current_threads, limit_loaded_libraries
+from .metrics import REGISTRY
+from .tracing import TRACER
+
+# cv2, numpy, pytesseract and pdf2image are imported inside the functions that
+# need them so that importing this module (and the GUI) stays fast.
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_DPI = 200
+
 class OCRProcessor:
     """Handles text extraction from documents using OCR."""
     
-    def __init__(self, tesseract_path: str = None):
-        """Initialize the OCR processor with an optional tesseract path."""
+    # Bump when a change to preprocessing or extraction alters the extracted text.
+    STAGE_VERSION = "1"
+    
+    def __init__(self, tesseract_path: str = None, page_workers: int = 0):
+        """
+        Initialize the OCR processor with an optional tesseract path.
+        
+        With page_workers > 1, the pages of a multi-page PDF are OCR'd in
+        that many worker processes; rasters reach them through shared
+        memory rather than being pickled.
+        """
         self.logger = logging.getLogger(__name__)
+        self.tesseract_path = tesseract_path
+        self.page_workers = page_workers or 0
+        self._page_executor = None
+        self._page_pool = None
+        self._page_lock = threading.Lock()
         
         if tesseract_path:
+            import pytesseract
             pytesseract.pytesseract.tesseract_cmd = tesseract_path
     
-    def extract_text(self, file_path: str) -> str:
+    def extract_text(self, file_path: str, dpi: Optional[int] = None, first_page: Optional[int] = None,
+                     last_page: Optional[int] = None) -> str:
         """
         Extract text from a document file (PDF or image).
 
         Args:
             file_path: Path to the document file
+            dpi: PDF rasterisation resolution (default 200); ignored for images
+            first_page, last_page: 1-based PDF page range (default: every page);
+                an image is page 1
 
         Returns:
             Extracted text as string
@@ -37,8 +65,14 @@ class OCRProcessor:
         try:
             file_path = Path(file_path)
 
-            if file_path.suffix.lower() == '.pdf':
-                return globals()['_extract_from_pdf'](file_path)
+            pages = {"first_page": first_page, "last_page": last_page}
+            if file_path.suffix.lower() == '.pdf' and self.page_workers > 1:
+                executor, pool = self._page_transport()
+                return _extract_from_pdf_shared(file_path, executor, pool, dpi=dpi or DEFAULT_DPI, **pages)
+            elif file_path.suffix.lower() == '.pdf':
+                return globals()['_extract_from_pdf'](file_path, dpi=dpi or DEFAULT_DPI, **pages)
+            elif (first_page or 1) > 1:
+                return ""
             else:
                 return globals()['_extract_from_image'](file_path)
 
@@ -46,15 +80,52 @@ class OCRProcessor:
             self.logger.error(f"Failed to extract text from {file_path}: {e}")
             raise
     
+    def _page_transport(self):
+        """The page worker pool and shared-memory segment pool, started on first use."""
+        with self._page_lock:
+            if self._page_executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                from .shared_pages import SharedPagePool
+                
+                self._page_pool = SharedPagePool(max_free=self.page_workers * 2)
+                self._page_executor = ProcessPoolExecutor(
+                    max_workers=self.page_workers,
+                    initializer=_init_page_worker,
+                    initargs=(self.tesseract_path, current_threads())
+                )
+                weakref.finalize(self, _close_page_transport, self._page_executor, self._page_pool)
+                self.logger.info(f"OCR'ing PDF pages in {self.page_workers} worker processes via shared memory")
+            return self._page_executor, self._page_pool
+    
+    def close(self):
+        """Stop the page workers and unlink their shared-memory segments."""
+        with self._page_lock:
+            if self._page_executor is not None:
+                _close_page_transport(self._page_executor, self._page_pool)
+                self._page_executor = self._page_pool = None
+    
+    def cache_fingerprint(self) -> Dict:
+        """Settings that affect extracted text, for the stage cache."""
+        return {"engine": "tesseract"}
+    
     def test_installation(self) -> bool:
         """Test if Tesseract OCR is properly installed and working."""
         try:
+            import pytesseract
             version = pytesseract.get_tesseract_version()
             self.logger.info(f"Tesseract OCR version: {version}")
             return True
         except Exception as e:
             self.logger.error(f"Tesseract OCR test failed: {e}")
             return False
+    
+    def warm_up(self) -> None:
+        """Import the OCR libraries ahead of the first document."""
+        import cv2
+        import numpy
+        import pytesseract
+        import pdf2image
+        limit_loaded_libraries()
 
 def extract_text(file_path: str) -> str:
     """
@@ -66,19 +137,33 @@ def extract_text(file_path: str) -> str:
     processor = OCRProcessor()
     return processor.extract_text(file_path)
 
-def _extract_from_pdf(pdf_path: Path) -> str:
+def _extract_from_pdf(pdf_path: Path, dpi: int = DEFAULT_DPI, first_page: Optional[int] = None,
+                      last_page: Optional[int] = None) -> str:
     """Extract text from the PDF file."""
+    import cv2
+    import numpy as np
+    import pytesseract
+    from pdf2image import convert_from_path
+    limit_loaded_libraries()
+    
     try:
-        images = convert_from_path(pdf_path)
+        with REGISTRY.timer("ocr_rasterize_seconds"), TRACER.span("rasterize", cat="ocr") as span:
+            images = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
+            span.set(pages=len(images), dpi=dpi)
+        TRACER.current().set(pages=len(images))
 
         extracted_text = []
-        for image in images:
-            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        for page_number, image in enumerate(images, first_page or 1):
+            page_start = time.perf_counter()
+            with TRACER.span("page", cat="ocr", page=page_number, size=f"{image.width}x{image.height}") as span:
+                cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
 
-            processed = _preprocess_image(cv_image)
+                processed = _preprocess_image(cv_image)
 
-            text = pytesseract.image_to_string(processed)
-            extracted_text.append(text)
+                text = pytesseract.image_to_string(processed)
+                extracted_text.append(_end_page(text))
+                span.set(chars=len(text))
+            REGISTRY.observe("ocr_page_seconds", time.perf_counter() - page_start, source="pdf")
 
         return "\n\n".join(extracted_text)
 
@@ -86,23 +171,103 @@ def _extract_from_pdf(pdf_path: Path) -> str:
         logger.error(f"PDF extraction error: {e}")
         raise
 
+def _extract_from_pdf_shared(pdf_path: Path, executor, pool, dpi: int = DEFAULT_DPI, first_page: Optional[int] = None,
+                             last_page: Optional[int] = None) -> str:
+    """Rasterise here and OCR the pages in parallel in the page workers, passing shared-memory handles."""
+    from pdf2image import convert_from_path
+    
+    try:
+        with REGISTRY.timer("ocr_rasterize_seconds"), TRACER.span("rasterize", cat="ocr") as span:
+            images = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
+            span.set(pages=len(images), dpi=dpi)
+        TRACER.current().set(pages=len(images), page_transport="shared_memory")
+        
+        futures = []
+        while images:
+            if len(futures) >= pool.max_free:
+                # Keep at most max_free pages in flight so segments are recycled rather than added.
+                futures[len(futures) - pool.max_free].exception()
+            # Drop each PIL page once it is in shared memory; the workers only need the shared copy.
+            handle = pool.put(images.pop(0))
+            try:
+                future = executor.submit(_ocr_shared_page, handle)
+            except Exception:
+                pool.release(handle)
+                raise
+            future.add_done_callback(functools.partial(_release_page, pool, handle))
+            futures.append(future)
+        
+        extracted_text = []
+        for future in futures:
+            text, seconds = future.result()
+            extracted_text.append(_end_page(text))
+            REGISTRY.observe("ocr_page_seconds", seconds, source="pdf")
+        return "\n\n".join(extracted_text)
+    
+    except Exception as e:
+        logger.error(f"PDF extraction error: {e}")
+        raise
+
+def _end_page(text: str) -> str:
+    # Tesseract ends each page with a form feed unless its page_separator is
+    # changed; the packet splitter relies on it to find the pages again.
+    return text if text.endswith("\f") else text + "\f"
+
+def _release_page(pool, handle, future):
+    pool.release(handle)
+
+def _init_page_worker(tesseract_path: Optional[str], threads: Optional[int]):
+    if tesseract_path:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_path
+    if threads:
+        apply_thread_budget(threads)
+
+def _ocr_shared_page(handle) -> Tuple[str, float]:
+    """Runs in a page worker: OCR one page straight out of shared memory."""
+    import cv2
+    import pytesseract
+    from .shared_pages import attached_page
+    limit_loaded_libraries()
+    
+    start = time.perf_counter()
+    with attached_page(handle) as page:
+        # cvtColor reads the shared buffer directly and returns the worker's own copy.
+        cv_image = cv2.cvtColor(page, cv2.COLOR_RGB2BGR)
+        del page
+    text = pytesseract.image_to_string(_preprocess_image(cv_image))
+    return text, time.perf_counter() - start
+
+def _close_page_transport(executor, pool):
+    executor.shutdown(wait=True, cancel_futures=True)
+    pool.close()
+
 def _extract_from_image(image_path: Path) -> str:
     """Extract text from an image file."""
+    import cv2
+    import pytesseract
+    limit_loaded_libraries()
+    
     try:
         image = cv2.imread(str(image_path))
         if image is None:
             raise ValueError(f"Failed to load image: {image_path}")
 
-        processed = _preprocess_image(image)
-
-        return pytesseract.image_to_string(processed)
+        TRACER.current().set(pages=1)
+        with REGISTRY.timer("ocr_page_seconds", source="image"), TRACER.span("page", cat="ocr", page=1) as span:
+            processed = _preprocess_image(image)
+            text = pytesseract.image_to_string(processed)
+            span.set(chars=len(text))
+            return text
 
     except Exception as e:
         logger.error(f"Image extraction error: {e}")
         raise
 
-def _preprocess_image(image: np.ndarray) -> np.ndarray:
+def _preprocess_image(image: "np.ndarray") -> "np.ndarray":
     """Preprocess image for better OCR results."""
+    import cv2
+    
     try:
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
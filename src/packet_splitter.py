@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Packet Splitter
+Finds document boundaries in multi-document PDFs (application, W-9, voided check, statements) from per-page classification and page similarity, and merges the parts' parser output into one merchant record
+"""
+
+import copy
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .doc_classifier import DocumentClassifier, EXTRACTION_PLANS
+
+logger = logging.getLogger(__name__)
+
+# Tesseract ends every page with a form feed and the OCR processor keeps it,
+# so a document's extracted text can be split back into pages.
+PAGE_BREAK = "\f"
+
+# "Page 2 of 3", allowing for OCR reading 1 as l, i or |.
+_PAGE_NUMBER = re.compile(r"\bpage\s*([\dil|]{1,3})\s*(?:of|/)\s*([\dil|]{1,3})\b")
+_PERIOD = re.compile(r"statement period\s*:?\s*([^\n]{4,60})")
+_WORD = re.compile(r"[a-z]{3,}")
+
+# Part types to take each field from, best first; a field comes from the
+# first part that has a value for it.
+FIELD_SOURCES = {
+    "default": ["application", "w9", "voided_check", "bank_statement", "unknown"],
+    "ein_or_ssn": ["w9", "application", "unknown"],
+    "merchant_name": ["application", "w9", "bank_statement", "voided_check", "unknown"],
+}
+# Taken whole from one part so street, city and ZIP stay consistent.
+ATOMIC_SECTIONS = ("address",)
+# Parser bookkeeping rather than merchant fields.
+_META_FIELDS = {"document_type", "source_file", "confidence_score", "flagged_issues"}
+
+def split_pages(text: str) -> List[str]:
+    pages = text.split(PAGE_BREAK)
+    if len(pages) > 1 and not pages[-1].strip():
+        pages.pop()
+    return pages
+
+def page_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the pages' word sets."""
+    words_a, words_b = set(_WORD.findall(a.lower())), set(_WORD.findall(b.lower()))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+class PacketSplitter:
+    """
+    Splits a document's pages into the documents it bundles. A page starts
+    a new part when:
+
+    - it is numbered "Page 1 of N", the previous page was the last of its
+      document ("Page N of N"), or it shows a different statement period;
+    - or its keywords confidently name another type than the current
+      part's, unless it closely resembles the previous page (continuation
+      pages that happen to mention another type stay put).
+
+    Pages without a confident type continue the current part; leading ones
+    (fax covers, blank pages) join the first typed part. Parts that end up
+    untyped are classified as a whole, with the embedding fallback if the
+    classifier has one.
+    """
+
+    def __init__(self, classifier: Optional[DocumentClassifier] = None, continuation_similarity: float = 0.5):
+        self.classifier = classifier or DocumentClassifier()
+        # Pages are judged on keywords only: embedding every page is slow, and a
+        # guessed type is no evidence of a boundary.
+        self._page_classifier = DocumentClassifier(self.classifier.min_score, self.classifier.min_margin)
+        self.continuation_similarity = continuation_similarity
+
+    def split(self, text: str) -> List[Dict]:
+        """Parts in page order: document type, how it was decided, 1-based page range and text."""
+        pages = split_pages(text)
+        parts: List[Dict] = []
+        for number, page in enumerate(pages, 1):
+            page_type = self._page_classifier.classify(page)["document_type"]
+            current = parts[-1] if parts else None
+            if current is None or self._starts_document(page, page_type, current, pages[number - 2]):
+                parts.append({"document_type": page_type, "first_page": number, "pages": [page],
+                              "period": _period(page)})
+            else:
+                current["pages"].append(page)
+                if current["document_type"] == "unknown":
+                    current["document_type"] = page_type
+                current["period"] = current["period"] or _period(page)
+
+        return [self._finish_part(index, part) for index, part in enumerate(parts, 1)]
+
+    def _starts_document(self, page: str, page_type: str, current: Dict, previous_page: str) -> bool:
+        number = _page_number(page)
+        if number and number[0] == 1:
+            return True
+        previous_number = _page_number(previous_page)
+        if previous_number and previous_number[0] == previous_number[1]:
+            return True
+        period = _period(page)
+        if period and current["period"] and period != current["period"]:
+            return True
+        if page_type in ("unknown", current["document_type"]) or current["document_type"] == "unknown":
+            return False
+        return page_similarity(page, previous_page) < self.continuation_similarity
+
+    def _finish_part(self, index: int, part: Dict) -> Dict:
+        text = f"{PAGE_BREAK}\n\n".join(part["pages"])
+        document_type, method = part["document_type"], "keywords"
+        if document_type == "unknown":
+            document_class = self.classifier.classify(text)
+            document_type, method = document_class["document_type"], document_class["method"]
+        return {
+            "part": index,
+            "document_type": document_type,
+            "classified_by": method,
+            "first_page": part["first_page"],
+            "last_page": part["first_page"] + len(part["pages"]) - 1,
+            "text": text
+        }
+
+    def cache_fingerprint(self) -> Dict:
+        return {"classifier": self.classifier.cache_fingerprint(), "continuation_similarity": self.continuation_similarity}
+
+def _page_number(page: str) -> Optional[Tuple[int, int]]:
+    match = _PAGE_NUMBER.search(page.lower())
+    if not match:
+        return None
+    number, total = (int(re.sub(r"[il|]", "1", group)) for group in match.groups())
+    return (number, total) if 0 < number <= total else None
+
+def _period(page: str) -> Optional[str]:
+    match = _PERIOD.search(page.lower())
+    return " ".join(match.group(1).split()) if match else None
+
+def part_plan_kwargs(part: Dict) -> Dict:
+    """parse_document arguments for a part's extraction plan."""
+    if part["document_type"] == "unknown":
+        return {}
+    plan = EXTRACTION_PLANS.get(part["document_type"], EXTRACTION_PLANS["unknown"])
+    return {"fields": plan["fields"], "document_type": part["document_type"]}
+
+def merge_parts(parts: List[Dict], parsed: List[Dict], filename: str) -> Dict:
+    """
+    One merchant record from the parser output of each part, field by field
+    in FIELD_SOURCES order. The record's document_type is "packet" and
+    field_sources tells which part each value came from.
+    """
+    def ranked(field: str) -> List[int]:
+        order = FIELD_SOURCES.get(field, FIELD_SOURCES["default"])
+        candidates = [i for i, part in enumerate(parts) if part["document_type"] in order]
+        return sorted(candidates, key=lambda i: (order.index(parts[i]["document_type"]), i))
+
+    merged = copy.deepcopy(parsed[ranked("default")[0]] if ranked("default") else parsed[0])
+    sources = {}
+    for key, value in merged.items():
+        if key in _META_FIELDS:
+            continue
+        if isinstance(value, dict) and key not in ATOMIC_SECTIONS:
+            for field in value:
+                source = _first_with_value(ranked(field), parsed, lambda data: data.get(key, {}).get(field))
+                if source is not None:
+                    value[field] = parsed[source][key][field]
+                    sources[f"{key}.{field}"] = parts[source]["part"]
+        else:
+            source = _first_with_value(ranked(key), parsed, lambda data: data.get(key))
+            if source is not None:
+                merged[key] = copy.deepcopy(parsed[source][key])
+                sources[key] = parts[source]["part"]
+
+    merged["document_type"] = "packet"
+    merged["source_file"] = filename
+    merged["confidence_score"] = round(sum(p.get("confidence_score", 0.5) for p in parsed) / len(parsed), 3)
+    merged["flagged_issues"] = [
+        f"Part {part['part']} ({part['document_type']}): {issue}"
+        for part, data in zip(parts, parsed) for issue in data.get("flagged_issues", [])
+    ]
+    merged["field_sources"] = sources
+    return merged
+
+def _first_with_value(candidates: List[int], parsed: List[Dict], get) -> Optional[int]:
+    for index in candidates:
+        value = get(parsed[index])
+        if isinstance(value, dict) and any(value.values()):
+            return index
+        if isinstance(value, str) and value.strip():
+            return index
+    return None
@@ -1,12 +1,33 @@
 import os
+import copy
+import json
+import glob
+import shutil
+import time
 import logging
-from typing import List, Dict
+import functools
+from typing import List, Dict, Optional
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
 
 from .ocr import OCRProcessor
 from .llm import LLMParser
 from .validator import DocumentValidator
 from .crm_submit import CRMSubmitter
+from .staged_executor import Stage, StagedExecutor
+from .manifest import ProcessingManifest, hash_file
+from .stage_cache import StageCache
+from .metrics import REGISTRY
+from .tracing import TRACER
+from .replay import ReplayRecorder, load_replay
+from .memory_governor import MemoryGovernor
+from .cpu_budget import apply_thread_budget, resolve_budget, threads_per_worker
+from .doc_classifier import DocumentClassifier, EmbeddingCentroids
+from .packet_splitter import PacketSplitter, merge_parts, part_plan_kwargs
+
+# Part of the manifest key: bump when a change should invalidate earlier runs' stage outputs.
+PIPELINE_VERSION = "1.1"
 
 class DocumentPipeline:
     """Main pipeline orchestrator for document processing."""
@@ -16,37 +37,201 @@ class DocumentPipeline:
         self.output_dir = output_dir
         self.config = config or {}
         
-        self.ocr = OCRProcessor(tesseract_path=self.config.get('tesseract_path'))
-        self.llm = LLMParser(
-            ollama_host=self.config.get('ollama_host', 'http://localhost:11434'),
-            model=self.config.get('model', 'phi')
-        )
+        self.ocr = OCRProcessor(tesseract_path=self.config.get('tesseract_path'),
+                                page_workers=self.config.get('ocr_page_workers', 0))
+        self.llm = self._create_llm_parser()
         self.validator = DocumentValidator()
-        self.crm = CRMSubmitter(output_dir)
+        self.crm = CRMSubmitter(output_dir, mock_latency=self.config.get('crm_mock_latency', (0.5, 1.5)),
+                                seed=self.config.get('crm_mock_seed'))
         
         self.logger = logging.getLogger(__name__)
         
         if not self.logger.handlers:
             self._setup_logging()
+        
+        self.manifest = self._create_manifest()
+        self.stage_cache = self._create_stage_cache()
+        
+        self.metrics = REGISTRY
+        if self.config.get('metrics_port'):
+            self._start_metrics_server()
+        
+        self.tracer = TRACER
+        if self.config.get('trace_file') or self.config.get('trace'):
+            self.tracer.enable()
+        
+        self.profiler = self._create_profiler()
+        self.replay_recorder = self._create_replay_recorder()
+        self.memory_governor = self._create_memory_governor()
+        self.classifier = self._create_classifier()
+        self.packet_splitter = self._create_packet_splitter()
     
-    def process_directory(self, input_dir: str, progress_callback=None) -> List[Dict]:
-        """Process all documents in a directory."""
-        if not os.path.exists(input_dir):
-            raise FileNotFoundError(f"Input directory not found: {input_dir}")
+    PIPELINE_STAGES = ("ocr", "llm", "validation", "crm")
+    # Context key each stage produces; this is what the manifest stores per stage.
+    STAGE_OUTPUTS = {"ocr": "extracted_text", "llm": "parsed_data", "validation": "validated_data", "crm": "submission_result"}
+    DEFAULT_STAGE_WORKERS = {"ocr": 2, "llm": 1, "validation": 1, "crm": 4}
+    SUPPORTED_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg')
+    
+    def process_directory(self, input_dir: str, progress_callback=None, staged: Optional[bool] = None,
+                          processes: Optional[int] = None, result_callback=None) -> List[Dict]:
+        """
+        Process all documents in a directory.
         
-        supported_extensions = ('.pdf', '.png', '.jpg', '.jpeg')
-        files = [
-            os.path.join(input_dir, f) 
-            for f in os.listdir(input_dir) 
-            if f.lower().endswith(supported_extensions)
-        ]
+        With staged=True (or the 'staged_execution' config option) the stages
+        run as a producer/consumer chain so OCR, LLM parsing and CRM
+        submission overlap across documents. With processes > 1 (or the
+        'process_workers' config option) documents are spread over worker
+        processes that each own a pipeline. Results are returned in input
+        order in every mode.
+        """
+        files = self.list_documents(input_dir)
         
         if not files:
             self.logger.warning(f"No supported documents found in {input_dir}")
             return []
         
+        return self.process_files(files, progress_callback, staged=staged, processes=processes,
+                                  result_callback=result_callback)
+    
+    def process_files(self, files: List[str], progress_callback=None, staged: Optional[bool] = None,
+                      processes: Optional[int] = None, result_callback=None) -> List[Dict]:
+        """
+        Process the given documents and write the CSV summary.
+        
+        result_callback, if given, is called in the calling thread with each
+        result as it becomes available (per chunk in multi-process mode).
+        """
         self.logger.info(f"Found {len(files)} documents to process")
         
+        if staged is None:
+            staged = self.config.get('staged_execution', False)
+        if processes is None:
+            processes = self.config.get('process_workers', 0)
+        
+        if processes and processes > 1:
+            processed_documents = self._process_files_multiprocess(files, processes, progress_callback, result_callback)
+        elif staged:
+            self.apply_cpu_budget(self._cpu_bound_stage_workers())
+            processed_documents = self._process_files_staged(files, progress_callback, result_callback)
+        else:
+            self.apply_cpu_budget(self._ocr_page_parallelism())
+            processed_documents = self._process_files_sequential(files, progress_callback, result_callback)
+        
+        try:
+            csv_file = self.crm.generate_csv_summary(processed_documents)
+            self.logger.info(f"Generated CSV summary: {csv_file}")
+        except Exception as e:
+            self.logger.error(f"Failed to generate CSV summary: {str(e)}")
+        
+        self.write_metrics_file()
+        self.write_trace_file()
+        self.close_replay_recorder()
+        return processed_documents
+    
+    def replay(self, replay_path: str, repeat: int = 1, staged: bool = False, progress_callback=None,
+               result_callback=None, write_summary: bool = True) -> List[Dict]:
+        """
+        Run validation, CRM submission and the CSV export on recorded OCR text
+        and parser output (see the 'replay_record' config option) instead of
+        real documents.
+        
+        Nothing is OCR'd or sent to the LLM, so downstream changes can be
+        load-tested and bisected quickly and deterministically (set
+        'crm_mock_latency' to 0 and 'crm_mock_seed'). repeat cycles the
+        recording to build larger loads; staged runs the stages on their
+        worker threads as in process_files. Results are marked 'replayed'.
+        """
+        records = load_replay(replay_path)
+        if not records:
+            self.logger.warning(f"No documents in replay file {replay_path}")
+            return []
+        
+        records = records * max(1, repeat)
+        self.logger.info(f"Replaying {len(records)} documents from {replay_path}")
+        
+        if staged:
+            processed_documents = self._replay_staged(records, progress_callback, result_callback)
+        else:
+            processed_documents = []
+            for i, record in enumerate(records):
+                context = self._replay_context(record)
+                try:
+                    for stage in self.PIPELINE_STAGES:
+                        context = self._run_stage(stage, context)
+                    result = self._finish_document(context)
+                except Exception as e:
+                    result = self._failed_result(context, e)
+                result["replayed"] = True
+                
+                processed_documents.append(result)
+                if progress_callback:
+                    progress_callback(i + 1, len(records), f"Replayed {context['filename']}")
+                if result_callback:
+                    result_callback(result)
+        
+        if write_summary:
+            try:
+                csv_file = self.crm.generate_csv_summary(processed_documents)
+                self.logger.info(f"Generated CSV summary: {csv_file}")
+            except Exception as e:
+                self.logger.error(f"Failed to generate CSV summary: {str(e)}")
+        
+        self.write_metrics_file()
+        self.write_trace_file()
+        return processed_documents
+    
+    def _replay_staged(self, records: List[Dict], progress_callback=None, result_callback=None) -> List[Dict]:
+        workers = {**self.DEFAULT_STAGE_WORKERS, **self.config.get('stage_workers', {})}
+        stages = [Stage("start", self._replay_context)] + [
+            Stage(name, functools.partial(self._run_stage, name), workers=max(1, int(workers[name])))
+            for name in self.PIPELINE_STAGES if name not in ("ocr", "llm")
+        ] + [Stage("finish", self._finish_document)]
+        
+        completed = [0]
+        
+        def on_result(result):
+            if not result.ok:
+                result.payload = self._failed_result(result.payload, result.error)
+            result.payload["replayed"] = True
+            completed[0] += 1
+            if progress_callback:
+                progress_callback(completed[0], len(records), f"Replayed {result.payload.get('source_file', '')}")
+            if result_callback:
+                result_callback(result.payload)
+        
+        executor = StagedExecutor(stages, default_queue_size=self.config.get('stage_queue_size', 4))
+        return [result.payload for result in executor.map(records, on_result=on_result)]
+    
+    def _replay_context(self, record: Dict) -> Dict:
+        """A document context whose OCR and LLM stages are already done. No content hash, so the manifest is untouched."""
+        context = {
+            "file_path": record["filename"],
+            "filename": record["filename"],
+            "start_time": datetime.now(),
+            "stage_timings": {},
+            "resumed_stages": ["ocr", "llm"],
+            "cached_stages": [],
+            "replayed": True,
+            "extracted_text": record["extracted_text"],
+            # Validation updates its input in place; every replay starts from the recorded output.
+            "parsed_data": copy.deepcopy(record["parsed_data"])
+        }
+        if self.tracer.enabled:
+            context["trace_span"] = self.tracer.begin("document", cat="document", file=record["filename"], replayed=True)
+        return context
+    
+    def list_documents(self, input_dir: str) -> List[str]:
+        """Supported documents in a directory, in listing order."""
+        if not os.path.exists(input_dir):
+            raise FileNotFoundError(f"Input directory not found: {input_dir}")
+        
+        return [
+            os.path.join(input_dir, f) 
+            for f in os.listdir(input_dir) 
+            if f.lower().endswith(self.SUPPORTED_EXTENSIONS)
+        ]
+    
+    def _process_files_sequential(self, files: List[str], progress_callback=None, result_callback=None) -> List[Dict]:
         processed_documents = []
         for i, file_path in enumerate(files):
             try:
@@ -54,69 +239,510 @@ class DocumentPipeline:
                     progress_callback(i, len(files), f"Processing {os.path.basename(file_path)}")
                 
                 result = self.process_single_document(file_path)
-                processed_documents.append(result)
                 
             except Exception as e:
                 self.logger.error(f"Failed to process {file_path}: {str(e)}")
-                processed_documents.append({
+                result = {
                     "source_file": os.path.basename(file_path),
                     "error": str(e),
                     "processing_status": "failed",
                     "processing_timestamp": datetime.now().isoformat()
-                })
-        
-        try:
-            csv_file = self.crm.generate_csv_summary(processed_documents)
-            self.logger.info(f"Generated CSV summary: {csv_file}")
-        except Exception as e:
-            self.logger.error(f"Failed to generate CSV summary: {str(e)}")
+                }
+            
+            processed_documents.append(result)
+            if result_callback:
+                result_callback(result)
         
         return processed_documents
     
+    def _process_files_staged(self, files: List[str], progress_callback=None, result_callback=None) -> List[Dict]:
+        """Run the stages as a producer/consumer chain with bounded queues."""
+        workers = {**self.DEFAULT_STAGE_WORKERS, **self.config.get('stage_workers', {})}
+        queue_size = self.config.get('stage_queue_size', 4)
+        
+        stages = [Stage("start", self._start_document)] + [
+            Stage(name, functools.partial(self._run_stage, name), workers=max(1, int(workers[name])))
+            for name in self.PIPELINE_STAGES
+        ] + [Stage("finish", self._finish_document)]
+        
+        self.logger.info(
+            "Staged execution: " + ", ".join(f"{name}={workers[name]}" for name in self.PIPELINE_STAGES)
+        )
+        
+        completed = [0]
+        
+        def on_result(result):
+            if not result.ok:
+                result.payload = self._failed_result(result.payload, result.error)
+            completed[0] += 1
+            if progress_callback:
+                progress_callback(completed[0], len(files), f"Processed {os.path.basename(files[result.index])}")
+            if result_callback:
+                result_callback(result.payload)
+        
+        executor = StagedExecutor(stages, default_queue_size=queue_size)
+        return [result.payload for result in executor.map(files, on_result=on_result)]
+    
+    def apply_cpu_budget(self, workers: int) -> Optional[int]:
+        """
+        Split the 'cpu_budget' cores ('auto' for all of them) between workers
+        that run OCR or a local model at the same time, and cap torch, OpenCV
+        and Tesseract to that many threads each. Off when cpu_budget is unset.
+        """
+        cores = resolve_budget(self.config.get('cpu_budget'))
+        if not cores:
+            return None
+        threads = self.config.get('cpu_threads') or threads_per_worker(workers, cores)
+        apply_thread_budget(threads)
+        return threads
+    
+    def _cpu_bound_stage_workers(self) -> int:
+        """Staged threads that can be busy in native code at once: OCR, plus the LLM when it runs locally."""
+        workers = {**self.DEFAULT_STAGE_WORKERS, **self.config.get('stage_workers', {})}
+        busy = int(workers["ocr"]) * self._ocr_page_parallelism()
+        if not getattr(self.llm, "hosts", None):
+            busy += int(workers["llm"])
+        return max(1, busy)
+    
+    def _ocr_page_parallelism(self) -> int:
+        return max(1, int(self.config.get('ocr_page_workers') or 1))
+    
+    def _process_files_multiprocess(self, files: List[str], processes: int, progress_callback=None,
+                                    result_callback=None) -> List[Dict]:
+        """Spread documents over worker processes, each with its own OCR, parser and validator."""
+        from .process_pool import process_files_in_pool
+        
+        config = self.config
+        if self.memory_governor is not None:
+            # Every worker holds its own interpreter, OCR libraries and model copy.
+            processes = self.memory_governor.max_workers(
+                processes,
+                worker_mb=self.config.get('memory_worker_mb', 200),
+                document_mb=self.memory_governor.typical_document_mb()
+            )
+            config = {**self.config, 'memory_budget_mb': self.memory_governor.budget_mb / processes}
+        cores = resolve_budget(self.config.get('cpu_budget'))
+        if cores:
+            # Workers apply this in _init_worker; the parent only dispatches.
+            config = {**config, 'cpu_threads': threads_per_worker(processes, cores)}
+            self.logger.info(f"CPU budget: {cores} cores over {processes} worker processes")
+        
+        results = process_files_in_pool(
+            files,
+            output_dir=self.output_dir,
+            config=config,
+            workers=processes,
+            chunk_size=self.config.get('process_chunk_size'),
+            progress_callback=progress_callback,
+            result_callback=result_callback,
+            start_method=self.config.get('process_start_method')
+        )
+        if self.replay_recorder is not None:
+            self._merge_worker_recordings()
+        return results
+    
+    def _merge_worker_recordings(self):
+        """Append the workers' replay recordings (one gzip member stream each) to this pipeline's file."""
+        self.replay_recorder.close()
+        path = self.replay_recorder.path
+        with open(path, "ab") as merged:
+            for part in sorted(glob.glob(f"{glob.escape(path)}.worker-*")):
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, merged)
+                os.remove(part)
+    
     def process_single_document(self, file_path: str) -> Dict:
         """Process a single document through the complete pipeline."""
-        filename = os.path.basename(file_path)
-        start_time = datetime.now()
+        context = self._start_document(file_path)
         
+        try:
+            for stage in self.PIPELINE_STAGES:
+                context = self._run_stage(stage, context)
+            return self._finish_document(context)
+            
+        except Exception as e:
+            return self._failed_result(context, e)
+    
+    def _start_document(self, file_path) -> Dict:
+        """Create the per-document context that is passed from stage to stage."""
+        filename = os.path.basename(file_path)
         self.logger.info(f"Starting processing for {filename}")
         
+        context = {
+            "file_path": file_path,
+            "filename": filename,
+            "start_time": datetime.now(),
+            "stage_timings": {},
+            "resumed_stages": [],
+            "cached_stages": []
+        }
+        if self.tracer.enabled:
+            context["trace_span"] = self.tracer.begin("document", cat="document", file=filename)
+        if self.profiler is not None and self.profiler.should_profile():
+            self.profiler.start(context)
+        
+        if self.manifest is not None:
+            self._load_manifest_state(context)
+        return context
+    
+    def _load_manifest_state(self, context: Dict):
+        """Attach the content hash and, when resuming, the outputs of stages finished in an earlier run."""
         try:
-            self.logger.debug(f"Step 1: OCR extraction for {filename}")
-            extracted_text = self.ocr.extract_text(file_path)
-            
-            if not extracted_text.strip():
-                raise Exception("No text could be extracted from document")
-            
-            self.logger.debug(f"Step 2: LLM parsing for {filename}")
-            parsed_data = self.llm.parse_document(extracted_text, filename)
-            
-            self.logger.debug(f"Step 3: Validation for {filename}")
-            validated_data = self.validator.validate_document(parsed_data)
-            
-            self.logger.debug(f"Step 4: CRM submission for {filename}")
-            submission_result = self.crm.submit_document(validated_data)
-            
-            final_result = {
-                **validated_data,
-                "submission_result": submission_result,
-                "processing_status": "completed",
-                "processing_time_seconds": (datetime.now() - start_time).total_seconds()
-            }
+            context["content_hash"] = hash_file(context["file_path"])
+        except OSError as e:
+            self.logger.warning(f"Cannot hash {context['filename']}, manifest disabled for it: {str(e)}")
+            return
+        
+        if self.config.get('manifest') not in ('resume', True):
+            return
+        
+        record = self.manifest.load(context["content_hash"])
+        for stage in self.PIPELINE_STAGES:
+            if stage not in record["stages"]:
+                break
+            if record["stages"][stage].get("ocr_scope", self._first_page_scope()) != self._first_page_scope():
+                # Page 1 only, from a classified run: not what this configuration reads.
+                self.logger.info(f"Not resuming {context['filename']}: OCR page scope changed")
+                break
+            context.update(record["stages"][stage])
+            context["resumed_stages"].append(stage)
+        
+        if context["resumed_stages"]:
+            self.logger.info(f"Resuming {context['filename']} after {context['resumed_stages'][-1]} (from manifest)")
+    
+    def _run_stage(self, stage: str, context: Dict) -> Dict:
+        """Run one stage on a document context, recording how long it took."""
+        if stage in context["resumed_stages"]:
+            return context
+        
+        if stage == "validation" and self.replay_recorder is not None:
+            # Before validation, which updates the parser output in place.
+            self._record_replay(context)
+        
+        with self.tracer.span(stage, cat="stage", parent=context.get("trace_span"), file=context["filename"]) as span:
+            stage_start = time.perf_counter()
+            cache_key = self._stage_cache_key(stage, context)
+            if cache_key and self._load_cached_stage(stage, cache_key, context):
+                span.set(cache_hit=True)
+                self._observe_stage(stage, context, stage_start, "cached")
+                self._record_stage(stage, context)
+                return context
+            if cache_key:
+                span.set(cache_hit=False)
             
-            self.logger.info(f"Successfully processed {filename} in {final_result['processing_time_seconds']:.2f} seconds")
-            return final_result
+            try:
+                stage_func = getattr(self, f"_stage_{stage}")
+                if "profile" in context:
+                    context = self.profiler.run_stage(stage, stage_func, context)
+                else:
+                    context = stage_func(context)
+            except Exception:
+                context["failed_stage"] = stage
+                self._observe_stage(stage, context, stage_start, "error")
+                raise
+            self._observe_stage(stage, context, stage_start, "ok")
             
+            if cache_key:
+                self._store_cached_stage(stage, cache_key, context)
+            self._record_stage(stage, context)
+            return context
+    
+    def _observe_stage(self, stage: str, context: Dict, stage_start: float, outcome: str):
+        elapsed = time.perf_counter() - stage_start
+        context["stage_timings"][stage] = elapsed
+        self.metrics.observe("stage_seconds", elapsed, stage=stage, outcome=outcome)
+    
+    def _stage_component(self, stage: str):
+        return {"ocr": self.ocr, "llm": self.llm, "validation": self.validator, "crm": self.crm}[stage]
+    
+    def _stage_cache_key(self, stage: str, context: Dict, ocr_scope: Optional[Dict] = None,
+                         crm_connector=None) -> Optional[str]:
+        """
+        Cache key for a stage: its declared version and config fingerprint
+        plus a hash of its inputs. Computed before the stage runs, since
+        validation updates its input in place. OCR text of fewer than all
+        pages is keyed by its `ocr_scope`, and CRM submissions sent through
+        a `crm_connector` by the connector's target.
+        """
+        if self.stage_cache is None:
+            return None
+        enabled = self.config.get('stage_cache')
+        if isinstance(enabled, (list, tuple)) and stage not in enabled:
+            return None
+        
+        if stage == "ocr":
+            if "content_hash" not in context:
+                context["content_hash"] = hash_file(context["file_path"])
+            inputs = [context["content_hash"], ocr_scope] if ocr_scope else context["content_hash"]
+        elif stage == "llm":
+            inputs = [context["extracted_text"], context["filename"]]
+            if self._packet_parts(context):
+                inputs.append(self.packet_splitter.cache_fingerprint())
+            elif self.classifier is not None:
+                inputs += [self._llm_plan_kwargs(context), self.classifier.cache_fingerprint()]
+        else:
+            inputs = context[self.STAGE_OUTPUTS[self.PIPELINE_STAGES[self.PIPELINE_STAGES.index(stage) - 1]]]
+        
+        component = self._stage_component(stage)
+        fingerprint = component.cache_fingerprint() if hasattr(component, 'cache_fingerprint') else {}
+        if stage == "crm" and crm_connector is not None:
+            fingerprint = {**fingerprint, "connector": crm_connector.cache_fingerprint()}
+        return self.stage_cache.key(stage, getattr(component, 'STAGE_VERSION', "0"), fingerprint, inputs)
+    
+    def _load_cached_stage(self, stage: str, cache_key: str, context: Dict) -> bool:
+        cached = self.stage_cache.get(stage, cache_key)
+        if cached is None and stage == "ocr" and self._first_page_scope():
+            # Text of every page is preferred, but page 1 alone serves when this configuration reads no more.
+            cached = self.stage_cache.get(stage, self._stage_cache_key(stage, context, self._first_page_scope()))
+            if cached is not None:
+                context["ocr_scope"] = self._first_page_scope()
+        if cached is None:
+            return False
+        
+        self.logger.debug(f"Using cached {stage} output for {context['filename']}")
+        context[self.STAGE_OUTPUTS[stage]] = cached
+        context["cached_stages"].append(stage)
+        return True
+    
+    def _store_cached_stage(self, stage: str, cache_key: str, context: Dict):
+        if stage == "ocr":
+            if "ocr_dpi" in context:
+                return
+            if context.get("ocr_scope"):
+                cache_key = self._stage_cache_key(stage, context, context["ocr_scope"])
+        self.stage_cache.put(stage, cache_key, context[self.STAGE_OUTPUTS[stage]])
+    
+    def _record_stage(self, stage: str, context: Dict):
+        if self.manifest is None or "content_hash" not in context:
+            return
+        output_key = self.STAGE_OUTPUTS[stage]
+        output = {output_key: context[output_key]}
+        if stage == "ocr" and context.get("ocr_scope"):
+            output["ocr_scope"] = context["ocr_scope"]
+        try:
+            self.manifest.record_stage(context["content_hash"], stage, output, source_path=context["file_path"])
         except Exception as e:
-            error_msg = str(e)
-            self.logger.error(f"Failed to process {filename}: {error_msg}")
-            
-            return {
-                "source_file": filename,
-                "error": error_msg,
-                "processing_status": "failed",
-                "processing_timestamp": datetime.now().isoformat(),
-                "processing_time_seconds": (datetime.now() - start_time).total_seconds()
+            self.logger.warning(f"Failed to update manifest for {context['filename']}: {str(e)}")
+    
+    def _record_result(self, context: Dict, result: Dict):
+        if self.manifest is None or "content_hash" not in context:
+            return
+        try:
+            self.manifest.record_result(context["content_hash"], result, source_path=context["file_path"])
+        except Exception as e:
+            self.logger.warning(f"Failed to update manifest for {context['filename']}: {str(e)}")
+    
+    def _stage_ocr(self, context: Dict) -> Dict:
+        self.logger.debug(f"Step 1: OCR extraction for {context['filename']}")
+        if self.memory_governor is None:
+            context["extracted_text"] = self._extract_text(context)
+        else:
+            # The page rasters are freed when extract_text returns, so the reservation ends there.
+            with self.memory_governor.admit(context["file_path"]) as admission:
+                if admission.degraded:
+                    context["ocr_dpi"] = admission.dpi
+                context["extracted_text"] = self._extract_text(context, dpi=admission.dpi)
+        
+        if not context["extracted_text"].strip():
+            raise Exception("No text could be extracted from document")
+        return context
+    
+    def _extract_text(self, context: Dict, **kwargs) -> str:
+        """OCR the document; with classification on, page 1 first and the rest only if its plan needs them."""
+        if self.classifier is None or self.packet_splitter is not None:
+            # A packet's later pages are other documents, so with splitting on every page is read.
+            return self.ocr.extract_text(context["file_path"], **kwargs)
+        
+        first_page = self.ocr.extract_text(context["file_path"], first_page=1, last_page=1, **kwargs)
+        document_class = self._classify(context, first_page)
+        if document_class["plan"]["pages"] == "first":
+            context["ocr_scope"] = self._first_page_scope()
+            return first_page
+        rest = self.ocr.extract_text(context["file_path"], first_page=2, **kwargs)
+        return f"{first_page}\n\n{rest}" if rest.strip() else first_page
+    
+    def _first_page_scope(self) -> Optional[Dict]:
+        """Scope of page-1-only OCR text, or None when this configuration always reads every page."""
+        if self.classifier is None or self.packet_splitter is not None:
+            return None
+        return {"pages": "first", "classifier": self.classifier.cache_fingerprint()}
+    
+    def _classify(self, context: Dict, text: str) -> Dict:
+        document_class = self.classifier.classify(text)
+        context["document_class"] = document_class
+        self.tracer.current().set(document_type=document_class["document_type"], classified_by=document_class["method"])
+        self.logger.debug(f"Classified {context['filename']} as {document_class['document_type']} "
+                          f"({document_class['method']}, confidence {document_class['confidence']})")
+        return document_class
+    
+    def _llm_plan_kwargs(self, context: Dict) -> Dict:
+        """parse_document arguments for the document's extraction plan; none when classification is off."""
+        if self.classifier is None:
+            return {}
+        # OCR output from the stage cache, manifest or a replay was never classified.
+        document_class = context.get("document_class") or self._classify(context, context["extracted_text"])
+        if document_class["document_type"] == "unknown":
+            return {}
+        return {"fields": document_class["plan"]["fields"], "document_type": document_class["document_type"]}
+    
+    def _packet_parts(self, context: Dict) -> Optional[List[Dict]]:
+        """The documents a packet PDF bundles, or None for a single document or with splitting off."""
+        if self.packet_splitter is None:
+            return None
+        if "packet_parts" not in context:
+            parts = self.packet_splitter.split(context["extracted_text"])
+            context["packet_parts"] = parts if len(parts) > 1 else None
+            if context["packet_parts"]:
+                self.tracer.current().set(packet_parts=len(parts))
+                self.logger.info(f"{context['filename']} is a packet of {len(parts)} documents: " + ", ".join(
+                    f"{part['document_type']} (pages {part['first_page']}-{part['last_page']})" for part in parts))
+        return context["packet_parts"]
+    
+    def _parse_packet(self, context: Dict, parts: List[Dict]) -> Dict:
+        """Parse the parts of a packet concurrently and merge them into one record."""
+        parent = self.tracer.current()
+        
+        def parse_part(part: Dict) -> Dict:
+            with self.tracer.span("packet_part", cat="stage", parent=parent, part=part["part"],
+                                  document_type=part["document_type"]):
+                return self.llm.parse_document(part["text"], self._part_filename(context, part),
+                                               **part_plan_kwargs(part))
+        
+        workers = min(len(parts), max(1, int(self.config.get('packet_workers', 4))))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="packet") as executor:
+            parsed = list(executor.map(parse_part, parts))
+        return self._merge_packet(context, parts, parsed)
+    
+    def _part_filename(self, context: Dict, part: Dict) -> str:
+        return f"{context['filename']}#{part['part']}"
+    
+    def _merge_packet(self, context: Dict, parts: List[Dict], parsed: List[Dict]) -> Dict:
+        """The merged merchant record, with each part's own validated result under 'packet_parts'."""
+        merged = merge_parts(parts, parsed, context["filename"])
+        merged["packet_parts"] = [
+            {
+                "part": part["part"],
+                "document_type": part["document_type"],
+                "classified_by": part["classified_by"],
+                "pages": [part["first_page"], part["last_page"]],
+                "parsed_data": self.validator.validate_document(copy.deepcopy(data))
             }
+            for part, data in zip(parts, parsed)
+        ]
+        return merged
+    
+    def _stage_llm(self, context: Dict) -> Dict:
+        self.logger.debug(f"Step 2: LLM parsing for {context['filename']}")
+        parts = self._packet_parts(context)
+        if parts:
+            context["parsed_data"] = self._parse_packet(context, parts)
+            return context
+        context["parsed_data"] = self.llm.parse_document(context["extracted_text"], context["filename"],
+                                                         **self._llm_plan_kwargs(context))
+        return context
+    
+    def _stage_validation(self, context: Dict) -> Dict:
+        self.logger.debug(f"Step 3: Validation for {context['filename']}")
+        context["validated_data"] = self.validator.validate_document(context["parsed_data"])
+        return context
+    
+    def _stage_crm(self, context: Dict) -> Dict:
+        self.logger.debug(f"Step 4: CRM submission for {context['filename']}")
+        context["submission_result"] = self.crm.submit_document(context["validated_data"])
+        return context
+    
+    def _finish_document(self, context: Dict) -> Dict:
+        final_result = {
+            **context["validated_data"],
+            "submission_result": context["submission_result"],
+            "processing_status": "completed",
+            "processing_time_seconds": (datetime.now() - context["start_time"]).total_seconds(),
+            "stage_timings": context["stage_timings"]
+        }
+        self.metrics.observe("document_seconds", final_result["processing_time_seconds"], status="completed")
+        self._end_trace(context, "completed")
+        if "profile" in context:
+            self._finish_profile(context, final_result)
+        if context["resumed_stages"]:
+            final_result["resumed_stages"] = context["resumed_stages"]
+        if context["cached_stages"]:
+            final_result["cached_stages"] = context["cached_stages"]
+        if "ocr_dpi" in context:
+            final_result["ocr_dpi"] = context["ocr_dpi"]
+        if "document_class" in context:
+            final_result["document_class"] = {k: v for k, v in context["document_class"].items() if k != "plan"}
+        
+        self._record_result(context, final_result)
+        self.logger.info(f"Successfully processed {context['filename']} in {final_result['processing_time_seconds']:.2f} seconds")
+        return final_result
+    
+    def _failed_result(self, context: Dict, error: Exception) -> Dict:
+        error_msg = str(error)
+        self.logger.error(f"Failed to process {context['filename']}: {error_msg}")
+        
+        result = {
+            "source_file": context["filename"],
+            "error": error_msg,
+            "failed_stage": context.get("failed_stage"),
+            "processing_status": "failed",
+            "processing_timestamp": datetime.now().isoformat(),
+            "processing_time_seconds": (datetime.now() - context["start_time"]).total_seconds(),
+            "stage_timings": context["stage_timings"]
+        }
+        self.metrics.observe("document_seconds", result["processing_time_seconds"], status="failed")
+        self._end_trace(context, "failed", error=error_msg)
+        if "profile" in context:
+            self._finish_profile(context, result)
+        
+        self._record_result(context, result)
+        return result
+    
+    def _record_replay(self, context: Dict):
+        if context.get("replayed"):
+            return
+        try:
+            self.replay_recorder.record(context["filename"], context["extracted_text"], context["parsed_data"],
+                                        content_hash=context.get("content_hash"))
+        except Exception as e:
+            self.logger.warning(f"Failed to record {context['filename']} for replay: {str(e)}")
+    
+    def close_replay_recorder(self):
+        """Flush the replay recording so the file is complete; later documents keep appending."""
+        if self.replay_recorder is not None:
+            self.replay_recorder.close()
+    
+    def _end_trace(self, context: Dict, status: str, **args):
+        span = context.pop("trace_span", None)
+        if span is not None:
+            span.end(status=status, resumed_stages=context["resumed_stages"],
+                     cached_stages=context["cached_stages"], failed_stage=context.get("failed_stage"), **args)
+    
+    def _finish_profile(self, context: Dict, result: Dict):
+        try:
+            report = self.profiler.finish(context)
+        except Exception as e:
+            self.logger.warning(f"Failed to write profile for {context['filename']}: {str(e)}")
+            return
+        if report:
+            result["profile_report"] = report
+    
+    def warm_up(self) -> Dict:
+        """Load OCR libraries and the LLM before the first document arrives."""
+        results = {}
+        start_time = datetime.now()
+        
+        try:
+            self.ocr.warm_up()
+            results["ocr"] = True
+        except Exception as e:
+            self.logger.warning(f"OCR warm-up failed: {str(e)}")
+            results["ocr"] = False
+        
+        results["llm"] = self.llm.warm_up()
+        results["warm_up_seconds"] = (datetime.now() - start_time).total_seconds()
+        
+        self.logger.info(f"Pipeline warm-up finished in {results['warm_up_seconds']:.2f} seconds")
+        return results
     
     def test_system_components(self) -> Dict:
         """Test all system components and return status."""
@@ -173,7 +799,7 @@ class DocumentPipeline:
             for doc in processed_documents
         ) / total if total > 0 else 0
         
-        return {
+        stats = {
             "processing": {
                 "total_documents": total,
                 "successful": successful,
@@ -184,6 +810,51 @@ class DocumentPipeline:
             "validation": validation_stats,
             "submission": submission_stats
         }
+        
+        if getattr(self.llm, 'client', None) is not None:
+            stats["llm_concurrency"] = self.llm.client.get_concurrency_metrics()
+        
+        if self.stage_cache is not None:
+            stats["stage_cache"] = self.stage_cache.get_stats()
+        
+        stats["latency"] = self.metrics.snapshot()
+        if self.memory_governor is not None:
+            stats["memory"] = self.memory_governor.snapshot()
+        if self.classifier is not None:
+            classified = [doc["document_class"] for doc in processed_documents if "document_class" in doc]
+            stats["classification"] = {
+                "by_type": dict(Counter(c["document_type"] for c in classified)),
+                "by_method": dict(Counter(c["method"] for c in classified))
+            }
+        if self.packet_splitter is not None:
+            parts = [part for doc in processed_documents for part in doc.get("packet_parts") or []]
+            stats["packets"] = {
+                "packets": sum(1 for doc in processed_documents if doc.get("packet_parts")),
+                "parts": len(parts),
+                "parts_by_type": dict(Counter(part["document_type"] for part in parts))
+            }
+        return stats
+    
+    def write_metrics_file(self) -> Optional[str]:
+        """Write latency histograms in Prometheus text format to the 'metrics_file' config path, if set."""
+        path = self.config.get('metrics_file')
+        if path:
+            self.metrics.write_prometheus_file(path)
+        return path
+    
+    def write_trace_file(self) -> Optional[str]:
+        """Write the spans collected so far as Chrome trace-event JSON to the 'trace_file' config path, if set."""
+        path = self.config.get('trace_file')
+        if path and self.tracer.enabled:
+            return self.tracer.write(path)
+        return None
+    
+    def _start_metrics_server(self):
+        """Serve /metrics on localhost at the 'metrics_port' config port."""
+        try:
+            self.metrics.serve(int(self.config['metrics_port']), host=self.config.get('metrics_host', '127.0.0.1'))
+        except OSError as e:
+            self.logger.warning(f"Could not start metrics endpoint on port {self.config['metrics_port']}: {str(e)}")
     
     def _setup_logging(self):
         """Setup logging configuration."""
@@ -212,11 +883,171 @@ class DocumentPipeline:
         """Update pipeline configuration and reinitialize components."""
         self.config.update(new_config)
         
-        if 'tesseract_path' in new_config:
-            self.ocr = OCRProcessor(tesseract_path=new_config['tesseract_path'])
+        if 'tesseract_path' in new_config or 'ocr_page_workers' in new_config:
+            if hasattr(self.ocr, 'close'):
+                self.ocr.close()
+            self.ocr = OCRProcessor(tesseract_path=self.config.get('tesseract_path'),
+                                    page_workers=self.config.get('ocr_page_workers', 0))
+        
+        if any(key in new_config for key in ('ollama_host', 'model', 'llm_provider', 'llm_hosts', 'llm_max_concurrency')):
+            self.llm = self._create_llm_parser()
+        
+        if 'manifest' in new_config or 'manifest_path' in new_config:
+            if self.manifest is not None:
+                self.manifest.close()
+            self.manifest = self._create_manifest()
+        
+        if 'stage_cache' in new_config or 'stage_cache_dir' in new_config:
+            self.stage_cache = self._create_stage_cache()
+        
+        if new_config.get('metrics_port'):
+            self._start_metrics_server()
+        
+        if new_config.get('trace_file') or new_config.get('trace'):
+            self.tracer.enable()
+        
+        if any(key.startswith('profile_') for key in new_config):
+            self.profiler = self._create_profiler()
+        
+        if any(key.startswith('crm_mock_') for key in new_config):
+            self.crm = CRMSubmitter(self.output_dir, mock_latency=self.config.get('crm_mock_latency', (0.5, 1.5)),
+                                    seed=self.config.get('crm_mock_seed'))
         
-        if 'ollama_host' in new_config or 'model' in new_config:
-            self.llm = LLMParser(
-                ollama_host=self.config.get('ollama_host', 'http://localhost:11434'),
-                model=self.config.get('model', 'phi')
-            )
\ No newline at end of file
+        if any(key.startswith('memory_') for key in new_config):
+            self.memory_governor = self._create_memory_governor()
+        
+        if any(key.startswith('classif') for key in new_config):
+            self.classifier = self._create_classifier()
+        
+        if any(key.startswith(('classif', 'split_packets', 'packet_')) for key in new_config):
+            self.packet_splitter = self._create_packet_splitter()
+        
+        if 'replay_record' in new_config:
+            self.close_replay_recorder()
+            self.replay_recorder = self._create_replay_recorder()
+    
+    def _create_manifest(self) -> Optional[ProcessingManifest]:
+        """
+        Open the processing manifest when enabled.
+        
+        'manifest' config: 'record' stores per-stage progress, 'resume' also
+        skips stages a document already completed; off by default.
+        """
+        mode = self.config.get('manifest')
+        if mode not in ('record', 'resume', True):
+            return None
+        
+        path = self.config.get('manifest_path') or os.path.join(self.output_dir, "cache", "manifest.sqlite3")
+        return ProcessingManifest(path, pipeline_version=PIPELINE_VERSION)
+    
+    def _create_stage_cache(self) -> Optional[StageCache]:
+        """
+        Open the stage output cache when enabled.
+        
+        'stage_cache' config: True caches every stage, a list of stage names
+        caches only those; off by default.
+        """
+        if not self.config.get('stage_cache'):
+            return None
+        
+        return StageCache(self.config.get('stage_cache_dir') or os.path.join(self.output_dir, "cache", "stages"))
+    
+    def _create_profiler(self):
+        """
+        Build the document profiler when profiling is switched on.
+        
+        'profile_every': profile every Nth document; 'profile_slower_than':
+        keep profiles of documents that took longer than this many seconds.
+        Reports go to 'profile_dir' (default <output_dir>/profiles). When
+        neither is set there is no profiler and no per-document cost.
+        """
+        every = self.config.get('profile_every') or 0
+        slower_than = self.config.get('profile_slower_than')
+        if not every and not slower_than:
+            return None
+        
+        from .profiling import DocumentProfiler
+        return DocumentProfiler(
+            directory=self.config.get('profile_dir') or os.path.join(self.output_dir, "profiles"),
+            every=every,
+            slower_than=slower_than or None,
+            memory=self.config.get('profile_memory', True)
+        )
+    
+    def _create_memory_governor(self) -> Optional[MemoryGovernor]:
+        """
+        Budget OCR memory when 'memory_budget_mb' is set. 'memory_model_mb'
+        is the footprint of models not loaded yet (a local transformers
+        model); 'memory_min_dpi' is as far as DPI may be lowered.
+        """
+        budget = self.config.get('memory_budget_mb')
+        if not budget:
+            return None
+        return MemoryGovernor(
+            budget,
+            model_mb=self.config.get('memory_model_mb', 0),
+            min_dpi=self.config.get('memory_min_dpi', 100),
+            max_wait=self.config.get('memory_max_wait')
+        )
+    
+    def _create_classifier(self) -> Optional[DocumentClassifier]:
+        """
+        Route documents to type-specific extraction plans when 'classify_documents'
+        is set. 'classifier_embedding_model' (a sentence-transformers model) adds a
+        nearest-centroid fallback for pages the keywords cannot place; centroids
+        are built from 'classifier_examples' (JSON {type: [texts]}) or built-in
+        examples and cached under output/cache.
+        """
+        if not self.config.get('classify_documents'):
+            return None
+        
+        embeddings = None
+        model = self.config.get('classifier_embedding_model')
+        if model:
+            examples = None
+            if self.config.get('classifier_examples'):
+                with open(self.config['classifier_examples'], "r", encoding="utf-8") as f:
+                    examples = json.load(f)
+            embeddings = EmbeddingCentroids(
+                model,
+                cache_path=os.path.join(self.output_dir, "cache", "document_centroids.json"),
+                examples=examples
+            )
+        return DocumentClassifier(embeddings=embeddings)
+    
+    def _create_packet_splitter(self) -> Optional[PacketSplitter]:
+        """
+        Split multi-document PDFs into their parts when 'split_packets' is set.
+        The parts are parsed concurrently ('packet_workers' at a time) and
+        merged into one record; page types come from the document classifier
+        (keywords only unless classification is configured).
+        """
+        if not self.config.get('split_packets'):
+            return None
+        return PacketSplitter(
+            self.classifier,
+            continuation_similarity=self.config.get('packet_continuation_similarity', 0.5)
+        )
+    
+    def _create_replay_recorder(self) -> Optional[ReplayRecorder]:
+        """Start recording OCR text and parser output to the 'replay_record' config path, if set."""
+        path = self.config.get('replay_record')
+        if not path:
+            return None
+        return ReplayRecorder(path, pipeline_version=PIPELINE_VERSION)
+    
+    def _create_llm_parser(self) -> LLMParser:
+        """Build the LLM parser from the current configuration."""
+        hosts = self.config.get('llm_hosts') or []
+        if hosts:
+            return LLMParser(
+                model_name=self.config.get('model', 'phi'),
+                provider=self.config.get('llm_provider', 'ollama'),
+                hosts=hosts,
+                max_concurrency=self.config.get('llm_max_concurrency', 32)
+            )
+        
+        return LLMParser(
+            ollama_host=self.config.get('ollama_host', 'http://localhost:11434'),
+            model=self.config.get('model', 'phi')
+        )
\ No newline at end of file
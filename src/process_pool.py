@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Multi-Process Batch Runner
+Processes documents across worker processes that each keep their own warm pipeline
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .cpu_budget import apply_thread_budget
+from .metrics import REGISTRY
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# Set in each worker process by _init_worker.
+_worker_pipeline = None
+_progress_queue = None
+
+def _init_worker(output_dir: str, config: Dict, progress_queue):
+    """Build the worker's pipeline once; it is reused for every chunk the worker takes."""
+    global _worker_pipeline, _progress_queue
+    from .pipeline import DocumentPipeline
+
+    worker_config = dict(config)
+    worker_config['process_workers'] = 0
+    worker_config['ocr_page_workers'] = 0  # the documents are already spread over processes
+    # The parent owns the metrics endpoint and the metrics/trace files; workers ship
+    # their histograms and spans back with each chunk.
+    worker_config['metrics_port'] = None
+    worker_config['metrics_file'] = None
+    worker_config['trace'] = bool(config.get('trace_file') or config.get('trace'))
+    worker_config['trace_file'] = None
+    if config.get('replay_record'):
+        # Each worker records to its own part file; the parent appends them to the recording.
+        worker_config['replay_record'] = f"{config['replay_record']}.worker-{os.getpid()}"
+    if config.get('cpu_threads'):
+        apply_thread_budget(config['cpu_threads'])
+    _worker_pipeline = DocumentPipeline(output_dir=output_dir, config=worker_config)
+    _progress_queue = progress_queue
+
+def _process_chunk(chunk: List[Tuple[int, str]]) -> Tuple[List[Tuple[int, Dict]], Dict, List[Dict]]:
+    """
+    Process a chunk of (index, path) pairs, reporting each document as it
+    starts and finishes (with its result) on the progress queue. Returns the
+    results plus the latency histograms and trace spans recorded while
+    processing them.
+    """
+    REGISTRY.reset()
+    results = []
+    for index, file_path in chunk:
+        if _progress_queue is not None:
+            _progress_queue.put(("started", index, None, None))
+        try:
+            result = _worker_pipeline.process_single_document(file_path)
+        except Exception as e:
+            result = _failed_result(file_path, e)
+
+        results.append((index, result))
+        if _progress_queue is not None:
+            _progress_queue.put(("finished", index, os.path.basename(file_path), result))
+    _worker_pipeline.close_replay_recorder()
+    return results, REGISTRY.export_state(), TRACER.drain() if TRACER.enabled else []
+
+def _failed_result(file_path: str, error) -> Dict:
+    return {
+        "source_file": os.path.basename(file_path),
+        "error": str(error),
+        "processing_status": "failed",
+        "processing_timestamp": datetime.now().isoformat()
+    }
+
+def default_chunk_size(total: int, workers: int) -> int:
+    """Small chunks keep workers busy until the end; a few per worker amortise the IPC."""
+    return max(1, min(8, math.ceil(total / (workers * 4))))
+
+def process_files_in_pool(files: List[str], output_dir: str, config: Dict, workers: int,
+                          chunk_size: Optional[int] = None, progress_callback: Optional[Callable] = None,
+                          result_callback: Optional[Callable] = None, start_method: Optional[str] = None) -> List[Dict]:
+    """
+    Process documents with a pool of worker processes.
+
+    Files are split into small chunks that idle workers pull from a shared
+    queue, so a worker that draws quick documents simply takes more chunks.
+    Results come back as each chunk finishes and are returned in input
+    order. progress_callback(completed, total, message) is called in the
+    calling process as each document finishes in any worker;
+    result_callback(result) as each chunk's results arrive.
+
+    When a worker process dies the executor fails every pending chunk, so
+    the remaining documents are sorted out from the workers' messages:
+    finished ones keep the result they reported, ones that never started go
+    to a fresh pool, and the ones in flight are retried one at a time in a
+    single-worker pool, where a crash can only be that document's, which is
+    then failed.
+    """
+    total = len(files)
+    workers = max(1, min(workers, total))
+    chunk_size = chunk_size or default_chunk_size(total, workers)
+    indexed = list(enumerate(files))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, total, chunk_size)]
+
+    context = multiprocessing.get_context(start_method)
+    progress_queue = context.Queue()
+    results: Dict[int, Dict] = {}
+    reported = set()
+
+    logger.info(f"Processing {total} documents with {workers} worker processes ({len(chunks)} chunks of up to {chunk_size})")
+
+    def report(index: int, message: str):
+        if index in reported:
+            return
+        reported.add(index)
+        if progress_callback:
+            progress_callback(len(reported), total, message)
+
+    started = set()
+    finished: Dict[int, Dict] = {}
+
+    def drain_progress(block_seconds: float = 0):
+        try:
+            message = progress_queue.get(timeout=block_seconds) if block_seconds else progress_queue.get_nowait()
+            while True:
+                kind, index, filename, result = message
+                if kind == "started":
+                    started.add(index)
+                else:
+                    finished[index] = result
+                    report(index, f"Processed {filename} ({result.get('processing_status')})")
+                message = progress_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def settle_progress():
+        # Progress messages can trail the chunk results through the queue's feeder thread.
+        deadline = time.monotonic() + 1.0
+        while len(reported) < total and time.monotonic() < deadline:
+            drain_progress(0.1)
+
+    def finish(index: int, result: Dict):
+        results[index] = result
+        if result_callback:
+            result_callback(result)
+
+    def run_pool(pool_chunks: List[List[Tuple[int, str]]], pool_workers: int) -> List[Tuple[int, str]]:
+        """Run chunks in a fresh pool; returns the documents of chunks lost when the pool broke."""
+        lost = []
+        with ProcessPoolExecutor(max_workers=pool_workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(output_dir, config, progress_queue)) as executor:
+            pending = {executor.submit(_process_chunk, chunk): chunk for chunk in pool_chunks}
+
+            while pending:
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = pending.pop(future)
+                    try:
+                        chunk_results, chunk_metrics, chunk_spans = future.result()
+                        REGISTRY.merge_state(chunk_metrics)
+                        TRACER.add_events(chunk_spans)
+                    except BrokenProcessPool:
+                        lost.extend(chunk)
+                        continue
+                    except Exception as e:
+                        logger.error(f"Worker failed on a chunk of {len(chunk)} documents: {e}")
+                        chunk_results = [(index, _failed_result(file_path, e)) for index, file_path in chunk]
+                    for index, result in chunk_results:
+                        finish(index, result)
+                drain_progress()
+        return lost
+
+    starts_before = 0
+    lost = run_pool(chunks, workers)
+    while lost:
+        settle_progress()
+        lost = [doc for doc in lost if doc[0] not in results]
+        for index, _ in lost:
+            if index in finished:
+                finish(index, finished[index])
+        if len(started) == starts_before:
+            # The pool broke before any document started (workers cannot start); fail the rest.
+            for index, file_path in lost:
+                if index not in results:
+                    finish(index, _failed_result(file_path, "Worker processes failed to start"))
+            break
+
+        in_flight = [doc for doc in lost if doc[0] in started and doc[0] not in finished]
+        unstarted = [doc for doc in lost if doc[0] not in started]
+        logger.error(f"A worker process died: {len(lost) - len(in_flight) - len(unstarted)} finished documents kept, "
+                     f"{len(in_flight)} in flight retried one at a time, {len(unstarted)} not started resubmitted")
+        for index, file_path in in_flight:
+            if run_pool([[(index, file_path)]], 1):
+                logger.error(f"Worker process died while processing {os.path.basename(file_path)}")
+                finish(index, _failed_result(file_path, "Worker process died while processing this document"))
+
+        starts_before = len(started)
+        lost = run_pool([unstarted[i:i + chunk_size] for i in range(0, len(unstarted), chunk_size)],
+                        min(workers, len(unstarted))) if unstarted else []
+
+    settle_progress()
+    for index in range(total):
+        if index not in reported:
+            report(index, f"Processed {results[index].get('source_file')} ({results[index].get('processing_status')})")
+    progress_queue.close()
+
+    return [results[index] for index in range(total)]
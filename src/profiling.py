@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Document Profiling
+On-demand cProfile and tracemalloc capture for selected documents, written under output/profiles/
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = os.path.join("output", "profiles")
+
+class DocumentProfiler:
+    """
+    Profiles every Nth document, or keeps profiles only for documents slower than a threshold.
+
+    cProfile only sees the thread it runs on and only one profiler can be
+    active at a time, so each stage call is profiled separately and the
+    stage profiles are merged into one ``.prof`` per document; a stage that
+    starts while another document's stage is being profiled runs
+    unprofiled (its report notes that). tracemalloc is process-wide: with
+    several documents in flight the allocation report includes theirs too.
+
+    The pipeline only creates a profiler when profiling is configured, so
+    documents pay nothing while it is off. In ``slower_than`` mode every
+    document has to be profiled because slowness is only known at the end;
+    fast documents' profiles are simply discarded.
+    """
+
+    def __init__(self, directory: str = DEFAULT_PROFILE_DIR, every: int = 0, slower_than: Optional[float] = None,
+                 memory: bool = True, top: int = 25):
+        self.directory = directory
+        self.every = max(0, int(every or 0))
+        self.slower_than = slower_than
+        self.memory = memory
+        self.top = top
+        self.written = 0
+
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._seen = 0
+        self._memory_users = 0
+
+    def should_profile(self) -> bool:
+        """Whether the next document should be profiled."""
+        with self._lock:
+            self._seen += 1
+            seen = self._seen
+        if self.slower_than is not None:
+            return True
+        return self.every > 0 and seen % self.every == 0
+
+    def start(self, context: Dict):
+        """Attach profiling state to a document context."""
+        state = {"stats": None, "stages": [], "skipped_stages": [], "started": time.perf_counter()}
+        if self.memory:
+            with self._lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                if self._memory_users == 0 and hasattr(tracemalloc, "reset_peak"):
+                    tracemalloc.reset_peak()
+                self._memory_users += 1
+            state["memory_before"] = tracemalloc.take_snapshot()
+        context["profile"] = state
+
+    def run_stage(self, stage: str, func: Callable[[Dict], Dict], context: Dict) -> Dict:
+        """Run a stage function under cProfile and fold its stats into the document's profile."""
+        state = context["profile"]
+        if not self._profile_lock.acquire(blocking=False):
+            state["skipped_stages"].append(stage)
+            return func(context)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another profiler (a debugger or an outer cProfile run) is already active.
+            self._profile_lock.release()
+            logger.debug(f"Could not profile {stage}: {e}")
+            state["skipped_stages"].append(stage)
+            return func(context)
+
+        try:
+            return func(context)
+        finally:
+            profiler.disable()
+            self._profile_lock.release()
+            if profiler.getstats():
+                if state["stats"] is None:
+                    state["stats"] = pstats.Stats(profiler)
+                else:
+                    state["stats"].add(profiler)
+                state["stages"].append(stage)
+
+    def finish(self, context: Dict) -> Optional[Dict]:
+        """Write the document's reports; returns their paths, or None when the document was not slow enough."""
+        state = context.pop("profile", None)
+        if state is None:
+            return None
+
+        elapsed = time.perf_counter() - state["started"]
+        memory_after = peak = None
+        if self.memory:
+            memory_after = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            with self._lock:
+                self._memory_users -= 1
+                if self._memory_users == 0:
+                    tracemalloc.stop()
+
+        if self.slower_than is not None and elapsed < self.slower_than:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        stem = re.sub(r"[^\w.-]", "_", os.path.splitext(context["filename"])[0])
+        base = os.path.join(self.directory, f"{stem}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+        report = {"seconds": elapsed, "report": f"{base}.txt"}
+
+        lines = [
+            f"Document: {context['file_path']}",
+            f"Elapsed: {elapsed:.3f}s",
+            f"Profiled stages: {', '.join(state['stages']) or 'none'}",
+        ]
+        if state["skipped_stages"]:
+            lines.append(f"Not profiled (another document was being profiled): {', '.join(state['skipped_stages'])}")
+
+        if state["stats"] is not None:
+            report["prof"] = f"{base}.prof"
+            state["stats"].dump_stats(report["prof"])
+            text = io.StringIO()
+            pstats.Stats(report["prof"], stream=text).sort_stats("cumulative").print_stats(self.top)
+            lines += ["", f"Top {self.top} functions by cumulative time:", text.getvalue()]
+
+        if memory_after is not None:
+            lines += ["", f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB",
+                      f"Top {self.top} allocation sites (growth during the document):"]
+            for stat in memory_after.compare_to(state["memory_before"], "lineno")[:self.top]:
+                lines.append(f"  {stat}")
+
+        with open(report["report"], "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+        with self._lock:
+            self.written += 1
+        logger.info(f"Wrote profile for {context['filename']} ({elapsed:.2f}s) to {report['report']}")
+        return report
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Record / Replay
+Captures each document's OCR text and parser output so validation, CRM submission and export can be rerun without OCR or the LLM
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+REPLAY_FORMAT = "moneypulse-replay"
+REPLAY_VERSION = 1
+
+class ReplayRecorder:
+    """
+    Appends one record per document to a gzip-compressed JSON-lines file.
+
+    Each record holds the filename, content hash (when known), the OCR text
+    and the parser output, which is everything the downstream stages need.
+    The first line is a header naming the format and pipeline version.
+    """
+
+    def __init__(self, path: str, pipeline_version: str = ""):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+        # Start a fresh recording; each batch then appends its own gzip member,
+        # so the file is complete and readable after every close().
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "format": REPLAY_FORMAT,
+                "version": REPLAY_VERSION,
+                "pipeline_version": pipeline_version,
+                "created": datetime.now().isoformat()
+            }) + "\n")
+
+    def _write(self, record: Dict):
+        if self._file is None:
+            self._file = gzip.open(self.path, "at", encoding="utf-8")
+        self._file.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+
+    def record(self, filename: str, extracted_text: str, parsed_data: Dict, content_hash: Optional[str] = None):
+        with self._lock:
+            self._write({
+                "filename": filename,
+                "content_hash": content_hash,
+                "extracted_text": extracted_text,
+                "parsed_data": parsed_data
+            })
+            self.count += 1
+
+    def close(self):
+        """Finish the current gzip member; recording can continue afterwards."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                logger.info(f"Recorded {self.count} documents to {self.path}")
+
+def iter_replay(path: str) -> Iterator[Dict]:
+    """Yield the document records of a replay file, checking its header."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("format") != REPLAY_FORMAT:
+            raise ValueError(f"{path} is not a MoneyPulse replay file")
+        if header.get("version", 0) > REPLAY_VERSION:
+            raise ValueError(f"{path} uses replay format version {header['version']}; this build reads up to {REPLAY_VERSION}")
+
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if "format" not in record:  # merged worker recordings carry their own headers
+                    yield record
+
+def load_replay(path: str) -> List[Dict]:
+    return list(iter_replay(path))
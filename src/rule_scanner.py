@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Compiled Rule-Set Scanner
+Extracts every regex field rule from OCR text with precompiled, keyword-prefiltered patterns, keeping match positions
+"""
+
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Each rule is matched on its own, so matches of different rules may overlap
+# (a phone number on the business name line is still found). "keywords" are
+# lower-case strings at least one of which must occur in the text for the
+# rule to be tried at all.
+DEFAULT_RULES = [
+    {"name": "business_name", "pattern": r"(?:business|company|entity)\s+name[:\s]+([^\n\r]+)",
+     "keywords": ["business", "company", "entity"]},
+    {"name": "ssn_ein", "pattern": r"(?:SSN|EIN|Tax\s+ID)[:\s]*([0-9-]{9,11})", "keywords": ["ssn", "ein", "tax"]},
+    {"name": "routing", "pattern": r"(?:routing|ABA)[:\s]*([0-9]{9})", "keywords": ["routing", "aba"]},
+    {"name": "account", "pattern": r"(?:account)[:\s]*([0-9]{4,17})", "keywords": ["account"]},
+    {"name": "email", "pattern": r"([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})", "keywords": ["@"]},
+    {"name": "phone", "pattern": r"(\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4})"},
+]
+
+class RuleMatch(NamedTuple):
+    """A single field match and where it was found in the text."""
+    name: str
+    value: str
+    start: int
+    end: int
+
+class _CompiledRule(NamedTuple):
+    name: str
+    pattern: "re.Pattern"
+    folded: "re.Pattern"  # lower-cased pattern for the lower-cased text, or None
+    group: int
+    keywords: tuple
+
+class RuleSet:
+    """A set of named field patterns, each compiled once."""
+
+    def __init__(self, rules: List[Dict]):
+        """
+        Compile the rules.
+
+        Args:
+            rules: List of dicts with ``name``, ``pattern``, optional
+                ``ignore_case`` (default True) and optional ``keywords``
+                (lower-case strings; the rule is skipped on text containing
+                none of them). A pattern's first capture group is the
+                extracted value; without one the whole match is used.
+        """
+        if not rules:
+            raise ValueError("Rule set must contain at least one rule")
+
+        self.rules = rules
+        self.names = [rule["name"] for rule in rules]
+        self._compiled = []
+        for rule in rules:
+            ignore_case = rule.get("ignore_case", True)
+            pattern = re.compile(rule["pattern"], re.IGNORECASE if ignore_case else 0)
+            # Case-insensitive matching is several times slower in ``re`` than
+            # matching a lower-cased copy of the text, so case-insensitive rules
+            # scan the folded text and values are sliced from the original.
+            folded = re.compile(_lowercase_pattern(rule["pattern"])) if ignore_case else None
+            self._compiled.append(_CompiledRule(
+                rule["name"], pattern, folded, 1 if pattern.groups else 0,
+                tuple(keyword.lower() for keyword in rule.get("keywords") or ())
+            ))
+
+    @classmethod
+    def default(cls) -> "RuleSet":
+        """The built-in merchant document rules."""
+        return cls(DEFAULT_RULES)
+
+    @classmethod
+    def from_config(cls, config: Union[Dict, List]) -> "RuleSet":
+        """Build a rule set from ``{"rules": [...]}`` or a bare list of rules."""
+        rules = config.get("rules", []) if isinstance(config, dict) else config
+        return cls(rules)
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleSet":
+        """Load rules from a JSON or YAML file."""
+        path = Path(path)
+        with open(path, "r", encoding="utf-8") as f:
+            if path.suffix.lower() in (".yaml", ".yml"):
+                import yaml
+                config = yaml.safe_load(f)
+            else:
+                config = json.load(f)
+
+        logger.info(f"Loaded extraction rules from {path}")
+        return cls.from_config(config or {})
+
+    def scan(self, text: str) -> List[RuleMatch]:
+        """Every match of every rule, in document order (rule order for matches at the same position)."""
+        folded = text.lower()
+        # Some characters change length when lower-cased; positions would drift.
+        use_folded = len(folded) == len(text)
+
+        matches = []
+        for order, rule in enumerate(self._compiled):
+            if rule.keywords and not any(keyword in folded for keyword in rule.keywords):
+                continue
+            if rule.folded is not None and use_folded:
+                found = rule.folded.finditer(folded)
+            else:
+                found = rule.pattern.finditer(text)
+            for m in found:
+                start, end = m.span(rule.group)
+                matches.append((start, order, RuleMatch(rule.name, text[start:end], start, end)))
+        matches.sort(key=lambda item: item[:2])
+        return [match for _, _, match in matches]
+
+    def extract(self, text: str) -> Dict[str, Union[str, List[str]]]:
+        """Return field values, a single string when a field matched once and a list otherwise."""
+        return self.group_matches(self.scan(text))[0]
+
+    def group_matches(self, matches: List[RuleMatch]):
+        """Group matches by field into (values, positions)."""
+        values: Dict[str, List[str]] = {}
+        positions: Dict[str, List[List[int]]] = {}
+        for match in matches:
+            values.setdefault(match.name, []).append(match.value)
+            positions.setdefault(match.name, []).append([match.start, match.end])
+
+        fields = {name: found[0] if len(found) == 1 else found for name, found in values.items()}
+        return fields, positions
+
+    @staticmethod
+    def context(text: str, match: RuleMatch, width: int = 80) -> str:
+        """Text surrounding a match, for later stages that need nearby context."""
+        return text[max(0, match.start - width):match.end + width]
+
+def _lowercase_pattern(pattern: str) -> str:
+    """Lower-case the literal characters of a regex, leaving escapes and group names intact."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            if pattern.startswith("N{", i + 1):
+                end = pattern.index("}", i)
+                out.append(pattern[i:end + 1])
+                i = end + 1
+            else:
+                out.append(pattern[i:i + 2])
+                i += 2
+            continue
+        if pattern.startswith("(?P<", i) or pattern.startswith("(?P=", i):
+            end = pattern.index(">" if pattern[i + 3] == "<" else ")", i)
+            out.append(pattern[i:end + 1])
+            i = end + 1
+            continue
+        out.append(char.lower())
+        i += 1
+    return "".join(out)
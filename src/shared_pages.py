@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Shared-Memory Page Transport
+Hands rasterised pages to OCR worker processes through pooled, reference-counted shared-memory segments instead of pickling them
+"""
+
+import logging
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Tuple
+
+# numpy is imported inside the functions that need it so that importing this
+# module (and the pipeline) stays fast.
+
+logger = logging.getLogger(__name__)
+
+class PageHandle(NamedTuple):
+    """What crosses the process boundary instead of the pixels: ~100 bytes pickled."""
+    segment: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+class SharedPagePool:
+    """
+    Reusable shared-memory segments for page rasters, owned by the producer.
+
+    put() copies a page into a free segment big enough for it (creating one
+    if none is) and returns a handle with one reference. Consumers that
+    share the page take extra references with acquire(); each release()
+    drops one, and the last returns the segment to the pool for the next
+    page. Pages of one batch are usually the same size, so after the first
+    document no segment is created. At most max_free idle segments are
+    kept; close() unlinks everything.
+
+    Create the pool before starting the consumer processes so they share
+    this process's resource tracker (see _attach).
+    """
+
+    def __init__(self, max_free: int = 8):
+        _start_resource_tracker()
+        self.max_free = max_free
+        self.stats = {"created": 0, "reused": 0, "unlinked": 0}
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+        self._refs: Dict[str, int] = {}
+        self._free: List[str] = []
+        self._lock = threading.Lock()
+
+    def put(self, page) -> PageHandle:
+        """Copy an array (or PIL image) into a pooled segment."""
+        import numpy as np
+
+        page = np.asarray(page)
+        with self._lock:
+            segment = self._take_free(page.nbytes)
+            if segment is None:
+                segment = shared_memory.SharedMemory(create=True, size=max(1, page.nbytes))
+                self._segments[segment.name] = segment
+                self.stats["created"] += 1
+            else:
+                self.stats["reused"] += 1
+            self._refs[segment.name] = 1
+
+        np.ndarray(page.shape, dtype=page.dtype, buffer=segment.buf)[...] = page
+        return PageHandle(segment.name, page.shape, page.dtype.str)
+
+    def _take_free(self, nbytes: int):
+        # Smallest idle segment that fits, so big segments stay available for big pages.
+        fitting = [name for name in self._free if self._segments[name].size >= nbytes]
+        if not fitting:
+            return None
+        name = min(fitting, key=lambda n: self._segments[n].size)
+        self._free.remove(name)
+        return self._segments[name]
+
+    def acquire(self, handle: PageHandle):
+        with self._lock:
+            self._refs[handle.segment] += 1
+
+    def release(self, handle: PageHandle):
+        with self._lock:
+            self._refs[handle.segment] -= 1
+            if self._refs[handle.segment] > 0:
+                return
+            del self._refs[handle.segment]
+            self._free.append(handle.segment)
+            while len(self._free) > self.max_free:
+                self._unlink(self._free.pop(0))
+
+    def _unlink(self, name: str):
+        segment = self._segments.pop(name)
+        segment.close()
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+        self.stats["unlinked"] += 1
+
+    def close(self):
+        with self._lock:
+            if self._refs:
+                logger.warning(f"Closing page pool with {len(self._refs)} page(s) still referenced")
+            for name in list(self._segments):
+                self._unlink(name)
+            self._refs.clear()
+            self._free = []
+
+def _start_resource_tracker():
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.ensure_running()
+    except (ImportError, AttributeError, OSError):
+        pass  # Windows has no tracker; segments live as long as a handle is open
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Older versions register the segment with the resource tracker on attach.
+        # Workers started after the pool share the producer's tracker, where that
+        # is a no-op; a tracker of their own would unlink the segment when they exit.
+        return shared_memory.SharedMemory(name=name)
+
+class attached_page:
+    """
+    Context manager giving a consumer a zero-copy numpy view of a shared
+    page. The view is only valid inside the with block; copy anything that
+    must outlive it.
+    """
+
+    def __init__(self, handle: PageHandle):
+        self.handle = handle
+        self._segment = None
+        self._view = None
+
+    def __enter__(self):
+        import numpy as np
+
+        self._segment = _attach(self.handle.segment)
+        self._view = np.ndarray(self.handle.shape, dtype=np.dtype(self.handle.dtype), buffer=self._segment.buf)
+        return self._view
+
+    def __exit__(self, *exc_info):
+        self._view = None
+        try:
+            self._segment.close()
+        except BufferError:
+            # The caller still holds the view; the mapping goes when it is collected.
+            pass
+        return False
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Stage Output Cache
+Content-addressed memoisation of pipeline stage outputs, keyed by stage version, config and inputs
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join("output", "cache", "stages")
+
+# Keys that change on every run without changing meaning; they must not bust downstream caches.
+VOLATILE_KEYS = frozenset({"validation_timestamp", "processing_timestamp", "processing_time_seconds", "stage_timings"})
+
+_MISSING = object()
+
+def _strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+def fingerprint(value: Any) -> str:
+    """Stable SHA-256 of a JSON-compatible value, ignoring volatile keys."""
+    encoded = json.dumps(_strip_volatile(value), sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class StageCache:
+    """
+    Build-system style cache for stage outputs.
+
+    A stage's key combines its name, declared version, config fingerprint
+    and the hash of its inputs. Bumping a stage's version or changing its
+    config misses the cache for that stage only; if its new output is the
+    same as before, the downstream stages still hit. Entries are JSON files
+    under ``<directory>/<stage>/<key[:2]>/<key>.json``, written atomically so
+    threads and worker processes can share the directory.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def key(self, stage: str, version: str, config: Dict[str, Any], inputs: Any) -> str:
+        return fingerprint({"stage": stage, "version": version, "config": config, "inputs": inputs})
+
+    def _path(self, stage: str, key: str) -> str:
+        return os.path.join(self.directory, stage, key[:2], f"{key}.json")
+
+    def get(self, stage: str, key: str, default: Any = None) -> Any:
+        """Cached output for a key, or default on a miss."""
+        value = _MISSING
+        try:
+            with open(self._path(stage, key), "r", encoding="utf-8") as f:
+                value = json.load(f)["value"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable {stage} cache entry {key[:12]}: {e}")
+
+        self._count(stage, "misses" if value is _MISSING else "hits")
+        return default if value is _MISSING else value
+
+    def put(self, stage: str, key: str, value: Any):
+        """Store a stage output."""
+        path = self._path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stage": stage, "value": value}, f, default=str, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write {stage} cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _count(self, stage: str, outcome: str):
+        with self._lock:
+            counts = self.stats.setdefault(stage, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {stage: dict(counts) for stage, counts in self.stats.items()}
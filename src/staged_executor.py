@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Staged Executor
+Runs items through a chain of stages, each with its own worker threads and bounded input queue
+"""
+
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+class Stage(NamedTuple):
+    """One step of a staged run: ``func`` maps a payload to the next stage's payload."""
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: Optional[int] = None
+
+class StageResult:
+    """An item's final payload, or the stage and exception that stopped it."""
+
+    __slots__ = ("index", "payload", "error", "failed_stage")
+
+    def __init__(self, index: int, payload: Any):
+        self.index = index
+        self.payload = payload
+        self.error: Optional[BaseException] = None
+        self.failed_stage: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+class StagedExecutor:
+    """
+    Producer/consumer chain of stages connected by bounded queues.
+
+    Every stage pulls from its own queue, so a slow stage only holds up the
+    items behind it while the others keep working on different items. The
+    queues are bounded: when a downstream stage falls behind, upstream
+    workers block on ``put`` instead of buffering the whole input in memory.
+    An item whose stage raises skips the remaining stages and is reported
+    with its error.
+    """
+
+    def __init__(self, stages: List[Stage], default_queue_size: int = 4):
+        if not stages:
+            raise ValueError("At least one stage is required")
+
+        self.stages = stages
+        self.default_queue_size = default_queue_size
+
+    def run(self, items: Iterable[Any]) -> Iterator[StageResult]:
+        """Yield a StageResult per item, in completion order."""
+        queues = [
+            queue.Queue(maxsize=stage.queue_size or max(self.default_queue_size, stage.workers * 2))
+            for stage in self.stages
+        ]
+        results: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        threads = []
+
+        def feed():
+            try:
+                for index, item in enumerate(items):
+                    if not self._put(queues[0], StageResult(index, item), stop):
+                        break
+            except Exception as e:
+                logger.error(f"Staged executor input failed: {e}")
+            finally:
+                for _ in range(self.stages[0].workers):
+                    self._put(queues[0], _DONE, stop)
+
+        threads.append(threading.Thread(target=feed, name="stage-feed", daemon=True))
+
+        for position, stage in enumerate(self.stages):
+            out_queue = queues[position + 1] if position + 1 < len(self.stages) else results
+            downstream_workers = self.stages[position + 1].workers if position + 1 < len(self.stages) else 1
+            remaining = [stage.workers]
+            lock = threading.Lock()
+
+            def work(stage=stage, in_queue=queues[position], out_queue=out_queue,
+                     downstream_workers=downstream_workers, remaining=remaining, lock=lock):
+                while True:
+                    item = in_queue.get()
+                    if item is _DONE:
+                        break
+                    if item.ok:
+                        try:
+                            item.payload = stage.func(item.payload)
+                        except Exception as e:
+                            item.error = e
+                            item.failed_stage = stage.name
+                    if not self._put(out_queue, item, stop):
+                        return
+
+                # The last worker of a stage to finish tells the next stage to shut down.
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    for _ in range(downstream_workers):
+                        self._put(out_queue, _DONE, stop)
+
+            for n in range(stage.workers):
+                threads.append(threading.Thread(target=work, name=f"stage-{stage.name}-{n}", daemon=True))
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # Consumer stopped early (or finished): unblock any waiting producers.
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=0.1)
+
+    def map(self, items: Iterable[Any], on_result: Optional[Callable[[StageResult], None]] = None) -> List[StageResult]:
+        """Run every item and return the results in input order."""
+        collected: Dict[int, StageResult] = {}
+        for result in self.run(items):
+            collected[result.index] = result
+            if on_result:
+                on_result(result)
+        return [collected[index] for index in sorted(collected)]
+
+    @staticmethod
+    def _put(target: queue.Queue, item: Any, stop: threading.Event) -> bool:
+        """Blocking put that gives up once the run has been stopped."""
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
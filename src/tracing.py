@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Span Tracing
+Optional per-document spans (document -> stage -> page/field) exported as Chrome trace-event JSON for Perfetto
+"""
+
+import contextvars
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("moneypulse_span", default=None)
+
+def _now_us() -> int:
+    # perf_counter is system-wide monotonic on Linux and Windows, so worker processes share the timeline.
+    return time.perf_counter_ns() // 1000
+
+class _NullSpan:
+    """Returned while tracing is off; every operation is a no-op."""
+
+    span_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+    def end(self, **args):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+    """
+    One timed operation. Use as a context manager on the thread that does
+    the work, or begin()/end() for spans that cross threads (a document
+    moving through staged workers). Spans ending on the thread they began
+    on become complete ("X") events, nested by time on that thread's track;
+    the rest become async ("b"/"e") events on their own track.
+    """
+
+    __slots__ = ("tracer", "name", "cat", "args", "span_id", "parent_id", "async_track", "start_us", "tid", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, parent, async_track: bool, args: Dict):
+        parent = parent if parent is not None else _current_span.get()
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.span_id = next(tracer._ids)
+        self.parent_id = getattr(parent, "span_id", None)
+        self.async_track = async_track
+        self.start_us = _now_us()
+        self.tid = threading.get_ident()
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.end()
+        return False
+
+    def set(self, **args):
+        """Attach attributes (page count, cache hit, ...) shown in the trace viewer."""
+        self.args.update(args)
+
+    def end(self, **args):
+        self.args.update(args)
+        self.tracer._emit(self, _now_us())
+
+class Tracer:
+    """Collects spans in memory and writes them as a Chrome trace-event file."""
+
+    def __init__(self, max_events: int = 1_000_000):
+        self.enabled = False
+        self.max_events = max_events
+        self._events: List[Dict] = []
+        self._thread_names: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._dropped = 0
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name: str, cat: str = "pipeline", parent=None, async_track: bool = False, **args):
+        """Context-managed span; parent defaults to the enclosing span on this thread or task."""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, cat, parent, async_track, args)
+
+    def begin(self, name: str, cat: str = "pipeline", parent=None, **args):
+        """Start a span that is ended explicitly, possibly on another thread."""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, cat, parent, False, args)
+
+    def current(self):
+        """The innermost open span on this thread or task (a no-op span when there is none)."""
+        return _current_span.get() or NULL_SPAN
+
+    def _emit(self, span: Span, end_us: int):
+        pid = os.getpid()
+        tid = threading.get_ident()
+        args = dict(span.args, span_id=span.span_id)
+        if span.parent_id is not None:
+            args["parent_id"] = span.parent_id
+
+        if span.async_track or tid != span.tid:
+            common = {"name": span.name, "cat": span.cat, "id": hex(span.span_id), "pid": pid, "tid": span.tid}
+            events = [dict(common, ph="b", ts=span.start_us, args=args), dict(common, ph="e", ts=end_us)]
+        else:
+            events = [{"name": span.name, "cat": span.cat, "ph": "X", "ts": span.start_us,
+                       "dur": end_us - span.start_us, "pid": pid, "tid": tid, "args": args}]
+
+        with self._lock:
+            if len(self._events) + len(events) > self.max_events:
+                self._dropped += len(events)
+                return
+            self._events.extend(events)
+            self._thread_names.setdefault((pid, span.tid), threading.current_thread().name)
+
+    def _metadata(self) -> List[Dict]:
+        process = multiprocessing.current_process().name
+        events = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0,
+                   "args": {"name": f"moneypulse {process}"}}]
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                   for (pid, tid), name in self._thread_names.items()]
+        return events
+
+    def drain(self) -> List[Dict]:
+        """Return and clear the collected events (with process/thread names), e.g. to send from a worker."""
+        with self._lock:
+            events = self._metadata() + self._events
+            self._events = []
+            self._thread_names = {}
+        return events
+
+    def add_events(self, events: List[Dict]):
+        """Fold in events drained in another process."""
+        with self._lock:
+            self._events.extend(events)
+
+    def write(self, path: str) -> Optional[str]:
+        """Write everything collected so far; open the file at ui.perfetto.dev or chrome://tracing."""
+        with self._lock:
+            events = self._metadata() + list(self._events)
+            dropped = self._dropped
+
+        if dropped:
+            logger.warning(f"Trace buffer full: {dropped} events were dropped (max_events={self.max_events})")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+            os.replace(tmp_path, path)
+            return path
+        except OSError as e:
+            logger.warning(f"Failed to write trace file {path}: {e}")
+            return None
+
+    def reset(self):
+        with self._lock:
+            self._events = []
+            self._thread_names = {}
+            self._dropped = 0
+
+# Process-wide tracer; off until a pipeline is configured with 'trace_file'.
+TRACER = Tracer()
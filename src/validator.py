@@ -3,12 +3,21 @@ import logging
 from typing import Dict, List
 from datetime import datetime
 
+from .tracing import TRACER
+
 class DocumentValidator:
     """Applies business rules and validation to parsed document data."""
     
+    # Bump whenever a validation rule changes.
+    STAGE_VERSION = "1"
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
     
+    def cache_fingerprint(self) -> Dict:
+        """Settings that affect validation output, for the stage cache."""
+        return {}
+    
     def validate_document(self, parsed_data: Dict) -> Dict:
         """Apply validation rules and update flagged issues."""
         validation_issues = []
@@ -59,6 +68,7 @@ class DocumentValidator:
             penalty = min(0.2 * len(validation_issues), 0.4)
             parsed_data['confidence_score'] = max(current_confidence - penalty, 0.1)
         
+        TRACER.current().set(issues=len(validation_issues), validation_status=parsed_data['validation_status'])
         self.logger.info(f"Validation completed for {parsed_data.get('source_file', 'unknown')}: {len(validation_issues)} issues found")
         
         return parsed_data
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Watch-Folder Ingestion
+Long-running daemon that processes documents as they land in the input folder with a warm pipeline
+"""
+
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Partial downloads and editor/OS temp files that must never be picked up.
+IGNORED_PREFIXES = (".", "~$")
+IGNORED_SUFFIXES = (".part", ".crdownload", ".tmp", ".download")
+
+class FolderWatcher:
+    """
+    Watches an input folder (recursively) and feeds new documents to a pipeline.
+
+    File events come from watchdog (inotify on Linux, FSEvents on macOS,
+    ReadDirectoryChangesW on Windows) when it is installed, and from a
+    periodic directory scan otherwise. Either way a file is only queued once
+    its size and modification time have stopped changing for
+    ``settle_seconds``, so documents still being copied are left alone.
+    Processed files are moved to ``done_dir`` or ``failed_dir``, keeping
+    their path relative to the input folder. Each result is appended to
+    ``results_file`` and passed to ``on_result`` one at a time, even with
+    several workers.
+    """
+
+    def __init__(self, pipeline, input_dir: str = "input", done_dir: Optional[str] = None,
+                 failed_dir: Optional[str] = None, settle_seconds: float = 2.0, poll_interval: float = 2.0,
+                 workers: int = 1, use_watchdog: Optional[bool] = None, results_file: Optional[str] = None,
+                 on_result: Optional[Callable[[Dict], None]] = None):
+        self.pipeline = pipeline
+        self.input_dir = os.path.abspath(input_dir)
+        processed_root = os.path.join(os.path.dirname(self.input_dir), "processed")
+        self.done_dir = os.path.abspath(done_dir or os.path.join(processed_root, "done"))
+        self.failed_dir = os.path.abspath(failed_dir or os.path.join(processed_root, "failed"))
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.workers = max(1, workers)
+        self.use_watchdog = use_watchdog
+        self.results_file = results_file or os.path.join(pipeline.output_dir, "watch_results.jsonl")
+        self.on_result = on_result
+
+        self.backend = None
+        self.stats = {"queued": 0, "completed": 0, "failed": 0, "started_at": None}
+
+        # path -> (size, mtime, time the signature was first seen)
+        self._pending: Dict[str, Tuple[int, float, float]] = {}
+        self._queued = set()
+        self._lock = threading.Lock()
+        # Serialises the results file and on_result; separate from _lock so a
+        # slow callback does not hold up file events.
+        self._result_lock = threading.Lock()
+        self._work_queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    def is_candidate(self, path: str) -> bool:
+        """Whether a path is a supported document inside the watched tree."""
+        name = os.path.basename(path)
+        if name.startswith(IGNORED_PREFIXES) or name.lower().endswith(IGNORED_SUFFIXES):
+            return False
+        if not name.lower().endswith(self.pipeline.SUPPORTED_EXTENSIONS):
+            return False
+
+        path = os.path.abspath(path)
+        for excluded in (self.done_dir, self.failed_dir):
+            if path == excluded or path.startswith(excluded + os.sep):
+                return False
+        return path.startswith(self.input_dir + os.sep)
+
+    def notify(self, path: str):
+        """Record that a file appeared or changed; it is queued once it settles."""
+        if not self.is_candidate(path):
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._queued:
+                self._pending.setdefault(path, (-1, -1.0, time.monotonic()))
+
+    def start(self, warm_up: bool = True):
+        """Warm the pipeline, pick up files already waiting, and start watching."""
+        os.makedirs(self.input_dir, exist_ok=True)
+        os.makedirs(self.done_dir, exist_ok=True)
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self._stop_event.clear()
+        self.stats["started_at"] = datetime.now().isoformat()
+
+        self.pipeline.apply_cpu_budget(self.workers)
+        if warm_up:
+            self.pipeline.warm_up()
+
+        self._scan()
+        self.backend = self._start_observer()
+        logger.info(f"Watching {self.input_dir} ({self.backend}); done -> {self.done_dir}, failed -> {self.failed_dir}")
+
+        self._threads = [threading.Thread(target=self._settle_loop, name="watch-settle", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._work_loop, name=f"watch-worker-{n}", daemon=True)
+            for n in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def run_forever(self):
+        """start() and block until interrupted."""
+        self.start()
+        try:
+            while not self._stop_event.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            logger.info("Stopping watcher")
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 30.0):
+        """Stop watching and let in-flight documents finish."""
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5.0)
+            self._observer = None
+        for _ in range(self.workers):
+            self._work_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        self.pipeline.write_trace_file()
+        self.pipeline.close_replay_recorder()
+
+    def _start_observer(self) -> str:
+        if self.use_watchdog is False:
+            return "polling"
+
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            if self.use_watchdog:
+                logger.warning("watchdog is not installed; falling back to polling")
+            return "polling"
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher.notify(event.src_path)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    watcher.notify(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    watcher.notify(event.dest_path)
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.input_dir, recursive=True)
+        self._observer.start()
+        return f"watchdog/{type(self._observer).__name__}"
+
+    def _scan(self):
+        """Walk the input tree and notify every candidate file."""
+        for root, dirs, files in os.walk(self.input_dir):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) not in (self.done_dir, self.failed_dir)]
+            for name in files:
+                self.notify(os.path.join(root, name))
+
+    def _settle_loop(self):
+        """Move files whose size and mtime have been stable for settle_seconds onto the work queue."""
+        last_scan = time.monotonic()
+        while not self._stop_event.wait(0.5):
+            if self.backend == "polling" and time.monotonic() - last_scan >= self.poll_interval:
+                self._scan()
+                last_scan = time.monotonic()
+            elif self.backend != "polling" and time.monotonic() - last_scan >= 60.0:
+                # Safety net for events dropped by the OS (e.g. inotify queue overflow).
+                self._scan()
+                last_scan = time.monotonic()
+
+            now = time.monotonic()
+            ready = []
+            with self._lock:
+                for path, (size, mtime, since) in list(self._pending.items()):
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        del self._pending[path]  # removed or renamed before it settled
+                        continue
+
+                    if (stat.st_size, stat.st_mtime) != (size, mtime):
+                        self._pending[path] = (stat.st_size, stat.st_mtime, now)
+                    elif stat.st_size > 0 and now - since >= self.settle_seconds:
+                        del self._pending[path]
+                        self._queued.add(path)
+                        ready.append(path)
+
+                self.stats["queued"] += len(ready)
+
+            for path in ready:
+                self._work_queue.put(path)
+
+    def _work_loop(self):
+        while True:
+            path = self._work_queue.get()
+            if path is None:
+                return
+
+            try:
+                result = self.pipeline.process_single_document(path)
+            except Exception as e:
+                result = {
+                    "source_file": os.path.basename(path),
+                    "error": str(e),
+                    "processing_status": "failed",
+                    "processing_timestamp": datetime.now().isoformat()
+                }
+
+            succeeded = result.get("processing_status") == "completed"
+            result["archived_to"] = self._archive(path, self.done_dir if succeeded else self.failed_dir)
+            self._record(result)
+            self.pipeline.write_metrics_file()
+
+            with self._lock:
+                self.stats["completed" if succeeded else "failed"] += 1
+                # A file that could not be moved stays marked so it is not reprocessed on every scan.
+                if result["archived_to"]:
+                    self._queued.discard(path)
+
+    def _archive(self, path: str, target_root: str) -> Optional[str]:
+        """Move a processed file under target_root, keeping its relative path and never overwriting."""
+        relative = os.path.relpath(path, self.input_dir)
+        target = os.path.join(target_root, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        base, ext = os.path.splitext(target)
+        counter = 1
+        while os.path.exists(target):
+            target = f"{base}_{counter}{ext}"
+            counter += 1
+
+        try:
+            shutil.move(path, target)
+            return target
+        except OSError as e:
+            logger.error(f"Could not move {path} to {target_root}: {e}")
+            return None
+
+    def _record(self, result: Dict):
+        with self._result_lock:
+            try:
+                with open(self.results_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(result, default=str) + "\n")
+            except OSError as e:
+                logger.error(f"Failed to write watch result: {e}")
+
+            if self.on_result:
+                try:
+                    self.on_result(result)
+                except Exception as e:
+                    logger.error(f"Result callback failed: {e}")